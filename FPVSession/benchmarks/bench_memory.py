@@ -0,0 +1,64 @@
+"""
+Memory benchmark: summary SessionRecord index (+ on-demand FileTables) vs. the legacy per-session dicts.
+
+Builds the same synthetic FPV_BASE tree as bench_scanner.py, scans it and reports
+the deep size of the representations plus tracemalloc numbers. Usage:
+
+    python benchmarks/bench_memory.py [--files 50000] [--keep]
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench_scanner import build_tree  # noqa: E402
+from flask_app.utils.scanner import scan_library  # noqa: E402
+from flask_app.utils.session_records import memory_report  # noqa: E402
+
+
+def _traced(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        current, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--files', type=int, default=50000)
+    ap.add_argument('--keep', action='store_true', help='keep the synthetic tree')
+    args = ap.parse_args()
+
+    base = tempfile.mkdtemp(prefix='fpv_bench_')
+    try:
+        n = build_tree(base, args.files)
+        print(f"🏗️ Synthetic tree: {n} files -> {base}")
+        scan_alloc, (scanned, _tasks) = _traced(lambda: scan_library(base))
+        sessions = [s.summary() for s in scanned]
+        legacy_alloc, legacy = _traced(lambda: [s.to_legacy_dict() for s in scanned])
+        report = memory_report(sessions, {(s.name, s.sub): s.files for s in scanned})
+        mb = 1024 * 1024
+        print(f"📦 summary index (resident) : {report['resident_bytes'] / mb:8.2f} MB (deep size)")
+        print(f"📦 file tables (on demand)  : {report['file_tables_bytes'] / mb:8.2f} MB (deep size), scan retained {scan_alloc / mb:.2f} MB incl. thumb tasks")
+        print(f"📦 legacy dicts             : {report['legacy_dict_bytes'] / mb:8.2f} MB (deep size), {legacy_alloc / mb:.2f} MB allocated")
+        print(f"   {report['sessions']} sessions, {report['files']} files, {report['dir_prefixes']} interned dir prefixes")
+        if report['ratio']:
+            print(f"🚀 resident index {report['ratio']:.2f}x smaller than the legacy dicts")
+        del legacy
+    finally:
+        if not args.keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
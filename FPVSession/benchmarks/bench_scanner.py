@@ -0,0 +1,153 @@
+"""
+Before/after benchmark: legacy two-pass os.walk scan vs. single-pass scandir scanner.
+
+Builds a synthetic FPV_BASE tree (default ~50k empty files) in a temp dir and times
+both scanners on it. Usage:
+
+    python benchmarks/bench_scanner.py [--files 50000] [--repeat 3] [--keep]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from flask_app.utils.scanner import scan_library  # noqa: E402
+from flask_app.utils.derived_cache import DERIVED  # noqa: E402
+from flask_app.utils.session_meta import extract_session_date, parse_session_times  # noqa: E402
+
+
+def build_tree(base: str, total_files: int, files_per_sub: int = 100, subs_per_day: int = 5):
+    """Create days x subs x files empty files in the sorter layout (FPV_Camera, IMG, Blackbox, ...)."""
+    subs_needed = max(1, total_files // files_per_sub)
+    days = max(1, subs_needed // subs_per_day)
+    n = 0
+    for d in range(days):
+        y, m, day = 2024 + d // 336, 1 + (d // 28) % 12, 1 + d % 28
+        session_folder = f"{y:04d}.{m:02d}.{day:02d}_FPVSession"
+        for s in range(subs_per_day):
+            sub = f"{y:04d}.{m:02d}.{day:02d}_{10+s:02d}.00.00-{10+s:02d}.45.00_FPVSession"
+            sub_path = os.path.join(base, session_folder, sub)
+            layout = {
+                'FPV_Camera': ('DJI-O4_{:04d}.mp4', 40),
+                'Goggel_Vison': ('FPV-Goggel_{:04d}.mov', 20),
+                'IMG': ('IMG_{:04d}.jpg', 25),
+                'Blackbox': ('BFL_{:04d}.bfl', 14),
+            }
+            for folder, (pattern, count) in layout.items():
+                p = os.path.join(sub_path, folder)
+                os.makedirs(p, exist_ok=True)
+                for i in range(count):
+                    open(os.path.join(p, pattern.format(i)), 'wb').close()
+                    n += 1
+            open(os.path.join(sub_path, 'session_log.txt'), 'wb').close()
+            n += 1
+    return n
+
+
+def legacy_scan(FPV_BASE: str) -> list:
+    """The previous _scan_sessions (two os.walk passes, exists/getsize/relpath per file), without thumbnail generation."""
+    sessions = []
+    thumb_tasks = []
+    for session_folder in sorted(os.listdir(FPV_BASE)):
+        session_path = os.path.join(FPV_BASE, session_folder)
+        if os.path.isdir(session_path):
+            for sub in sorted(os.listdir(session_path)):
+                sub_path = os.path.join(session_path, sub)
+                if os.path.isdir(sub_path):
+                    img_dir = os.path.join(sub_path, 'IMG')
+                    if not os.path.exists(img_dir):
+                        os.makedirs(img_dir)
+                    for root, dirs, files in os.walk(sub_path):
+                        for f in files:
+                            if f.lower().endswith(('.mp4', '.mov')):
+                                base_name = os.path.splitext(os.path.basename(f))[0]
+                                thumb_path = os.path.join(img_dir, f"{base_name}_thumb.jpg")
+                                if not os.path.exists(thumb_path):
+                                    thumb_tasks.append((os.path.join(root, f), thumb_path))
+    for session_folder in sorted(os.listdir(FPV_BASE)):
+        session_path = os.path.join(FPV_BASE, session_folder)
+        if os.path.isdir(session_path):
+            for sub in sorted(os.listdir(session_path)):
+                sub_path = os.path.join(session_path, sub)
+                if os.path.isdir(sub_path):
+                    img_dir = os.path.join(sub_path, 'IMG')
+                    session = {'name': session_folder, 'sub': sub, 'videos': [], 'images': [], 'logs': [],
+                               'goggles': [], 'blackbox': [], 'meta': [], 'thumbnails': [],
+                               'date': extract_session_date(session_folder, sub),
+                               'times': parse_session_times(session_folder, sub)}
+                    os.path.exists(os.path.join(sub_path, '.fpvweb_meta.json'))
+                    for root, dirs, files in os.walk(sub_path):
+                        for f in files:
+                            rel_path = os.path.relpath(os.path.join(root, f), FPV_BASE).replace('\\', '/')
+                            low = f.lower()
+                            if low.endswith(('.mp4', '.mov')):
+                                session['videos'].append(rel_path)
+                                base_name = os.path.splitext(os.path.basename(f))[0]
+                                thumb_rel = os.path.relpath(os.path.join(img_dir, f"{base_name}_thumb.jpg"), FPV_BASE).replace('\\', '/')
+                                session['thumbnails'].append({'video': rel_path, 'thumb': thumb_rel})
+                                try:
+                                    os.path.getsize(os.path.join(root, f))
+                                except Exception:
+                                    pass
+                            elif low.endswith(('.png', '.jpg', '.jpeg')):
+                                session['images'].append(rel_path)
+                            elif low.endswith('.bfl'):
+                                session['blackbox'].append(rel_path)
+                            elif low.endswith('.txt'):
+                                session['logs'].append(rel_path)
+                            elif low.endswith('.json'):
+                                session['meta'].append(rel_path)
+                            elif 'goggel' in low:
+                                session['goggles'].append(rel_path)
+                    sessions.append(session)
+    return sessions
+
+
+def _time(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--files', type=int, default=50000)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--keep', action='store_true', help='keep the synthetic tree')
+    args = ap.parse_args()
+
+    base = tempfile.mkdtemp(prefix='fpv_bench_')
+    try:
+        t0 = time.perf_counter()
+        n = build_tree(base, args.files)
+        print(f"🏗️ Synthetic tree: {n} files in {time.perf_counter() - t0:.1f}s -> {base}")
+        # empty derived cache outside the tree: every video counts as a thumbnail task, like in the legacy scan
+        DERIVED.configure(root=base + '.derived')
+        # Run the new scanner first: the legacy scan creates missing IMG dirs
+        new_t, (new_sessions, new_tasks) = _time(lambda: scan_library(base), args.repeat)
+        old_t, old_sessions = _time(lambda: legacy_scan(base), args.repeat)
+        print("   (page cache is warm for both; drop caches as root for cold-disk numbers)")
+        print(f"⏱️ legacy two-pass os.walk : {old_t:.3f}s  ({len(old_sessions)} sessions)")
+        print(f"⏱️ single-pass scandir     : {new_t:.3f}s  ({len(new_sessions)} sessions, {len(new_tasks)} thumb tasks)")
+        if new_t > 0:
+            print(f"🚀 speedup: {old_t / new_t:.2f}x")
+    finally:
+        if not args.keep:
+            shutil.rmtree(base, ignore_errors=True)
+            shutil.rmtree(base + '.derived', ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
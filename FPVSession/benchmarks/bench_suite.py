@@ -0,0 +1,295 @@
+"""
+Benchmark suite for the scan and serve paths.
+
+Generates a synthetic library (see fpv_library.py) or uses an existing one and
+times: index build (cold full scan, incremental no-op rescan), warm start from
+SQLite and from the snapshot, index and detail page renders (cold = page cache
+cleared, warm = cache hit, 304 revalidation), search queries, /media range
+requests and thumbnail generation per backend and footage kind (real clips only). Results are written as
+JSON; --compare prints the change against an earlier result file. Usage:
+
+    python benchmarks/bench_suite.py [--days 30] [--subs 4] [--clips] [--repeat 20] [--out results.json]
+    python benchmarks/bench_suite.py --base /mnt/fpv --only render,search --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fpv_library import generate_library  # noqa: E402
+
+GROUPS = ('index', 'render', 'search', 'media', 'thumbs')
+QUERIES = ['freestyle', 'tag:bando', 'date:2024-04', '09.00', 'tag:race wald']
+
+
+def _summary(samples: list) -> dict:
+    """Timing samples in seconds -> milliseconds statistics."""
+    ms = sorted(x * 1000.0 for x in samples)
+    n = len(ms)
+    if not n:
+        return {'n': 0}
+    return {
+        'n': n,
+        'min_ms': round(ms[0], 3),
+        'median_ms': round(ms[n // 2] if n % 2 else (ms[n // 2 - 1] + ms[n // 2]) / 2, 3),
+        'p95_ms': round(ms[min(n - 1, int(n * 0.95))], 3),
+        'max_ms': round(ms[-1], 3),
+        'mean_ms': round(sum(ms) / n, 3),
+    }
+
+
+def _measure(fn, repeat: int, setup=None) -> dict:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+def _quiet(fn):
+    """Run fn with stdout discarded (index builds print progress lines)."""
+    def run():
+        saved = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            return fn()
+        finally:
+            sys.stdout.close()
+            sys.stdout = saved
+    return run
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=5).stdout.strip()
+    except Exception:
+        return ''
+
+
+def _reset_cache(su):
+    """Forget the in-process index (as after a worker restart)."""
+    with su._PATCH_LOCK:
+        su._CACHE.update(sessions=None, base=None, last_built=0.0, stats=None, search=None, lookup=None, sorted=None)
+    with su._FILES_LOCK:
+        su._FILES_CACHE.clear()
+
+
+def bench_index(su, base: str, work: str, repeat: int) -> dict:
+    from flask_app.utils import index_snapshot
+    db = os.path.join(work, 'index.sqlite3')
+
+    def drop_db():
+        _reset_cache(su)
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(db + suffix)
+            except OSError:
+                pass
+
+    build = _quiet(lambda: su.refresh_sessions(base))
+    results = {
+        'index_build_cold': _measure(build, max(1, repeat // 5), setup=drop_db),
+        'index_build_noop': _measure(build, max(1, repeat // 5)),
+        'index_load_sqlite': _measure(_quiet(lambda: su._load_from_index(base)), repeat, setup=lambda: _reset_cache(su)),
+    }
+
+    def load_snapshot():
+        reader = index_snapshot.SnapshotReader(su._snapshot_path())
+        _version, _built, payload = reader.poll(force=True)
+        [su.SessionRecord.from_summary(s) for s in payload['sessions']]
+
+    results['index_load_snapshot'] = _measure(load_snapshot, repeat)
+    _quiet(lambda: su.get_cached_sessions(base))()
+    return results
+
+
+def _client(appmod):
+    c = appmod.app.test_client()
+    with c.session_transaction() as s:
+        s['user'] = os.environ.get('FPVWEB_USER', 'admin')
+    return c
+
+
+def bench_render(su, appmod, repeat: int) -> dict:
+    from flask_app.utils.page_cache import PAGE_CACHE
+    c = _client(appmod)
+    s = su.get_cached_sessions(appmod.FPV_BASE)[len(su.get_cached_sessions(appmod.FPV_BASE)) // 2]
+    detail = f"/session/{s['name']}/{s['sub']}"
+    results = {}
+    for name, url in (('index', '/'), ('index_q', '/?q=freestyle'), ('detail', detail)):
+        get = lambda url=url: c.get(url).data  # noqa: E731
+        results[f'render_{name}_cold'] = _measure(get, repeat, setup=PAGE_CACHE.clear)
+        get()
+        results[f'render_{name}_warm'] = _measure(get, repeat)
+        etag = c.get(url).headers.get('ETag')
+        results[f'render_{name}_304'] = _measure(lambda url=url: c.get(url, headers={'If-None-Match': etag}), repeat)
+    results['api_sessions_page'] = _measure(lambda: c.get('/api/sessions?limit=50').data, repeat)
+    return results
+
+
+def bench_search(su, base: str, repeat: int) -> dict:
+    results = {}
+    # first query of an index version builds the search index
+    results['search_index_build'] = _measure(lambda: su.search_sessions(base, 'x'), max(1, repeat // 5),
+                                             setup=lambda: su._CACHE.update(search=None))
+    for q in QUERIES:
+        results[f'search[{q}]'] = _measure(lambda q=q: su.search_sessions(base, q), repeat)
+    return results
+
+
+def bench_media(appmod, videos: list, repeat: int) -> dict:
+    c = _client(appmod)
+    rel = videos[len(videos) // 2]
+    size = os.path.getsize(os.path.join(appmod.FPV_BASE, rel))
+    mid = size // 2
+    results = {}
+    for name, rng in (('head', 'bytes=0-65535'), ('mid', f'bytes={mid}-{mid + 1048575}'), ('tail', 'bytes=-65536')):
+        results[f'media_range_{name}'] = _measure(lambda rng=rng: c.get(f'/media/{rel}', headers={'Range': rng}).data, repeat)
+    results['media_missing_basename'] = _measure(lambda: c.get('/media/missing/DJI-O4_does_not_exist.mp4').data,
+                                                 max(1, repeat // 5))
+    return results
+
+
+def _footage_kind(rel: str) -> str:
+    name = os.path.basename(rel)
+    if 'DJI-O4' in name:
+        return 'dji'
+    return 'goggle' if 'goggel' in name.lower() else 'other'
+
+
+def bench_thumbs(base: str, videos: list, work: str, repeat: int, clips: bool) -> dict:
+    """Thumbnail generation per available backend (ffmpeg, pyav, cv2) and footage kind (DJI-O4 / goggle)."""
+    from flask_app.utils.thumbnail_utils import generate_thumbnail, available_backends
+    backends = available_backends()
+    if not clips or not backends:
+        return {'thumbnail_generate': {'n': 0, 'skipped': 'needs real clips (--clips or --base) and ffmpeg, av or cv2'}}
+    by_kind = {}
+    for rel in videos:
+        by_kind.setdefault(_footage_kind(rel), []).append(rel)
+    results = {}
+    for backend in backends:
+        for kind, rels in sorted(by_kind.items()):
+            picks = rels[:max(1, min(repeat, len(rels)))]
+            out = os.path.join(work, 'thumbs', backend, kind)
+            samples, failed = [], 0
+            for i, rel in enumerate(picks):
+                t0 = time.perf_counter()
+                failed += not generate_thumbnail(os.path.join(base, rel), os.path.join(out, f'{i}_thumb.jpg'), backend=backend)
+                samples.append(time.perf_counter() - t0)
+            r = _summary(samples)
+            # throughput of one worker; the engine runs THUMB_WORKERS of these in parallel
+            r['per_sec'] = round(len(samples) / sum(samples), 2) if sum(samples) else None
+            r['failed'] = failed
+            results[f'thumbnail_{backend}_{kind}'] = r
+    return results
+
+
+def compare(results: dict, baseline_path: str):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f).get('results', {})
+    print(f"\n{'benchmark':<34}{'before':>12}{'after':>12}{'change':>10}")
+    for name, cur in results.items():
+        old = baseline.get(name) or {}
+        a, b = old.get('median_ms'), cur.get('median_ms')
+        if a is None or b is None:
+            continue
+        change = (b - a) / a * 100.0 if a else 0.0
+        mark = '🚀' if change < -5 else ('🐢' if change > 5 else '  ')
+        print(f"{name:<34}{a:>10.2f}ms{b:>10.2f}ms{change:>+9.1f}% {mark}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--base', help='existing FPV_BASE (default: generate a synthetic library)')
+    ap.add_argument('--days', type=int, default=30)
+    ap.add_argument('--subs', type=int, default=4)
+    ap.add_argument('--clips', action='store_true', help='generate ffmpeg testsrc clips (enables thumbnail benchmark)')
+    ap.add_argument('--repeat', type=int, default=20)
+    ap.add_argument('--only', default=','.join(GROUPS), help=f"comma separated subset of {', '.join(GROUPS)}")
+    ap.add_argument('--out', default='bench_results.json')
+    ap.add_argument('--compare', help='earlier result file to compare against')
+    ap.add_argument('--keep', action='store_true', help='keep the synthetic library and index')
+    args = ap.parse_args()
+    groups = [g.strip() for g in args.only.split(',') if g.strip()]
+
+    work = tempfile.mkdtemp(prefix='fpv_suite_')
+    try:
+        if args.base:
+            base = os.path.abspath(args.base)
+            lib = {'sessions': None, 'clips': True, 'videos': []}
+            for root, _dirs, files in os.walk(base):
+                lib['videos'] += [os.path.relpath(os.path.join(root, f), base).replace(os.sep, '/')
+                                  for f in files if f.lower().endswith(('.mp4', '.mov'))]
+        else:
+            base = os.path.join(work, 'FPV')
+            os.makedirs(base)
+            lib = generate_library(base, args.days, args.subs, clips=args.clips)
+            print(f"🏗️ Synthetic library: {lib['sessions']} Sub-Sessions, {lib['files']} Dateien -> {base}")
+
+        from flask_app.utils import session_utils as su
+        # THUMB_BACKFILL off: the index page would start the thumbnail scheduler, keep it out of the timings
+        su.configure({'INDEX_DB': os.path.join(work, 'index.sqlite3'), 'SNAPSHOT_PATH': os.path.join(work, 'index.snapshot'),
+                      'THUMB_BACKFILL': False})
+        from flask_app import app as appmod
+        appmod.FPV_BASE = base
+
+        results = {}
+        if 'index' in groups:
+            results.update(bench_index(su, base, work, args.repeat))
+        else:
+            _quiet(lambda: su.get_cached_sessions(base))()
+        if 'render' in groups:
+            results.update(bench_render(su, appmod, args.repeat))
+        if 'search' in groups:
+            results.update(bench_search(su, base, args.repeat))
+        if 'media' in groups and lib['videos']:
+            results.update(bench_media(appmod, lib['videos'], args.repeat))
+        if 'thumbs' in groups:
+            results.update(bench_thumbs(base, lib['videos'], work, args.repeat, lib['clips']))
+
+        for name, r in results.items():
+            if r.get('n'):
+                rate = f" | {r['per_sec']:.2f}/s" if r.get('per_sec') else ''
+                print(f"⏱️ {name:<34} median {r['median_ms']:>9.2f} ms | p95 {r['p95_ms']:>9.2f} ms | n={r['n']}{rate}")
+            else:
+                print(f"⏭️ {name:<34} {r.get('skipped', 'skipped')}")
+        payload = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'git': _git_rev(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'base': args.base or 'synthetic',
+                'sessions': len(su.get_cached_sessions(base)),
+                'days': args.days, 'subs': args.subs, 'clips': bool(lib['clips']), 'repeat': args.repeat,
+            },
+            'results': results,
+        }
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"💾 Ergebnisse -> {args.out}")
+        if args.compare:
+            compare(results, args.compare)
+    finally:
+        if args.keep:
+            print(f"📂 Behalten: {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
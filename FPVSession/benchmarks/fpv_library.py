@@ -0,0 +1,128 @@
+"""
+Synthetic FPV_BASE generator for benchmarks.
+
+Builds days x subsessions in the layout of the auto session sorter
+(FPV_Camera/DJI-O4, Goggel_Vison/FPV-Goggel, Blackbox/BFL, IMG, flight log) with
+realistic file sizes as sparse files, so a library of several TB only costs a few
+MB on disk. With --clips the videos are copies of a tiny `ffmpeg -f lavfi testsrc`
+clip instead, so thumbnails can actually be generated. Usage:
+
+    python benchmarks/fpv_library.py /tmp/fpv_lib [--days 30] [--subs 4] [--clips] [--tags]
+"""
+
+import os
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import date, timedelta
+
+MB = 1024 * 1024
+TAGS = ['freestyle', 'cinematic', 'bando', 'race', 'chill', 'wald', 'strand', 'berge']
+
+# folder -> (file name pattern, count key, size range in bytes)
+LAYOUT = {
+    'FPV_Camera': ('{stamp}_DJI-O4_{i:04d}.mp4', 'videos', (150 * MB, 900 * MB)),
+    'Goggel_Vison': ('{stamp}_FPV-Goggel_{i:04d}.mov', 'goggles', (50 * MB, 300 * MB)),
+    'Blackbox': ('{stamp}_BFL_{i:04d}.bfl', 'blackbox', (1 * MB, 16 * MB)),
+    'IMG': ('{stamp}_IMG_{i:04d}.jpg', 'images', (2 * MB, 8 * MB)),
+}
+
+
+def make_clip(path: str, seconds: int = 8) -> bool:
+    """Tiny test clip (160x120, 10 fps) via ffmpeg's lavfi testsrc; False if ffmpeg is missing or fails."""
+    if not shutil.which('ffmpeg'):
+        return False
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=duration={seconds}:size=160x120:rate=10',
+        '-pix_fmt', 'yuv420p', '-movflags', '+faststart', path,
+    ]
+    try:
+        return subprocess.run(cmd, capture_output=True, timeout=60).returncode == 0 and os.path.exists(path)
+    except Exception:
+        return False
+
+
+def _sparse(path: str, size: int):
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+
+def generate_library(base: str, days: int = 30, subs: int = 4, videos: int = 8, goggles: int = 4,
+                     blackbox: int = 6, images: int = 10, clips: bool = False, tags: bool = True,
+                     start: date = date(2024, 4, 1), seed: int = 1) -> dict:
+    """
+    Create the tree under base and return {'sessions', 'files', 'bytes', 'clips', 'videos': [rel paths]}.
+    Deterministic for a given seed, so runs on different commits see the same library.
+    """
+    rng = random.Random(seed)
+    counts = {'videos': videos, 'goggles': goggles, 'blackbox': blackbox, 'images': images}
+    clip = None
+    if clips:
+        clip = os.path.join(tempfile.mkdtemp(prefix='fpv_clip_'), 'testsrc.mp4')
+        if not make_clip(clip):
+            print("⚠️ ffmpeg nicht verfügbar, Videos werden als Sparse-Dateien angelegt")
+            clip = None
+    info = {'sessions': 0, 'files': 0, 'bytes': 0, 'clips': clip is not None, 'videos': []}
+    for d in range(days):
+        day = start + timedelta(days=d)
+        session_folder = f"{day:%Y.%m.%d}_FPVSession"
+        for s in range(subs):
+            h0 = 9 + 2 * s
+            sub = f"{day:%Y.%m.%d}_{h0:02d}.00.00-{h0:02d}.45.00_FPVSession"
+            sub_path = os.path.join(base, session_folder, sub)
+            for folder, (pattern, key, (lo, hi)) in LAYOUT.items():
+                p = os.path.join(sub_path, folder)
+                os.makedirs(p, exist_ok=True)
+                for i in range(counts[key]):
+                    stamp = f"{day:%Y.%m.%d}_{h0:02d}.{(i * 3) % 45:02d}.{rng.randrange(60):02d}"
+                    name = pattern.format(stamp=stamp, i=i)
+                    path = os.path.join(p, name)
+                    if clip is not None and key in ('videos', 'goggles'):
+                        shutil.copyfile(clip, path)
+                        size = os.path.getsize(path)
+                    else:
+                        size = rng.randint(lo, hi)
+                        _sparse(path, size)
+                    if key in ('videos', 'goggles'):
+                        info['videos'].append(f"{session_folder}/{sub}/{folder}/{name}")
+                    info['files'] += 1
+                    info['bytes'] += size
+            with open(os.path.join(sub_path, f"{sub}.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"Session: {sub}\nPilot: bench\n")
+            info['files'] += 1
+            if tags:
+                with open(os.path.join(sub_path, '.fpvweb_meta.json'), 'w', encoding='utf-8') as f:
+                    json.dump({'tags': rng.sample(TAGS, rng.randint(0, 3))}, f)
+            info['sessions'] += 1
+    if clip is not None:
+        shutil.rmtree(os.path.dirname(clip), ignore_errors=True)
+    return info
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('base', help='target directory (created if missing)')
+    ap.add_argument('--days', type=int, default=30)
+    ap.add_argument('--subs', type=int, default=4, help='subsessions per day')
+    ap.add_argument('--videos', type=int, default=8, help='DJI-O4 clips per subsession')
+    ap.add_argument('--goggles', type=int, default=4, help='FPV-Goggel clips per subsession')
+    ap.add_argument('--blackbox', type=int, default=6, help='BFL logs per subsession')
+    ap.add_argument('--images', type=int, default=10, help='IMG files per subsession')
+    ap.add_argument('--clips', action='store_true', help='real ffmpeg testsrc clips instead of sparse videos')
+    ap.add_argument('--no-tags', action='store_true', help='do not write .fpvweb_meta.json tags')
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+    os.makedirs(args.base, exist_ok=True)
+    info = generate_library(args.base, args.days, args.subs, args.videos, args.goggles, args.blackbox,
+                            args.images, clips=args.clips, tags=not args.no_tags, seed=args.seed)
+    print(f"🏗️ {info['sessions']} Sub-Sessions, {info['files']} Dateien, "
+          f"{info['bytes'] / 1024 ** 4:.2f} TB (scheinbar) -> {args.base}"
+          f"{' (ffmpeg-Clips)' if info['clips'] else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,44 +1,109 @@
 
 
-from flask import Flask, render_template, send_from_directory, url_for, request, jsonify, session, redirect, flash, make_response
-from urllib.parse import unquote
+from flask import Flask, render_template, send_from_directory, send_file, url_for, request, jsonify, session, redirect, flash, make_response, g
+from urllib.parse import quote, unquote
 import os
-import calendar
 from datetime import date, datetime
-from functools import wraps
+from functools import wraps, lru_cache
 import random
 import json
 import hashlib
+import mimetypes
+import unicodedata
 import shutil
 from threading import Lock
 import subprocess
 import sys
 import time
-from werkzeug.security import generate_password_hash, check_password_hash
+import click
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from werkzeug.utils import secure_filename
 
 try:
     from .utils.session_utils import (
         get_cached_sessions,
-        build_date_index,
         start_background_thumb_job,
+        prioritize_session_thumbs,
+        thumb_backfill_status,
         get_session_tags,
         save_session_tags,
+        configure as configure_sessions,
+        start_session_watcher,
+        request_refresh,
+        index_memory_report,
+        get_session_detail,
+        get_library_stats,
+        search_sessions,
+        sorted_sessions,
+        get_index_version,
+        derived_fingerprints,
+        requeue_missing_previews,
+        resolve_media_fallback,
     )
+    from .utils.session_query import SORTS, ORDERS, FIELDS, DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, paginate, select_fields
+    from .utils.calendar_utils import clamp_month, month_weeks, year_heatmap
+    from .utils.page_cache import PAGE_CACHE, etag_for
+    from .utils import metrics, thumb_engine, image_derivatives
+    from .utils.derived_cache import DERIVED, verify as verify_derived
+    from .utils.session_records import LEGACY_DERIVED
 except Exception:
     # Fallback: Script-Start (python flask_app/app.py)
     import sys
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
     from flask_app.utils.session_utils import (
         get_cached_sessions,
-        build_date_index,
         start_background_thumb_job,
+        prioritize_session_thumbs,
+        thumb_backfill_status,
         get_session_tags,
         save_session_tags,
+        configure as configure_sessions,
+        start_session_watcher,
+        request_refresh,
+        index_memory_report,
+        get_session_detail,
+        get_library_stats,
+        search_sessions,
+        sorted_sessions,
+        get_index_version,
+        derived_fingerprints,
+        requeue_missing_previews,
+        resolve_media_fallback,
     )
+    from flask_app.utils.session_query import SORTS, ORDERS, FIELDS, DEFAULT_LIMIT, MAX_LIMIT, decode_cursor, paginate, select_fields
+    from flask_app.utils.calendar_utils import clamp_month, month_weeks, year_heatmap
+    from flask_app.utils.page_cache import PAGE_CACHE, etag_for
+    from flask_app.utils import metrics, thumb_engine, image_derivatives
+    from flask_app.utils.derived_cache import DERIVED, verify as verify_derived
+    from flask_app.utils.session_records import LEGACY_DERIVED
 
 app = Flask(__name__)
 
+# Request-timing middleware (registered first so the timing covers all other hooks)
+@app.before_request
+def _metrics_start():
+    g._metrics_start = time.perf_counter()
+    g._metrics_in_flight = True
+    metrics.HTTP_IN_FLIGHT.inc()
+
+@app.after_request
+def _metrics_record(resp):
+    start = g.pop('_metrics_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+        metrics.HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=resp.status_code)
+        # streamed bodies (send_file, sorter logs) have no length up front
+        if resp.content_length is not None:
+            metrics.HTTP_RESPONSE_BYTES.observe(resp.content_length, endpoint=endpoint)
+    return resp
+
+@app.teardown_request
+def _metrics_done(exc=None):
+    # also runs for contexts without before_request (e.g. test session_transaction)
+    if g.pop('_metrics_in_flight', False):
+        metrics.HTTP_IN_FLIGHT.dec()
+
 # Configure secret key for session management
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'fpv-session-secret-key-change-in-production')
 
@@ -77,6 +142,10 @@ else:
     FPV_BASE = os.environ.get('FPV_BASE')
 if not FPV_BASE:
     FPV_BASE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'FPVSessions'))
+# Index settings (e.g. INDEX_DB) also come from sessions_config.json
+configure_sessions(_cfg_boot)
+# Optional nginx offload: internal location (alias of FPV_BASE) that /media and /download hand off to
+X_ACCEL_MEDIA = ((_cfg_boot.get('X_ACCEL_MEDIA') if isinstance(_cfg_boot, dict) else None) or '').rstrip('/')
 #    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'H:/FPV/my_FPV/FPVSessions'))
 #    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'FPVSessions'))
 
@@ -162,53 +231,95 @@ def save_share_link(link_id, video_path, session_name, session_sub):
     }
     return link_id
 
+@lru_cache(maxsize=8)
+def _is_default_admin_hash(password_hash: str) -> bool:
+    # check_password_hash ist absichtlich langsam; pro Hash nur einmal prüfen
+    return check_password_hash(password_hash, 'admin')
+
+
+def _page_cache_key(page: str, *extra):
+    """Everything a rendered page depends on: index version, query args, user and permission set."""
+    if FPV_BASE and os.path.isdir(FPV_BASE):
+        # sync with the published snapshot first so the version is current
+        get_cached_sessions(FPV_BASE)
+    perms = tuple(sorted(inject_user().items()))
+    args = tuple(sorted(request.args.items(multi=True)))
+    # date.today(): the calendar highlights today
+    return (page, get_index_version(), FPV_BASE, args, perms, date.today().isoformat()) + extra
+
+
+def _cached_page(key):
+    """304 for a matching If-None-Match, the cached response on a hit, else None."""
+    etag = etag_for(key)
+    if request.if_none_match.contains(etag):
+        resp = make_response('', 304)
+    else:
+        body = PAGE_CACHE.get(key)
+        if body is None:
+            return None
+        resp = make_response(body)
+        resp.mimetype = 'text/html'
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+
+def _store_page(key, html: str):
+    body = html.encode('utf-8')
+    PAGE_CACHE.put(key, body)
+    resp = make_response(body)
+    resp.mimetype = 'text/html'
+    resp.set_etag(etag_for(key))
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
 @app.route('/')
 def index():
     # Validate base path; if missing, don't crash and surface an admin hint
     base_exists = bool(FPV_BASE) and os.path.isdir(FPV_BASE)
-    sessions = get_cached_sessions(FPV_BASE) if base_exists else []
-    # einfache Suche über q: match in Name, Sub, Tags
+    # Suche über q via Suchindex: Teilstring in Name/Sub/Tags, tag:<tag>, date:<YYYY[-MM[-DD]]>
     q = (request.args.get('q') or '').strip().lower()
-    if q:
-        def matches(s):
-            if q in s.get('name','').lower() or q in s.get('sub','').lower():
-                return True
-            for t in s.get('tags', []):
-                if q in t.lower():
-                    return True
-            return False
-        sessions = [s for s in sessions if matches(s)]
-    date_map, months = build_date_index(sessions)
-    # Aggregate stats for display
-    def _safe_int(x, default=0):
-        try:
-            return int(x)
-        except Exception:
-            return default
-    total_sessions = len(sessions)
-    total_videos = sum(_safe_int(s.get('video_count', 0)) for s in sessions)
-    total_minutes = sum(_safe_int((s.get('times') or {}).get('duration_min', 0)) for s in sessions)
-    # Sum file sizes of all videos
-    total_size_bytes = 0
-    # Track oldest/newest video modification times across all videos
-    min_mtime = None
-    max_mtime = None
-    for s in sessions:
-        for rel in s.get('videos', []):
-            try:
-                abs_path = os.path.join(FPV_BASE, rel.replace('/', os.sep))
-                total_size_bytes += os.path.getsize(abs_path)
-                try:
-                    if os.path.exists(abs_path):
-                        m = os.path.getmtime(abs_path)
-                        if min_mtime is None or m < min_mtime:
-                            min_mtime = m
-                        if max_mtime is None or m > max_mtime:
-                            max_mtime = m
-                except Exception:
-                    pass
-            except Exception:
-                pass
+    # Hintergrund-Job anstoßen (Thumbnails generieren), blockiert nicht
+    if base_exists:
+        start_background_thumb_job(FPV_BASE)
+    # Pop just_logged_in flag so the sound plays only once
+    try:
+        just_logged_in = bool(session.pop('just_logged_in', False))
+    except Exception:
+        just_logged_in = False
+    # detect if configured admin is still using the literal default password 'admin'
+    admin_password_is_default = False
+    try:
+        expected_admin = os.environ.get('FPVWEB_USER', 'admin')
+        users = _load_users()
+        if expected_admin in users:
+            ph = users[expected_admin].get('password_hash', '')
+            if ph and _is_default_admin_hash(ph):
+                admin_password_is_default = True
+        else:
+            # no file-based user; fall back to env configured password
+            if os.environ.get('FPVWEB_PASS', 'admin') == 'admin':
+                admin_password_is_default = True
+    except Exception:
+        admin_password_is_default = False
+    # allow per-session suppression: if the admin chose 'don't show again' this session, don't prompt
+    try:
+        if session.get('suppress_admin_pw_prompt'):
+            admin_password_is_default = False
+    except Exception:
+        pass
+    # Gerenderte Seite aus dem Cache (Key: Index-Version, Query-Args, Benutzer/Rechte)
+    key = _page_cache_key('index', just_logged_in, admin_password_is_default)
+    cached = _cached_page(key)
+    if cached is not None:
+        return cached
+    sessions = search_sessions(FPV_BASE, q) if base_exists else []
+    # Aggregate stats for display: precomputed per session at index build, no filesystem access here
+    lib = get_library_stats(FPV_BASE, sessions if (q or not base_exists) else None)
+    date_map = lib['date_counts']
+    months = sorted({d[:7] for d in date_map})
+    total_minutes = lib['total_minutes']
+    total_size_bytes = lib['total_size_bytes']
     def human_size(n):
         units = ['B','KB','MB','GB','TB']
         size = float(n)
@@ -226,32 +337,15 @@ def index():
         rem = mins % 60
         return f"{hours}h {rem:02d}m" if hours else f"{rem}m"
     stats = {
-        'sessions': total_sessions,
-        'videos': total_videos,
+        'sessions': lib['sessions'],
+        'videos': lib['videos'],
         'total_minutes': total_minutes,
         'total_duration_human': human_duration(total_minutes),
         'total_size_bytes': total_size_bytes,
         'total_size_human': human_size(total_size_bytes),
     }
-    # Count tags across sessions
-    try:
-        total_tags = 0
-        unique_tags = set()
-        for s in sessions:
-            tags = s.get('tags') or []
-            if isinstance(tags, list):
-                total_tags += len(tags)
-                for t in tags:
-                    try:
-                        if t:
-                            unique_tags.add(str(t).strip().lower())
-                    except Exception:
-                        pass
-        stats['tags_total'] = total_tags
-        stats['tags_unique'] = len(unique_tags)
-    except Exception:
-        stats['tags_total'] = 0
-        stats['tags_unique'] = 0
+    stats['tags_total'] = lib['tags_total']
+    stats['tags_unique'] = len(lib['tag_counts'])
     # Format oldest/newest video timestamps for display
     def _fmt_ts(ts):
         try:
@@ -260,8 +354,8 @@ def index():
             return datetime.fromtimestamp(float(ts)).strftime('%Y-%m-%d %H:%M')
         except Exception:
             return ''
-    stats['oldest_video'] = _fmt_ts(min_mtime)
-    stats['newest_video'] = _fmt_ts(max_mtime)
+    stats['oldest_video'] = _fmt_ts(lib['oldest_video_mtime'])
+    stats['newest_video'] = _fmt_ts(lib['newest_video_mtime'])
     # Month navigation: default current month; allow prev/next by query
     today = date.today()
     try:
@@ -270,61 +364,12 @@ def index():
     except Exception:
         year, month = today.year, today.month
     # clamp month/year
-    if month < 1:
-        month = 12; year -= 1
-    if month > 12:
-        month = 1; year += 1
-    cal = calendar.Calendar(firstweekday=0)  # Monday=0 in Python docs? Actually Monday=0; but we want Mo..So display in UI.
-    month_days = [d for d in cal.itermonthdates(year, month)]
+    year, month = clamp_month(year, month)
+    if not 1 <= year <= 9999:
+        year, month = today.year, today.month
     # Build a matrix of weeks (each 7 days), mark if session exists for date
-    weeks = []
-    week = []
-    today_iso = date.today().isoformat()
-    for d in month_days:
-        week.append({
-            'date': d.isoformat(),
-            'day': d.day,
-            'in_month': (d.month == month),
-            'has': bool(date_map.get(d.isoformat(), [])),
-            'is_today': (d.isoformat() == today_iso)
-        })
-        if len(week) == 7:
-            weeks.append(week)
-            week = []
-    if week:
-        while len(week) < 7:
-            week.append({'date':'', 'day':'', 'in_month':False, 'has': False})
-        weeks.append(week)
-    # Hintergrund-Job anstoßen (Thumbnails generieren), blockiert nicht
-    if base_exists:
-        start_background_thumb_job(FPV_BASE)
-    # Pop just_logged_in flag so the sound plays only once
-    try:
-        just_logged_in = bool(session.pop('just_logged_in', False))
-    except Exception:
-        just_logged_in = False
-    # detect if configured admin is still using the literal default password 'admin'
-    admin_password_is_default = False
-    try:
-        expected_admin = os.environ.get('FPVWEB_USER', 'admin')
-        users = _load_users()
-        if expected_admin in users:
-            ph = users[expected_admin].get('password_hash', '')
-            if ph and check_password_hash(ph, 'admin'):
-                admin_password_is_default = True
-        else:
-            # no file-based user; fall back to env configured password
-            if os.environ.get('FPVWEB_PASS', 'admin') == 'admin':
-                admin_password_is_default = True
-    except Exception:
-        admin_password_is_default = False
-    # allow per-session suppression: if the admin chose 'don't show again' this session, don't prompt
-    try:
-        if session.get('suppress_admin_pw_prompt'):
-            admin_password_is_default = False
-    except Exception:
-        pass
-    return render_template(
+    weeks = month_weeks(year, month, date_map)
+    html = render_template(
         'modern_index_with_calendar.html',
         sessions=sessions,
         date_map=date_map,
@@ -339,6 +384,7 @@ def index():
     fpv_base_exists=base_exists,
     fpv_base_path=FPV_BASE
     )
+    return _store_page(key, html)
 
 
 @app.route('/api/admin/suppress-default-pw', methods=['POST'])
@@ -356,48 +402,158 @@ def api_admin_suppress_default_pw():
 def session_detail(session_name, sub):
     if not session.get('user'):
         return redirect(url_for('login', next=request.path))
-    sessions = get_cached_sessions(FPV_BASE)
-    for s in sessions:
-        if s['name'] == session_name and s['sub'] == sub:
-            # Compute session-specific stats
-            def _human_size(n):
-                units = ['B','KB','MB','GB','TB']
-                size = float(n)
-                i = 0
-                while size >= 1024 and i < len(units)-1:
-                    size /= 1024.0
-                    i += 1
-                return f"{size:.1f} {units[i]}"
-            def _human_duration(mins):
-                try:
-                    mins = int(mins)
-                except Exception:
-                    mins = 0
-                hours = mins // 60
-                rem = mins % 60
-                return f"{hours}h {rem:02d}m" if hours else f"{rem}m"
-            total_size_bytes = 0
-            for rel in s.get('videos', []):
-                try:
-                    abs_path = os.path.join(FPV_BASE, rel.replace('/', os.sep))
-                    total_size_bytes += os.path.getsize(abs_path)
-                except Exception:
-                    pass
-            s_stats = {
-                'videos': s.get('video_count', 0),
-                'images': s.get('image_count', 0),
-                'duration_min': (s.get('times') or {}).get('duration_min', 0),
-                'duration_human': _human_duration((s.get('times') or {}).get('duration_min', 0)),
-                'size_bytes': total_size_bytes,
-                'size_human': _human_size(total_size_bytes),
-            }
-            return render_template('session_detail.html', session=s, s_stats=s_stats)
+    # Missing thumbnails of the viewed session jump the backfill queue
+    prioritize_session_thumbs(FPV_BASE, session_name, sub)
+    key = _page_cache_key('detail', session_name, sub)
+    cached = _cached_page(key)
+    if cached is not None:
+        return cached
+    s = get_session_detail(FPV_BASE, session_name, sub)
+    if s is not None:
+        # Compute session-specific stats
+        def _human_size(n):
+            units = ['B','KB','MB','GB','TB']
+            size = float(n)
+            i = 0
+            while size >= 1024 and i < len(units)-1:
+                size /= 1024.0
+                i += 1
+            return f"{size:.1f} {units[i]}"
+        def _human_duration(mins):
+            try:
+                mins = int(mins)
+            except Exception:
+                mins = 0
+            hours = mins // 60
+            rem = mins % 60
+            return f"{hours}h {rem:02d}m" if hours else f"{rem}m"
+        # Video bytes are aggregated at index build time
+        total_size_bytes = s.get('total_size_bytes', 0) or 0
+        s_stats = {
+            'videos': s.get('video_count', 0),
+            'images': s.get('image_count', 0),
+            'duration_min': (s.get('times') or {}).get('duration_min', 0),
+            'duration_human': _human_duration((s.get('times') or {}).get('duration_min', 0)),
+            'size_bytes': total_size_bytes,
+            'size_human': _human_size(total_size_bytes),
+        }
+        return _store_page(key, render_template('session_detail.html', session=s, s_stats=s_stats))
     return 'Session nicht gefunden', 404
 
+@app.route('/api/calendar')
+def api_calendar():
+    """Month grid (?year=&month=) or whole-year heatmap (?year= only) from the date index; honours q like the index page."""
+    base_exists = bool(FPV_BASE) and os.path.isdir(FPV_BASE)
+    q = (request.args.get('q') or '').strip().lower()
+    if not base_exists:
+        date_counts = {}
+    elif q:
+        date_counts = get_library_stats(FPV_BASE, search_sessions(FPV_BASE, q))['date_counts']
+    else:
+        date_counts = get_library_stats(FPV_BASE)['date_counts']
+    today = date.today()
+    try:
+        year = int(request.args.get('year', today.year))
+        month = request.args.get('month')
+        month = int(month) if month not in (None, '') else None
+    except Exception:
+        return jsonify({'error': 'invalid year/month'}), 400
+    # date/calendar only know years 1..9999; the client wraps prev/next months itself
+    if not 1 <= year <= 9999 or (month is not None and not 1 <= month <= 12):
+        return jsonify({'error': 'invalid year/month'}), 400
+    if month is None:
+        return jsonify(year_heatmap(year, date_counts))
+    prefix = f"{year:04d}-{month:02d}-"
+    return jsonify({
+        'year': year,
+        'month': month,
+        'weeks': month_weeks(year, month, date_counts),
+        'total': sum(n for d, n in date_counts.items() if d.startswith(prefix)),
+    })
+
+@app.route('/api/sessions')
+def api_sessions():
+    """
+    Session summaries as JSON: ?q= (same syntax as the index page), sort=date|duration|size,
+    order=desc|asc, fields=a,b,c, limit=, cursor= (from next_cursor). Strong ETag per index version.
+    """
+    q = (request.args.get('q') or '').strip().lower()
+    sort = request.args.get('sort', 'date')
+    order = request.args.get('order', 'desc')
+    if sort not in SORTS or order not in ORDERS:
+        return jsonify({'error': 'invalid sort/order', 'sorts': list(SORTS), 'orders': list(ORDERS)}), 400
+    fields = [f.strip() for f in (request.args.get('fields') or '').split(',') if f.strip()] or list(FIELDS)
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown:
+        return jsonify({'error': 'unknown fields', 'fields': unknown, 'allowed': list(FIELDS)}), 400
+    try:
+        limit = max(1, min(MAX_LIMIT, int(request.args.get('limit', DEFAULT_LIMIT))))
+    except Exception:
+        return jsonify({'error': 'invalid limit'}), 400
+    cursor = request.args.get('cursor') or None
+    try:
+        cursor_key = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    base_exists = bool(FPV_BASE) and os.path.isdir(FPV_BASE)
+    if base_exists:
+        get_cached_sessions(FPV_BASE)
+    # The response only depends on the index version and the normalised query
+    tag_src = json.dumps([get_index_version(), os.path.abspath(FPV_BASE or ''), q, sort, order, fields, limit, cursor])
+    etag = hashlib.sha1(tag_src.encode('utf-8')).hexdigest()
+    if request.if_none_match and request.if_none_match.contains(etag):
+        resp = make_response('', 304)
+        resp.set_etag(etag)
+        return resp
+
+    keys, items = sorted_sessions(FPV_BASE, sort, q) if base_exists else ([], [])
+    try:
+        page, next_cursor = paginate(keys, items, order, cursor_key, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    resp = jsonify({
+        'items': [select_fields(s, fields) for s in page],
+        'count': len(items),
+        'next_cursor': next_cursor,
+        'version': get_index_version(),
+    })
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def _send_media(rel_path: str, as_attachment: bool = False):
+    """
+    Send a file below FPV_BASE.
+
+    With X_ACCEL_MEDIA set, Flask only resolves the path and answers with an
+    X-Accel-Redirect: nginx then serves the bytes (sendfile, Range, conditional
+    requests) and the gunicorn worker is free right away. Without nginx the file is
+    sent by Werkzeug (conditional + Range, sendfile through the server's file wrapper).
+    """
+    if not X_ACCEL_MEDIA:
+        return send_from_directory(FPV_BASE, rel_path, as_attachment=as_attachment, conditional=True)
+    abs_path = safe_join(FPV_BASE, rel_path)
+    if abs_path is None or not os.path.isfile(abs_path):
+        return ('Not Found', 404)
+    rel = os.path.relpath(abs_path, FPV_BASE).replace('\\', '/')
+    resp = make_response('')
+    resp.headers['X-Accel-Redirect'] = f"{X_ACCEL_MEDIA}/{quote(rel)}"
+    resp.mimetype = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+    if as_attachment:
+        name = os.path.basename(rel)
+        # same header as send_file: ASCII fallback plus RFC 5987 filename* for non-ASCII names
+        simple = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        if simple == name:
+            resp.headers.set('Content-Disposition', 'attachment', filename=name)
+        else:
+            resp.headers.set('Content-Disposition', 'attachment', filename=simple,
+                             **{'filename*': "UTF-8''" + quote(name, safe="!#$&+^`|~")})
+    return resp
+
 @app.route('/download/<path:filepath>')
 def download(filepath):
-    dirpath = FPV_BASE
-    return send_from_directory(dirpath, filepath, as_attachment=True)
+    return _send_media(filepath, as_attachment=True)
 
 @app.route('/media/<path:filepath>')
 def media(filepath):
@@ -412,7 +568,7 @@ def media(filepath):
     # Try the straightforward resolved path firsts
     norm = os.path.abspath(os.path.normpath(os.path.join(dirpath, *([p for p in req.split('/') if p]))))
     def _send(rel_path):
-        resp = send_from_directory(dirpath, rel_path, as_attachment=False, conditional=True)
+        resp = _send_media(rel_path)
         try:
             resp.headers['Access-Control-Allow-Origin'] = '*'
             resp.headers.setdefault('Accept-Ranges', 'bytes')
@@ -434,19 +590,54 @@ def media(filepath):
     except Exception:
         pass
 
-    # Final fallback: search for file by basename under FPV_BASE (expensive but useful during dev)
+    # Final fallback: same basename elsewhere in the library (index lookup, misses cached until the index changes)
     try:
-        target_basename = os.path.basename(req)
-        for root, dirs, files in os.walk(dirpath):
-            if target_basename in files:
-                found = os.path.join(root, target_basename)
-                rel = os.path.relpath(found, dirpath).replace('\\', '/')
-                return _send(rel)
-    except Exception:
-        pass
+        rel = resolve_media_fallback(dirpath, req, request.referrer)
+        if rel:
+            return _send(rel)
+    except Exception as e:
+        print('media fallback failed:', e)
 
     return ('Not Found', 404)
 
+# Widths offered in srcset for grid tiles and cards (snapped to image_derivatives.WIDTHS)
+SRCSET_WIDTHS = (320, 480, 640, 960)
+
+@app.template_global()
+def img_srcset(rel: str, widths=SRCSET_WIDTHS) -> str:
+    """srcset value for an image below FPV_BASE served through /img."""
+    return ', '.join(f"/img/{w}/{rel} {w}w" for w in widths)
+
+@app.route('/img/<int:width>/<path:filepath>')
+def image_resized(width, filepath):
+    # Verkleinerte Bilder (WebP/JPEG) aus dem Derivat-Cache; ohne Pillow das Original
+    base_abs = os.path.abspath(FPV_BASE)
+    src = os.path.abspath(os.path.normpath(os.path.join(base_abs, *[p for p in unquote(filepath).split('/') if p])))
+    if not src.startswith(base_abs + os.sep) or not src.lower().endswith(('.jpg', '.jpeg', '.png')) or not os.path.isfile(src):
+        return ('Not Found', 404)
+    rel = os.path.relpath(src, base_abs).replace('\\', '/')
+    webp = 'image/webp' in (request.headers.get('Accept') or '')
+    res = image_derivatives.derivative(src, rel, width, webp=webp)
+    if res is None:
+        return media(rel)
+    path, mimetype = res
+    resp = send_file(path, mimetype=mimetype, conditional=True, max_age=7 * 24 * 3600)
+    # WebP vs JPEG depends on the Accept header
+    resp.headers['Vary'] = 'Accept'
+    return resp
+
+@app.route('/derived/<path:relpath>')
+def derived(relpath):
+    # Thumbnails/Sprites/Clips aus dem Derivat-Cache: der Pfad enthält den Fingerprint der Quelle -> immutable
+    if not DERIVED.root:
+        return ('Not Found', 404)
+    resp = send_from_directory(DERIVED.root, relpath, conditional=True, max_age=365 * 24 * 3600)
+    resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    if relpath.endswith('.vtt'):
+        resp.mimetype = 'text/vtt'
+    DERIVED.touch(DERIVED.abs(relpath))
+    return resp
+
 @app.route('/api/session/<session>/<sub>/tags', methods=['GET', 'POST'])
 def api_session_tags(session, sub):
     if request.method == 'GET':
@@ -493,25 +684,24 @@ def api_get_session_log(session_folder, sub):
     if not session.get('user'):
         return jsonify({'error': 'authentication required'}), 401
     # Find the primary .txt log in session.logs if present
-    sessions = get_cached_sessions(FPV_BASE)
-    for s in sessions:
-        if s['name'] == session_folder and s['sub'] == sub:
-            # prefer first .txt in logs list
-            logs = s.get('logs') or []
-            if not logs:
-                return jsonify({'error': 'no log found'}), 404
-            # choose first log filename
-            rel = logs[0]
-            fname = os.path.basename(rel)
-            abs_path = _resolve_session_path(session_folder, sub, fname)
-            if not abs_path or not os.path.exists(abs_path):
-                return jsonify({'error': 'not found'}), 404
-            try:
-                with open(abs_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                return jsonify({'filename': fname, 'content': content})
-            except Exception as e:
-                return jsonify({'error': 'could not read file', 'detail': str(e)}), 500
+    s = get_session_detail(FPV_BASE, session_folder, sub)
+    if s is not None:
+        # prefer first .txt in logs list
+        logs = s.get('logs') or []
+        if not logs:
+            return jsonify({'error': 'no log found'}), 404
+        # choose first log filename
+        rel = logs[0]
+        fname = os.path.basename(rel)
+        abs_path = _resolve_session_path(session_folder, sub, fname)
+        if not abs_path or not os.path.exists(abs_path):
+            return jsonify({'error': 'not found'}), 404
+        try:
+            with open(abs_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            return jsonify({'filename': fname, 'content': content})
+        except Exception as e:
+            return jsonify({'error': 'could not read file', 'detail': str(e)}), 500
     return jsonify({'error':'session not found'}), 404
 
 
@@ -537,35 +727,34 @@ def api_save_session_log(session_folder, sub):
         return jsonify({'error':'content required'}), 400
 
     # locate primary log filename from session metadata
-    sessions = get_cached_sessions(FPV_BASE)
-    for s in sessions:
-        if s['name'] == session_folder and s['sub'] == sub:
-            logs = s.get('logs') or []
-            if not logs:
-                return jsonify({'error':'no log found to overwrite'}), 404
-            rel = logs[0]
-            fname = os.path.basename(rel)
-            abs_path = _resolve_session_path(session_folder, sub, fname)
-            if not abs_path:
-                return jsonify({'error':'invalid path'}), 400
+    s = get_session_detail(FPV_BASE, session_folder, sub)
+    if s is not None:
+        logs = s.get('logs') or []
+        if not logs:
+            return jsonify({'error':'no log found to overwrite'}), 404
+        rel = logs[0]
+        fname = os.path.basename(rel)
+        abs_path = _resolve_session_path(session_folder, sub, fname)
+        if not abs_path:
+            return jsonify({'error':'invalid path'}), 400
+        try:
+            # create a timestamped backup of existing file before overwriting
             try:
-                # create a timestamped backup of existing file before overwriting
-                try:
-                    if os.path.exists(abs_path):
-                        ts = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        bak = abs_path + f'.bak.{ts}'
-                        shutil.copy2(abs_path, bak)
-                except Exception:
-                    # backup failure should not prevent saving, but log to stdout
-                    print('⚠️ Backup failed for', abs_path)
-
-                with open(abs_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                # Update cache in-memory if present
-                # no additional cache action required here
-                return jsonify({'ok': True, 'filename': fname})
-            except Exception as e:
-                return jsonify({'error': 'could not save file', 'detail': str(e)}), 500
+                if os.path.exists(abs_path):
+                    ts = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    bak = abs_path + f'.bak.{ts}'
+                    shutil.copy2(abs_path, bak)
+            except Exception:
+                # backup failure should not prevent saving, but log to stdout
+                print('⚠️ Backup failed for', abs_path)
+
+            with open(abs_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            # Update cache in-memory if present
+            # no additional cache action required here
+            return jsonify({'ok': True, 'filename': fname})
+        except Exception as e:
+            return jsonify({'error': 'could not save file', 'detail': str(e)}), 500
     return jsonify({'error':'session not found'}), 404
 
 @app.route('/api/status')
@@ -604,6 +793,10 @@ def api_status():
         'session_count': len(sessions),
         'progress': progress,
         'ready': bool(ready),
+        # Thumbnail engine: total/done/failed, running items, avg and ETA of the current batch + queue sizes
+        'thumbs': dict(thumb_engine.status(), **thumb_backfill_status()),
+        'images': image_derivatives.stats(),
+        'derived': DERIVED.stats(),
     })
 
 # Flask 3.x: before_first_request removed. Do a thread-safe warm-once on first request.
@@ -626,6 +819,10 @@ def _warm_cache_once():
             start_background_thumb_job(FPV_BASE)
         except Exception as e:
             print('Start thumb job failed:', e)
+        try:
+            start_session_watcher(FPV_BASE)
+        except Exception as e:
+            print('Start session watcher failed:', e)
         _warm_done = True
 
 @app.before_request
@@ -721,9 +918,51 @@ def api_admin_sessions_folder():
         _ = get_cached_sessions(FPV_BASE)
     except Exception as e:
         print('rebuild after FPV_BASE change failed:', e)
+    try:
+        start_session_watcher(FPV_BASE)
+    except Exception as e:
+        print('restart session watcher failed:', e)
     return jsonify({'ok': True, 'FPV_BASE': FPV_BASE})
 
 
+# Admin API: rebuild sessions index now (waits for the build, bounded by timeout)
+@app.route('/api/admin/rebuild-sessions', methods=['POST'])
+def api_admin_rebuild_sessions():
+    if not session.get('user') or session.get('user') != os.environ.get('FPVWEB_USER', 'admin'):
+        return jsonify({'error': 'admin required'}), 403
+    if not FPV_BASE or not os.path.isdir(FPV_BASE):
+        return jsonify({'error': 'sessions folder not found'}), 400
+    data = request.get_json(silent=True) or {}
+    try:
+        timeout = min(600.0, max(0.0, float(data.get('timeout', 120))))
+    except Exception:
+        timeout = 120.0
+    done = request_refresh(FPV_BASE, wait=True, timeout=timeout)
+    sessions = get_cached_sessions(FPV_BASE)
+    if not done:
+        # Still running in the background; the index page keeps serving the previous index
+        return jsonify({'ok': True, 'done': False, 'session_count': len(sessions)}), 202
+    return jsonify({'ok': True, 'done': True, 'session_count': len(sessions)})
+
+
+@app.route('/api/admin/index-memory')
+def api_admin_index_memory():
+    if not session.get('user') or session.get('user') != os.environ.get('FPVWEB_USER', 'admin'):
+        return jsonify({'error': 'admin required'}), 403
+    return jsonify(index_memory_report())
+
+
+@app.route('/api/admin/metrics')
+def api_admin_metrics():
+    """Prometheus text format: request latency/size histograms, scan phases, subprocesses, sorter jobs (merged over all workers)."""
+    if not session.get('user') or session.get('user') != os.environ.get('FPVWEB_USER', 'admin'):
+        return jsonify({'error': 'admin required'}), 403
+    resp = make_response(metrics.render_text())
+    resp.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+
 @app.before_request
 def _check_revoked_users():
     # If a user's session has been revoked by admin, log them out on next request
@@ -965,6 +1204,8 @@ def _is_video_file(fn: str):
 def _probe_duration_seconds(path: str):
     # Prefer local ffprobe.exe if present; else rely on ffprobe in PATH
     exe = FFPROBE_EXE if os.path.exists(FFPROBE_EXE) else 'ffprobe'
+    start = time.perf_counter()
+    ok = False
     try:
         # Windows-safe call
         out = subprocess.check_output([
@@ -975,9 +1216,12 @@ def _probe_duration_seconds(path: str):
             path
         ], stderr=subprocess.STDOUT, shell=False)
         s = out.decode('utf-8', errors='ignore').strip()
+        ok = True
         return int(float(s)) if s else 0
     except Exception:
         return 0
+    finally:
+        metrics.SUBPROCESS_SECONDS.observe(time.perf_counter() - start, tool='ffprobe', ok=str(ok).lower())
 
 @app.route('/create-sessions')
 def create_sessions_page():
@@ -1066,6 +1310,19 @@ def _start_sorter_job(script_name: str):
     status = {'running': True, 'exit_code': None}
 
     def runner():
+        started = time.perf_counter()
+        # Input folder at job start: files/bytes processed per job (sorter throughput)
+        n_files, n_bytes = 0, 0
+        try:
+            with os.scandir(_get_sorter_input_dir()) as it:
+                for e in it:
+                    if e.is_file():
+                        n_files += 1
+                        n_bytes += e.stat().st_size
+        except OSError:
+            pass
+        metrics.SORTER_FILES.inc(n_files, script=script_name)
+        metrics.SORTER_BYTES.inc(n_bytes, script=script_name)
         try:
             script_path = os.path.join(AUTO_SORTER_DIR, script_name)
             # Use current python executable
@@ -1086,6 +1343,8 @@ def _start_sorter_job(script_name: str):
                 log_lines.append(f"[error] {e}")
                 status['running'] = False
                 status['exit_code'] = -1
+        metrics.SORTER_JOB_SECONDS.observe(time.perf_counter() - started, script=script_name)
+        metrics.SORTER_JOBS.inc(script=script_name, status='ok' if status['exit_code'] == 0 else 'failed')
 
     import threading
     t = threading.Thread(target=runner, daemon=True)
@@ -1359,5 +1618,46 @@ def list_share_links():
         ]
     })
 
+@app.cli.group('cache')
+def cache_cli():
+    """Derived cache (thumbnails, sprites, preview clips) maintenance."""
+
+@cache_cli.command('verify')
+@click.option('--requeue', is_flag=True, help='Queue videos with missing derivatives for the backfill.')
+def cache_verify(requeue):
+    """Compare the derived cache with the indexed videos."""
+    report = verify_derived(derived_fingerprints())
+    click.echo(f"📦 {DERIVED.root}: {report['files']} Dateien, {report['bytes'] / 1024 / 1024:.1f} MB")
+    click.echo(f"🖼️ Thumbnails: {report['thumbs']} / {report['expected']} Videos")
+    click.echo(f"🗑️ Verwaist: {len(report['orphans'])} | ⚠️ Defekt: {len(report['broken'])}")
+    if requeue:
+        click.echo(f"🔁 {requeue_missing_previews(FPV_BASE)} Videos eingereiht")
+
+@cache_cli.command('prune')
+@click.option('--legacy', is_flag=True, help='Also delete old *_thumb.jpg/_sprite/_preview files inside FPV_BASE.')
+@click.option('--dry-run', is_flag=True, help='Only list what would be deleted.')
+def cache_prune(legacy, dry_run):
+    """Delete orphaned and broken derivatives, then evict down to DERIVED_CACHE_MB."""
+    report = verify_derived(derived_fingerprints())
+    doomed = report['orphans'] + report['broken']
+    if legacy:
+        for root, _dirs, files in os.walk(FPV_BASE):
+            doomed.extend(os.path.join(root, f) for f in files if f.lower().endswith(LEGACY_DERIVED))
+    freed = 0
+    for path in doomed:
+        if dry_run:
+            click.echo(path)
+            continue
+        try:
+            freed += os.path.getsize(path)
+            os.remove(path)
+        except OSError as e:
+            click.echo(f"❌ {path}: {e}")
+    if dry_run:
+        click.echo(f"🔍 {len(doomed)} Dateien würden entfernt")
+        return
+    removed, evicted = DERIVED.evict()
+    click.echo(f"🧹 {len(doomed) + removed} Dateien entfernt ({(freed + evicted) / 1024 / 1024:.1f} MB)")
+
 if __name__ == '__main__':
     app.run(debug=True)
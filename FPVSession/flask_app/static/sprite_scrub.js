@@ -0,0 +1,55 @@
+// Hover-scrub from a sprite sheet + WebVTT index (see utils/sprite_utils.py).
+// One small JPEG per video instead of streaming the video itself on hover.
+(function(){
+  const cache = new Map();  // vtt url -> Promise({sheet, cues, duration})
+
+  function parseTime(t){
+    const p = t.trim().split(':').map(Number);
+    return p.length === 3 ? p[0] * 3600 + p[1] * 60 + p[2] : p[0] * 60 + p[1];
+  }
+
+  function load(vttUrl){
+    if (!cache.has(vttUrl)){
+      const p = fetch(vttUrl, {credentials: 'same-origin'}).then(r => {
+        if (!r.ok) throw new Error('sprite vtt ' + r.status);
+        return r.text();
+      }).then(text => {
+        const cues = [];
+        const blocks = text.replace(/\r/g, '').split('\n\n');
+        blocks.forEach(b => {
+          const lines = b.split('\n').filter(Boolean);
+          const i = lines.findIndex(l => l.includes('-->'));
+          if (i < 0 || !lines[i + 1]) return;
+          const [from, to] = lines[i].split('-->');
+          const [file, frag] = lines[i + 1].split('#xywh=');
+          const [x, y, w, h] = (frag || '').split(',').map(Number);
+          cues.push({start: parseTime(from), end: parseTime(to), file: file.trim(), x, y, w, h});
+        });
+        if (!cues.length) throw new Error('empty sprite vtt');
+        const sheet = new URL(cues[0].file, new URL(vttUrl, window.location.href)).href;
+        const sheetW = Math.max(...cues.map(c => c.x + c.w));
+        const sheetH = Math.max(...cues.map(c => c.y + c.h));
+        // warm the image so the first move already shows a frame
+        const img = new Image();
+        img.src = sheet;
+        return {sheet, cues, sheetW, sheetH, duration: cues[cues.length - 1].end};
+      });
+      p.catch(() => cache.delete(vttUrl));
+      cache.set(vttUrl, p);
+    }
+    return cache.get(vttUrl);
+  }
+
+  // Show the tile for fraction (0..1) of the video in el, scaled to el's size
+  function show(el, data, fraction){
+    const f = Math.min(0.9999, Math.max(0, fraction));
+    const cue = data.cues[Math.min(data.cues.length - 1, Math.floor(f * data.cues.length))];
+    const sx = el.clientWidth / cue.w, sy = el.clientHeight / cue.h;
+    el.style.backgroundImage = 'url("' + data.sheet + '")';
+    el.style.backgroundSize = (data.sheetW * sx) + 'px ' + (data.sheetH * sy) + 'px';
+    el.style.backgroundPosition = (-cue.x * sx) + 'px ' + (-cue.y * sy) + 'px';
+    return cue;
+  }
+
+  window.FPVSprites = {load, show};
+})();
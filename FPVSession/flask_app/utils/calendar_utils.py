@@ -0,0 +1,65 @@
+"""
+Calendar views over the date -> session count index (session_stats 'date_counts').
+
+Used by the index page for its initial month and by /api/calendar for month
+switches and the whole-year heatmap, so neither needs the session list itself.
+"""
+
+import calendar
+from datetime import date
+
+
+def clamp_month(year: int, month: int):
+    """Wrap month 0 / 13 into the previous / next year (prev/next buttons)."""
+    if month < 1:
+        return year - 1, 12
+    if month > 12:
+        return year + 1, 1
+    return year, month
+
+
+def month_weeks(year: int, month: int, date_counts: dict) -> list:
+    """6x7-style grid (weeks starting Monday) with per-day session counts."""
+    cal = calendar.Calendar(firstweekday=0)
+    today_iso = date.today().isoformat()
+    weeks = []
+    week = []
+    # (y, m, d) tuples instead of dates: the padding days of 9999-12 would overflow date
+    for y, m, d in cal.itermonthdays3(year, month):
+        iso = f"{y:04d}-{m:02d}-{d:02d}"
+        count = date_counts.get(iso, 0)
+        week.append({
+            'date': iso,
+            'day': d,
+            'in_month': (m == month),
+            'has': bool(count),
+            'count': count,
+            'is_today': (iso == today_iso)
+        })
+        if len(week) == 7:
+            weeks.append(week)
+            week = []
+    if week:
+        while len(week) < 7:
+            week.append({'date': '', 'day': '', 'in_month': False, 'has': False, 'count': 0})
+        weeks.append(week)
+    return weeks
+
+
+def year_heatmap(year: int, date_counts: dict) -> dict:
+    """Session counts of every day with sessions in `year`, per-month totals and the busiest day's count."""
+    prefix = f"{year:04d}-"
+    days = {d: n for d, n in date_counts.items() if d.startswith(prefix)}
+    months = [0] * 12
+    for d, n in days.items():
+        try:
+            months[int(d[5:7]) - 1] += n
+        except (ValueError, IndexError):
+            pass
+    return {
+        'year': year,
+        'days': dict(sorted(days.items())),
+        'months': months,
+        'total': sum(months),
+        'max': max(days.values()) if days else 0,
+    }
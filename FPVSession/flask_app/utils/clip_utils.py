@@ -0,0 +1,60 @@
+"""
+Short muted preview clips for the session cards.
+
+Instead of streaming the smallest original file through a gunicorn worker on every
+card hover, the backfill cuts a few seconds out of the session's preview video
+(input seek to ~30 % of its duration, 360p, H.264 at a capped low bitrate,
+faststart) - a few hundred KB that the browser can fetch in one go.
+"""
+
+import os
+import time
+import threading
+import subprocess
+try:
+    from .metrics import SUBPROCESS_SECONDS
+    from .sprite_utils import probe_duration
+except Exception:
+    # script fallback
+    from flask_app.utils.metrics import SUBPROCESS_SECONDS
+    from flask_app.utils.sprite_utils import probe_duration
+
+
+def generate_preview_clip(video_path: str, clip_path: str, timeout: float = 120, seconds: float = 6,
+                          kbps: int = 400, height: int = 360) -> bool:
+    """Generate a muted, low-bitrate mp4 preview clip for a video. Returns True if successful."""
+    tmp_path = f"{clip_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(clip_path), exist_ok=True)
+        duration = probe_duration(video_path)
+        # skip the take-off: start at 30 % but keep the full clip length inside the video
+        start_at = max(0.0, min(duration * 0.3, duration - seconds)) if duration > 0 else 0.0
+
+        cmd = [
+            'ffmpeg', '-y',
+            '-ss', f'{start_at:.2f}',  # input seek: jumps to the keyframe, no decoding up to there
+            '-i', video_path,
+            '-t', f'{seconds:.2f}',
+            '-an', '-sn', '-dn',
+            '-vf', f'scale=-2:{height}',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            '-b:v', f'{kbps}k', '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k',
+            '-movflags', '+faststart',
+            '-f', 'mp4',
+            tmp_path
+        ]
+        start = time.perf_counter()
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        ok = result.returncode == 0 and os.path.getsize(tmp_path) > 0
+        if ok:
+            os.replace(tmp_path, clip_path)
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - start, tool='ffmpeg_clip', ok=str(ok).lower())
+        return ok
+    except Exception as e:
+        print(f"❌ Preview clip generation failed for {video_path}: {e}")
+        return False
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
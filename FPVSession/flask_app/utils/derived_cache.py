@@ -0,0 +1,217 @@
+"""
+Content-addressed cache for generated derivatives, outside the footage tree.
+
+Thumbnails, sprite sheets and preview clips used to be written as
+`<video>_thumb.jpg` etc. into each session's IMG folder. They now live in
+DERIVED_CACHE_DIR, keyed by a fingerprint of the source video:
+
+    sha1("<rel path>\\0<size>\\0<mtime>")  ->  <dir>/ab/cd/<fingerprint>.<kind>
+
+A replaced or edited video gets a new fingerprint, so a stale derivative is never
+served and the files can be sent as immutable. Two shard levels keep directories
+small even for 100k+ files. FPV_BASE is only ever read (it can be mounted read-only)
+and backups of the footage no longer carry regenerated artifacts.
+
+DiskCache is the size-bounded store behind it (also used by image_derivatives):
+hits set the atime, and once the total exceeds the cap the least recently used
+files are evicted in atime order, which all workers on the host share. Keys
+returned by the `pinned` hook are never evicted: for DERIVED these are the
+fingerprints of all indexed videos, whose records point at the files (an evicted
+preview would 404 until its sub-session changes). Eviction therefore only removes
+derivatives of changed or deleted videos; if the pinned files alone exceed the cap
+a warning is printed instead of evicting on every write.
+"""
+
+import os
+import time
+import hashlib
+import threading
+
+# kind -> file suffix (the sprite VTT references its sheet by the same stem, see sprite_utils)
+KINDS = {
+    'thumb': 'thumb.jpg',
+    'sprite': 'sprite.vtt',
+    'sheet': 'sprite.jpg',
+    'clip': 'preview.mp4',
+}
+
+
+def fingerprint(rel: str, size: int, mtime: float) -> str:
+    """Cache key of a source file: its path below FPV_BASE plus size and mtime."""
+    return hashlib.sha1(f"{rel}\0{int(size)}\0{float(mtime):.6f}".encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """Sharded file cache with a size cap and LRU (atime) eviction."""
+
+    def __init__(self, root=None, max_bytes=0, pinned=None):
+        self.root = root
+        self.max_bytes = max_bytes  # 0: unbounded
+        self.pinned = pinned  # optional () -> set of keys that must not be evicted
+        self._lock = threading.Lock()
+        self._total = None  # estimated size in bytes (None: not scanned yet)
+        self._stuck = 0  # size the last eviction could not get below (pinned files)
+
+    def configure(self, root=None, max_mb=None):
+        if root:
+            self.root = root
+            self._total = None
+        if max_mb is not None:
+            self.max_bytes = max(0, int(float(max_mb) * 1024 * 1024))
+
+    def rel(self, key: str, ext: str) -> str:
+        return f"{key[:2]}/{key[2:4]}/{key}.{ext}"
+
+    def path(self, key: str, ext: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}.{ext}")
+
+    def abs(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split('/'))
+
+    def touch(self, path: str):
+        # explicit atime update (independent of noatime/relatime); the mtime, and with it ETags, stay put
+        try:
+            st = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except OSError:
+            pass
+
+    def write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.added(len(data))
+
+    def scan(self) -> list:
+        """[(atime, size, path)] of all cached files."""
+        out = []
+        if not self.root:
+            return out
+        for root, _dirs, files in os.walk(self.root):
+            for name in files:
+                p = os.path.join(root, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                out.append((st.st_atime, st.st_size, p))
+        return out
+
+    def added(self, nbytes: int):
+        """Account for a newly written file; evict least recently used files once the cap is exceeded."""
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _a, size, _p in self.scan())
+            else:
+                self._total += nbytes
+            over = self.max_bytes and self._total > max(self.max_bytes, self._stuck)
+        if over:
+            self.evict()
+
+    def evict(self, target=None) -> tuple:
+        """Remove least recently used files until the cache is below target (default 90 % of the cap). Returns (files, bytes)."""
+        if not self.max_bytes and target is None:
+            return 0, 0
+        keep = self.pinned() if self.pinned else ()
+        with self._lock:
+            # other workers write into the same directory: re-read before evicting
+            files = sorted(self.scan())
+            total = sum(size for _a, size, _p in files)
+            target = self.max_bytes * 0.9 if target is None else target
+            removed = freed = 0
+            for _atime, size, path in files:
+                if total <= target:
+                    break
+                if os.path.basename(path).split('.', 1)[0] in keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                freed += size
+            self._total = total
+            # only pinned files left: evict again once another 10 % of the cap was written
+            self._stuck = total + self.max_bytes * 0.1 if total > target else 0
+        if removed:
+            print(f"🧹 Cache {self.root}: {removed} Dateien entfernt ({total / 1024 / 1024:.0f} MB)")
+        if self._stuck:
+            print(f"⚠️ Cache {self.root}: {total / 1024 / 1024:.0f} MB in Benutzung, über dem Limit von "
+                  f"{self.max_bytes / 1024 / 1024:.0f} MB (Limit erhöhen)")
+        return removed, freed
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._total
+        return {
+            'cache_dir': self.root,
+            'cache_mb': round((total or 0) / 1024 / 1024, 1),
+            'max_mb': round(self.max_bytes / 1024 / 1024, 1),
+        }
+
+
+# Thumbnails, sprites and preview clips of the indexed videos
+DERIVED = DiskCache(max_bytes=20 * 1024 * 1024 * 1024)
+
+
+def derived_rel(fp: str, kind: str) -> str:
+    """Path of a derivative below the cache dir (what /derived/<path> serves)."""
+    return DERIVED.rel(fp, KINDS[kind])
+
+
+def derived_path(fp: str, kind: str) -> str:
+    return DERIVED.path(fp, KINDS[kind])
+
+
+def has(fp: str, kind: str) -> bool:
+    return bool(DERIVED.root) and os.path.exists(derived_path(fp, kind))
+
+
+def _age(path: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def verify(expected: set) -> dict:
+    """
+    Check the cache against the fingerprints of the indexed videos.
+
+    orphans: files whose fingerprint belongs to no indexed video (deleted/changed source)
+    broken:  empty files, leftover temp files and sprite sheets/VTTs without their partner
+    """
+    orphans, broken = [], []
+    total = count = 0
+    present = {}
+    for _atime, size, path in DERIVED.scan():
+        total += size
+        count += 1
+        name = os.path.basename(path)
+        fp, _, suffix = name.partition('.')
+        if suffix.endswith('.tmp'):
+            # a generation in progress writes a temp file too; only stale ones are leftovers
+            if _age(path) > 3600:
+                broken.append(path)
+            continue
+        if suffix not in KINDS.values() or size == 0:
+            broken.append(path)
+            continue
+        present.setdefault(fp, set()).add(suffix)
+        if fp not in expected:
+            orphans.append(path)
+    for fp, suffixes in present.items():
+        if fp in expected and (KINDS['sprite'] in suffixes) != (KINDS['sheet'] in suffixes):
+            broken.extend(os.path.join(DERIVED.root, fp[:2], fp[2:4], f"{fp}.{s}") for s in suffixes
+                          if s in (KINDS['sprite'], KINDS['sheet']))
+    return {
+        'files': count,
+        'bytes': total,
+        'orphans': orphans,
+        'broken': broken,
+        'thumbs': sum(1 for fp, s in present.items() if fp in expected and KINDS['thumb'] in s),
+        'expected': len(expected),
+    }
@@ -0,0 +1,112 @@
+"""
+Resized image derivatives for grids and cards (/img/<w>/<path>).
+
+Camera JPEGs are several MB; a grid tile needs a few KB. A derivative is made on
+the first request and kept in a disk cache outside FPV_BASE:
+
+- widths snap up to a fixed ladder (WIDTHS), so the cache holds a bounded number of
+  variants per image and srcset candidates always hit the same files
+- Pillow decodes at reduced scale (JPEG draft mode), applies the EXIF
+  orientation and writes WebP (if the client accepts it) or JPEG
+- the cache is a size-bounded DiskCache (see derived_cache): hits set the file atime,
+  and once the total exceeds IMG_CACHE_MB the least recently used files are evicted
+  (the mtime stays put so ETags/Last-Modified of a derivative do not change)
+
+Pillow is optional: without it derivative() returns None and the caller serves the original.
+"""
+
+import io
+import os
+import hashlib
+try:
+    from .derived_cache import DiskCache
+except Exception:
+    # script fallback
+    from flask_app.utils.derived_cache import DiskCache
+
+try:
+    from PIL import Image, ImageOps, features
+    _HAS_WEBP = bool(features.check('webp'))
+except ImportError:  # optional dependency: resize disabled, originals are served
+    Image = None
+    _HAS_WEBP = False
+
+WIDTHS = (160, 320, 480, 640, 960, 1280, 1920)
+_SETTINGS = {
+    'quality': 80,
+}
+IMG_CACHE = DiskCache(max_bytes=512 * 1024 * 1024)
+
+
+def configure(cache_dir=None, max_mb=None, quality=None):
+    IMG_CACHE.configure(root=cache_dir, max_mb=max(1.0, float(max_mb)) if max_mb is not None else None)
+    if quality is not None:
+        _SETTINGS['quality'] = min(95, max(30, int(quality)))
+
+
+def snap_width(w: int) -> int:
+    """Smallest ladder width >= w (largest ladder width for anything bigger)."""
+    for width in WIDTHS:
+        if w <= width:
+            return width
+    return WIDTHS[-1]
+
+
+def _cache_path(rel: str, st, width: int, ext: str) -> str:
+    # source size + mtime in the key: an edited image never hits a stale derivative
+    key = hashlib.sha1(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\0{width}".encode('utf-8')).hexdigest()
+    return IMG_CACHE.path(key, ext)
+
+
+def _resize(src: str, width: int, fmt: str) -> bytes:
+    with Image.open(src) as im:
+        # JPEG draft mode: let the decoder downscale by 1/2..1/8 before the real resize
+        im.draft('RGB', (width, width * 4))
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGB')
+        if im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        buf = io.BytesIO()
+        if fmt == 'webp':
+            im.save(buf, 'WEBP', quality=_SETTINGS['quality'], method=4)
+        else:
+            im.convert('RGB').save(buf, 'JPEG', quality=_SETTINGS['quality'], optimize=True, progressive=True)
+        return buf.getvalue()
+
+
+def derivative(abs_src: str, rel: str, width: int, webp: bool = False):
+    """
+    (cached file path, mimetype) of abs_src resized to the ladder width >= width,
+    or None if it cannot be made (no Pillow, unreadable file).
+    """
+    if not IMG_CACHE.root:
+        return None
+    try:
+        st = os.stat(abs_src)
+    except OSError:
+        return None
+    width = snap_width(width)
+    fmt = 'webp' if (webp and _HAS_WEBP) else 'jpg'
+    path = _cache_path(rel, st, width, fmt)
+    if os.path.exists(path):
+        IMG_CACHE.touch(path)
+        return path, 'image/webp' if fmt == 'webp' else 'image/jpeg'
+
+    if Image is None:
+        return None
+    try:
+        data = _resize(abs_src, width, fmt)
+    except Exception as e:
+        print(f"❌ Bild-Derivat fehlgeschlagen für {rel}: {e}")
+        return None
+    IMG_CACHE.write(path, data)
+    return path, 'image/webp' if fmt == 'webp' else 'image/jpeg'
+
+
+def stats() -> dict:
+    return {
+        'pillow': Image is not None,
+        'webp': _HAS_WEBP,
+        **IMG_CACHE.stats(),
+    }
@@ -0,0 +1,152 @@
+"""
+Versioned, immutable sessions index snapshots shared by all workers on a host.
+
+Exactly one process per host holds the builder lock (flock on `<snapshot>.lock`)
+and scans; it publishes each new index as a snapshot file that is written to a
+temp file and atomically renamed, so a published version never changes. Every
+worker maps the snapshot read-only, checks only the fixed-size header for the
+version and decodes the payload when the version moved.
+
+File layout: MAGIC (8 bytes) | version (u64) | built_at (f64) | payload length (u64) | payload (UTF-8 JSON)
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server, every process is its own builder
+    fcntl = None
+
+MAGIC = b'FPVSNAP1'
+_HEADER = struct.Struct('<8sQdQ')
+
+_lock = threading.Lock()
+_builder_fh = {}
+
+
+def _lock_path(snapshot_path: str) -> str:
+    return snapshot_path + '.lock'
+
+
+def try_become_builder(snapshot_path: str) -> bool:
+    """Try to take the per-host builder lock (non-blocking). The lock is held for the life of the process."""
+    if fcntl is None:
+        return True
+    with _lock:
+        if snapshot_path in _builder_fh:
+            return True
+        d = os.path.dirname(snapshot_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        fh = open(_lock_path(snapshot_path), 'a+')
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        fh.seek(0)
+        fh.truncate()
+        fh.write(str(os.getpid()))
+        fh.flush()
+        _builder_fh[snapshot_path] = fh
+        return True
+
+
+def read_header(snapshot_path: str):
+    """Return (version, built_at) of the published snapshot or (0, 0.0) if there is none."""
+    try:
+        with open(snapshot_path, 'rb') as f:
+            magic, version, built_at, _length = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return 0, 0.0
+    if magic != MAGIC:
+        return 0, 0.0
+    return version, built_at
+
+
+def publish(snapshot_path: str, payload) -> int:
+    """Write payload as the next snapshot version (atomic rename) and return that version.
+
+    payload may be a callable: it is called under the publish lock with the currently published
+    (version, built_at, payload) or None and returns the payload to write, or None to write nothing (returns 0).
+    """
+    d = os.path.dirname(snapshot_path) or '.'
+    os.makedirs(d, exist_ok=True)
+    # Serialise publishers (builder + tag edits from other workers) via a short flock
+    with open(_lock_path(snapshot_path) + '.publish', 'a+') as lf:
+        if fcntl is not None:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        if callable(payload):
+            payload = payload(load(snapshot_path))
+            if payload is None:
+                return 0
+        data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        version = read_header(snapshot_path)[0] + 1
+        fd, tmp = tempfile.mkstemp(prefix='.snapshot-', dir=d)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, version, time.time(), len(data)))
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, snapshot_path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    return version
+
+
+def load(snapshot_path: str):
+    """Map the snapshot read-only and decode it. Returns (version, built_at, payload) or None."""
+    try:
+        with open(snapshot_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, version, built_at, length = _HEADER.unpack_from(mm, 0)
+                if magic != MAGIC or _HEADER.size + length > len(mm):
+                    return None
+                payload = json.loads(mm[_HEADER.size:_HEADER.size + length].decode('utf-8'))
+    except (OSError, ValueError, struct.error):
+        return None
+    return version, built_at, payload
+
+
+class SnapshotReader:
+    """Cheap change detection for workers: stat the file at most every `interval` seconds, reload on a new version."""
+
+    def __init__(self, snapshot_path: str, interval: float = 1.0):
+        self.path = snapshot_path
+        self.interval = interval
+        self.version = 0
+        self._checked = 0.0
+        self._stamp = None
+
+    def poll(self, force: bool = False):
+        """Return (version, built_at, payload) if a newer snapshot is available, else None."""
+        now = time.time()
+        if not force and now - self._checked < self.interval:
+            return None
+        self._checked = now
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp and not force:
+            return None
+        self._stamp = stamp
+        if read_header(self.path)[0] <= self.version:
+            return None
+        res = load(self.path)
+        if res is None:
+            return None
+        self.version = res[0]
+        return res
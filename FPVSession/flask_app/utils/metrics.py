@@ -0,0 +1,339 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) in Prometheus text format.
+
+No client library needed: the metrics below are recorded by the request-timing
+middleware in app.py, the scanner/index (scan phases), the thumbnail and ffprobe
+subprocess wrappers and the auto session sorter jobs, and rendered by
+/api/admin/metrics.
+
+Values are recorded per process. A scrape is answered by whichever gunicorn worker
+gets the request, so with a shared directory (see configure) every worker writes its
+values to <dir>/<pid>.json (every FLUSH_SEC and on scrape) and the scrape merges all
+files: counters and histograms are summed over the workers (no `pid` label), gauges
+are reported per live worker (label `pid`). Files of exited workers are folded into
+_exited.json, so the sums stay monotonic across worker restarts. Without a shared
+directory (single process) the values of the answering process are reported.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server, no concurrent scrapes
+    fcntl = None
+
+# Seconds: 1 ms .. 60 s (requests, scan phases, subprocesses)
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes: 256 B .. 64 MB (response sizes)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# Worker files: written every FLUSH_SEC, a file untouched for STALE_SEC belongs to an exited worker
+FLUSH_SEC = 5.0
+STALE_SEC = 60.0
+
+_REGISTRY = []
+_SHARED = {'dir': None, 'started': False}
+_shared_lock = threading.Lock()
+
+
+def _escape(v) -> str:
+    return str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=(), pid=None) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if pid is not None:
+        pairs.append(('pid', pid))
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _fmt(v) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if not _SHARED['started'] and _SHARED['dir']:
+            _start_flusher()
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def values(self) -> dict:
+        """Copy of {label values: value} of this process."""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def render(self, series=None) -> list:
+        """series: [(pid or None, {key: value})]; default: this process, labelled with its pid."""
+        if series is None:
+            series = [(os.getpid(), self.values())]
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for pid, values in series:
+            for key, value in sorted(values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, key, pid=pid)} {_fmt(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labelnames=(), fn=None):
+        super().__init__(name, help, labelnames)
+        # fn: callable returning the current value, read at render time (unlabelled gauges only)
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def values(self) -> dict:
+        if self.fn is not None:
+            try:
+                self.set(self.fn())
+            except Exception:
+                pass
+        return super().values()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=TIME_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def values(self) -> dict:
+        with self._lock:
+            return {k: [list(v[0]), v[1], v[2]] for k, v in self._values.items()}
+
+    @staticmethod
+    def merge(a, b):
+        if len(a[0]) != len(b[0]):  # bucket layout changed between versions: keep the newer one
+            return b
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def render(self, series=None) -> list:
+        if series is None:
+            series = [(os.getpid(), self.values())]
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for pid, values in series:
+            for key, (counts, total, n) in sorted(values.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets, counts):
+                    cumulative += c
+                    lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _fmt(float(bound)))], pid)} {cumulative}')
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", "+Inf")], pid)} {n}')
+                lines.append(f'{self.name}_sum{_labels(self.labelnames, key, pid=pid)} {_fmt(float(total))}')
+                lines.append(f'{self.name}_count{_labels(self.labelnames, key, pid=pid)} {n}')
+        return lines
+
+
+# --- Multi-process aggregation (shared directory) ---
+
+def configure(shared_dir=None):
+    """Enable cross-worker aggregation through shared_dir (all workers of the app must use the same one)."""
+    if shared_dir:
+        os.makedirs(shared_dir, exist_ok=True)
+        _SHARED['dir'] = shared_dir
+
+
+def _after_fork():
+    # a forked worker starts with empty values and its own flusher (the parent keeps its file)
+    _SHARED['started'] = False
+    for m in _REGISTRY:
+        m._values = {}
+        m._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _start_flusher():
+    with _shared_lock:
+        if _SHARED['started']:
+            return
+        _SHARED['started'] = True
+    threading.Thread(target=_flush_loop, name='fpv-metrics-flush', daemon=True).start()
+
+
+def _flush_loop():
+    while True:
+        try:
+            _write_own()
+        except Exception as e:
+            print("⚠️ Metriken konnten nicht geschrieben werden:", e)
+        time.sleep(FLUSH_SEC)
+
+
+def _encode(values: dict) -> list:
+    return [[list(k), v] for k, v in values.items()]
+
+
+def _decode(items) -> dict:
+    return {tuple(k): v for k, v in items or ()}
+
+
+def _write_json(path: str, data: dict):
+    fd, tmp = tempfile.mkstemp(prefix='.metrics-', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_own():
+    d = _SHARED['dir']
+    if d:
+        _write_json(os.path.join(d, f'{os.getpid()}.json'), {m.name: _encode(m.values()) for m in list(_REGISTRY)})
+
+
+def _read_workers():
+    """(exited totals, {pid: values}) of the other workers; stale worker files are folded into the totals."""
+    d = _SHARED['dir']
+    with open(os.path.join(d, '.lock'), 'a+') as lf:
+        if fcntl is not None:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        exited_path = os.path.join(d, '_exited.json')
+        exited = _read_json(exited_path)
+        workers, folded = {}, False
+        now = time.time()
+        for name in os.listdir(d):
+            stem = name[:-5]
+            if not name.endswith('.json') or not stem.isdigit() or int(stem) == os.getpid():
+                continue
+            path = os.path.join(d, name)
+            data = _read_json(path)
+            try:
+                stale = now - os.path.getmtime(path) > STALE_SEC
+            except OSError:
+                continue
+            if not stale:
+                workers[int(stem)] = data
+                continue
+            # exited worker: keep its counters/histograms, drop its gauges
+            for m in _REGISTRY:
+                if m.kind == 'gauge' or m.name not in data:
+                    continue
+                total = _decode(exited.get(m.name))
+                for key, value in _decode(data[m.name]).items():
+                    total[key] = m.merge(total[key], value) if key in total else value
+                exited[m.name] = _encode(total)
+            os.remove(path)
+            folded = True
+        if folded:
+            _write_json(exited_path, exited)
+    return exited, workers
+
+
+def render_text() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4), merged over all workers."""
+    lines = []
+    if not _SHARED['dir']:
+        for m in list(_REGISTRY):
+            lines.extend(m.render())
+        return '\n'.join(lines) + '\n'
+    _write_own()
+    exited, workers = _read_workers()
+    for m in list(_REGISTRY):
+        own = m.values()
+        if m.kind == 'gauge':
+            series = [(os.getpid(), own)] + [(pid, _decode(data.get(m.name))) for pid, data in sorted(workers.items())]
+        else:
+            total = _decode(exited.get(m.name))
+            for values in [own] + [_decode(data.get(m.name)) for data in workers.values()]:
+                for key, value in values.items():
+                    total[key] = m.merge(total[key], value) if key in total else value
+            series = [(None, total)]
+        lines.extend(m.render(series))
+    return '\n'.join(lines) + '\n'
+
+
+# --- HTTP (request-timing middleware in app.py) ---
+HTTP_REQUEST_SECONDS = Histogram('fpv_http_request_duration_seconds', 'Request latency per endpoint.', ('endpoint', 'method'))
+HTTP_RESPONSE_BYTES = Histogram('fpv_http_response_size_bytes', 'Response body size per endpoint (streamed responses excluded).',
+                                ('endpoint',), buckets=SIZE_BUCKETS)
+HTTP_REQUESTS = Counter('fpv_http_requests_total', 'Finished requests per endpoint and status.', ('endpoint', 'method', 'status'))
+HTTP_IN_FLIGHT = Gauge('fpv_http_requests_in_flight', 'Requests currently being handled.')
+
+# --- Index / scanner ---
+SCAN_PHASE_SECONDS = Histogram('fpv_scan_phase_seconds', 'Scan phase durations (walk/stat/tags per sub-session, sort per load).', ('phase',))
+INDEX_BUILD_SECONDS = Histogram('fpv_index_build_seconds', 'Duration of index (re)builds.', ('kind',))
+INDEX_SUBS = Counter('fpv_index_subsessions_total', 'Sub-sessions handled by index builds.', ('result',))
+MEDIA_FALLBACK = Counter('fpv_media_fallback_total', 'Unresolvable /media paths looked up by basename (resolved/ambiguous/miss/cached_miss).', ('result',))
+
+# --- Subprocesses (thumbnails, ffprobe) ---
+SUBPROCESS_SECONDS = Histogram('fpv_subprocess_duration_seconds', 'ffmpeg/ffprobe subprocess durations.', ('tool', 'ok'))
+
+# --- Auto session sorter ---
+SORTER_JOBS = Counter('fpv_sorter_jobs_total', 'Finished sorter jobs.', ('script', 'status'))
+SORTER_JOB_SECONDS = Histogram('fpv_sorter_job_duration_seconds', 'Sorter job durations.', ('script',),
+                               buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0))
+SORTER_FILES = Counter('fpv_sorter_input_files_total', 'Files in the sorter input folder when a job started (throughput = rate / job time).', ('script',))
+SORTER_BYTES = Counter('fpv_sorter_input_bytes_total', 'Bytes in the sorter input folder when a job started.', ('script',))
@@ -0,0 +1,74 @@
+"""
+Bounded LRU cache for rendered pages (index, session detail).
+
+A rendered page only depends on the index version, the query args and who is
+looking (user and permission set), so the caller builds a key from exactly those
+inputs. The key also yields a strong ETag, which lets repeat visits be answered
+with 304 without rendering or even looking the body up.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def etag_for(key) -> str:
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+class PageCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_entries: int = 256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_bytes: int = None, max_entries: int = None):
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max(0, int(max_bytes))
+            if max_entries is not None:
+                self.max_entries = max(0, int(max_entries))
+            self._evict()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            _key, body = self._entries.popitem(last=False)
+            self._bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses,
+                    'max_bytes': self.max_bytes, 'max_entries': self.max_entries}
+
+
+PAGE_CACHE = PageCache()
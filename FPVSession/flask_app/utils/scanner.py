@@ -0,0 +1,155 @@
+"""
+Single-pass, read-only session scanner built on os.scandir.
+
+One walk per sub-session classifies every file and reuses the DirEntry stat results
+for size/mtime; scan_library also lists the thumbnail work items.
+Nothing is created or written, so FPV_BASE can be a read-only mount.
+"""
+
+import os
+import json
+import time
+from collections import namedtuple
+
+try:
+    from .session_meta import extract_session_date, parse_session_times, normalize_tags
+    from .session_records import SessionRecord, FileTable, sort_sessions
+    from .derived_cache import DERIVED
+    from .metrics import SCAN_PHASE_SECONDS
+except Exception:
+    # script fallback
+    from flask_app.utils.session_meta import extract_session_date, parse_session_times, normalize_tags
+    from flask_app.utils.session_records import SessionRecord, FileTable, sort_sessions
+    from flask_app.utils.derived_cache import DERIVED
+    from flask_app.utils.metrics import SCAN_PHASE_SECONDS
+
+META_FILE = '.fpvweb_meta.json'
+
+# session: SessionRecord, files: [(rel, size, mtime)], dirs: [(rel_dir, mtime)]
+SubScan = namedtuple('SubScan', ['session', 'files', 'dirs'])
+
+
+def list_sub_sessions(FPV_BASE: str) -> list:
+    """Return sorted (session_folder, sub) pairs below FPV_BASE."""
+    found = []
+    with os.scandir(FPV_BASE) as it:
+        session_dirs = sorted(e.name for e in it if e.is_dir())
+    for session_folder in session_dirs:
+        try:
+            with os.scandir(os.path.join(FPV_BASE, session_folder)) as it:
+                subs = sorted(e.name for e in it if e.is_dir())
+        except OSError:
+            continue
+        found.extend((session_folder, sub) for sub in subs)
+    return found
+
+
+def missing_thumbs(session) -> list:
+    """(rel_video, thumb path below the derived cache) for the videos of a session record without thumbnail."""
+    existing = session.derived('thumb')
+    return [(t['video'], t['thumb']) for t in session.get('thumbnails', []) if t['video'] not in existing]
+
+
+def missing_previews(session, sprites: bool = True, clips: bool = True) -> list:
+    """
+    (rel_video, rel_thumb) for the videos that still lack their thumbnail, with sprites their
+    hover-scrub sprite sheet and with clips (preview video only) the session's preview clip.
+    One work item per video, the backfill creates whatever is missing.
+    """
+    preview = session.get('preview_video')
+    need_clip = preview if clips and preview and not session.get('preview_clip') else None
+    if not sprites and not need_clip:
+        return missing_thumbs(session)
+    have_sprite = session.sprites if sprites else None
+    existing = session.derived('thumb')
+    return [(t['video'], t['thumb']) for t in session.get('thumbnails', [])
+            if t['video'] not in existing or t['video'] == need_clip
+            or (have_sprite is not None and t['video'] not in have_sprite)]
+
+
+def thumb_tasks_for(FPV_BASE: str, session) -> list:
+    """Thumbnail work items (abs_video, abs_thumb) for a session record (none without a derived cache)."""
+    if not DERIVED.root:
+        return []
+    return [
+        (os.path.join(FPV_BASE, video.replace('/', os.sep)), DERIVED.abs(thumb))
+        for video, thumb in missing_thumbs(session)
+    ]
+
+
+def _load_tags(meta_path: str) -> list:
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            tags = json.load(f).get('tags', [])
+        return normalize_tags(tags) if isinstance(tags, list) else []
+    except Exception:
+        return []
+
+
+def _walk(abs_dir: str, rel_dir: str, files: list, dirs: list, stat_time: list):
+    """
+    Depth-first scandir walk collecting (rel, size, mtime, name) for files and (rel_dir, mtime) for dirs.
+    Time spent in the per-file stat calls is added to stat_time[0].
+    """
+    try:
+        st = os.stat(abs_dir)
+        it = os.scandir(abs_dir)
+    except OSError:
+        return
+    dirs.append((rel_dir, st.st_mtime))
+    subdirs = []
+    with it:
+        entries = sorted(it, key=lambda e: e.name)
+    for e in entries:
+        try:
+            if e.is_dir():
+                if not e.is_symlink():
+                    subdirs.append(e)
+                continue
+            t0 = time.perf_counter()
+            est = e.stat()
+            stat_time[0] += time.perf_counter() - t0
+        except OSError:
+            continue
+        files.append((f"{rel_dir}/{e.name}", est.st_size, est.st_mtime, e.name))
+    for e in subdirs:
+        _walk(e.path, f"{rel_dir}/{e.name}", files, dirs, stat_time)
+
+
+def scan_sub_session(FPV_BASE: str, session_folder: str, sub: str) -> SubScan:
+    """Scan one sub-session folder in a single read-only pass."""
+    sub_path = os.path.join(FPV_BASE, session_folder, sub)
+    raw = []
+    dirs = []
+    stat_time = [0.0]
+    t0 = time.perf_counter()
+    _walk(sub_path, f"{session_folder}/{sub}", raw, dirs, stat_time)
+    SCAN_PHASE_SECONDS.observe(time.perf_counter() - t0 - stat_time[0], phase='walk')
+    SCAN_PHASE_SECONDS.observe(stat_time[0], phase='stat')
+
+    tags = []
+    if any(name == META_FILE and rel.count('/') == 2 for rel, _size, _mtime, name in raw):
+        with SCAN_PHASE_SECONDS.time(phase='tags'):
+            tags = _load_tags(os.path.join(sub_path, META_FILE))
+
+    files = [(rel, size, mtime) for rel, size, mtime, _name in raw]
+    session = SessionRecord.from_scan(
+        session_folder, sub,
+        extract_session_date(session_folder, sub),
+        parse_session_times(session_folder, sub),
+        tags,
+        FileTable.build(files),
+    )
+    return SubScan(session, files, dirs)
+
+
+def scan_library(FPV_BASE: str):
+    """Full single-pass scan without the persistent index. Returns (sessions, thumb_tasks)."""
+    sessions = []
+    thumb_tasks = []
+    for session_folder, sub in list_sub_sessions(FPV_BASE):
+        res = scan_sub_session(FPV_BASE, session_folder, sub)
+        sessions.append(res.session)
+        thumb_tasks.extend(thumb_tasks_for(FPV_BASE, res.session))
+    sort_sessions(sessions)
+    return sessions, thumb_tasks
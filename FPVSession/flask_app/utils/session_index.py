@@ -0,0 +1,410 @@
+"""
+Persistent on-disk sessions index (SQLite).
+
+Stores a summary record per (session, sub) together with its files (size/mtime,
+in scan order) and the mtime of every directory inside the sub-session. A rebuild only re-stats those
+directories and rescans sub-sessions whose directory or meta file changed, so a
+warm restart loads the index in milliseconds instead of walking FPV_BASE again.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from .scanner import list_sub_sessions
+    from .session_records import SessionRecord, FileTable, sort_sessions
+    from .metrics import SCAN_PHASE_SECONDS
+except Exception:
+    # script fallback
+    from flask_app.utils.scanner import list_sub_sessions
+    from flask_app.utils.session_records import SessionRecord, FileTable, sort_sessions
+    from flask_app.utils.metrics import SCAN_PHASE_SECONDS
+
+# 3: record holds the summary only, file listings are loaded on demand from the files table
+# 4: previews come from the derived cache, in-tree *_thumb.jpg etc. no longer count as session images
+# 5: files.base (basename index) for the /media fallback lookup
+# 6: preview_image is set for video sessions too (card fallback while the thumbnail is missing)
+SCHEMA_VERSION = 6
+
+_INFO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT NOT NULL,
+    sub TEXT NOT NULL,
+    meta_mtime REAL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (name, sub)
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    rel TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    sub TEXT NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_session ON dirs (name, sub);
+CREATE TABLE IF NOT EXISTS files (
+    rel TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    sub TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    base TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_session ON files (name, sub);
+CREATE INDEX IF NOT EXISTS files_base ON files (base);
+"""
+
+# Sub-sessions written per transaction during a sync: the walk itself runs outside of
+# any transaction, so readers and other workers' writes only wait for one short batch
+SYNC_BATCH = 32
+
+# _lock serialises the shared writer connection; reads go through per-thread
+# connections (WAL: a reader sees the last commit and never waits for the writer)
+_lock = threading.RLock()
+_connections = {}
+_paths = {}
+_readers = threading.local()
+
+
+def open_index(db_path: str) -> sqlite3.Connection:
+    """Open (and create/migrate if needed) the index database at db_path. Connections are shared per path."""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is not None:
+            return conn
+        d = os.path.dirname(db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(_INFO_SCHEMA)
+        row = conn.execute("SELECT value FROM info WHERE key='schema_version'").fetchone()
+        if not row or row[0] != str(SCHEMA_VERSION):
+            # Schema changed: drop the tables (columns may differ), the next sync rebuilds everything
+            with conn:
+                conn.execute('DROP TABLE IF EXISTS sessions')
+                conn.execute('DROP TABLE IF EXISTS dirs')
+                conn.execute('DROP TABLE IF EXISTS files')
+                conn.execute('DELETE FROM info')
+                conn.execute("INSERT INTO info (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        conn.executescript(_SCHEMA)
+        _connections[db_path] = conn
+        _paths[conn] = db_path
+        return conn
+
+
+@contextmanager
+def _reading(conn):
+    """Read-only connection of the calling thread to the database of conn (in-memory databases: conn itself under _lock)."""
+    path = _paths.get(conn)
+    if not path or path == ':memory:':
+        with _lock:
+            yield conn
+        return
+    cache = getattr(_readers, 'conns', None)
+    if cache is None:
+        cache = _readers.conns = {}
+    reader = cache.get(path)
+    if reader is None:
+        reader = sqlite3.connect(path, timeout=30)
+        reader.execute('PRAGMA query_only=1')
+        cache[path] = reader
+    yield reader
+
+
+def _get_info(conn, key, default=None):
+    row = conn.execute('SELECT value FROM info WHERE key=?', (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_info(conn, key, value):
+    conn.execute('INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)', (key, str(value)))
+
+
+def _decode_record(raw: str) -> SessionRecord:
+    return SessionRecord.from_summary(json.loads(raw))
+
+
+def load_file_table(conn, session_folder: str, sub: str):
+    """FileTable of one sub-session in scan (insertion) order, or None if it is not indexed."""
+    with _reading(conn) as db:
+        if not db.execute('SELECT 1 FROM sessions WHERE name=? AND sub=?', (session_folder, sub)).fetchone():
+            return None
+        rows = db.execute('SELECT rel, size, mtime FROM files WHERE name=? AND sub=? ORDER BY rowid', (session_folder, sub)).fetchall()
+    return FileTable.build(rows)
+
+
+def lookup_file(conn, rel: str):
+    """(size, mtime) of an indexed file by its relative path (primary key lookup), or None."""
+    with _reading(conn) as db:
+        row = db.execute('SELECT size, mtime FROM files WHERE rel=?', (rel,)).fetchone()
+    return tuple(row) if row else None
+
+
+def find_basename(conn, base: str) -> list:
+    """Relative paths of all indexed files named base (index lookup, sorted by path)."""
+    with _reading(conn) as db:
+        rows = db.execute('SELECT rel FROM files WHERE base=? ORDER BY rel', (base,)).fetchall()
+    return [r[0] for r in rows]
+
+
+def load_file_tables(conn) -> dict:
+    """{(name, sub): FileTable} for the whole index (thumbnail backfill, memory report)."""
+    grouped = {}
+    with _reading(conn) as db:
+        keys = db.execute('SELECT name, sub FROM sessions').fetchall()
+        for name, sub, rel, size, mtime in db.execute('SELECT name, sub, rel, size, mtime FROM files ORDER BY rowid'):
+            grouped.setdefault((name, sub), []).append((rel, size, mtime))
+    return {key: FileTable.build(grouped.get(key, ())) for key in map(tuple, keys)}
+
+
+def load_sessions(conn, FPV_BASE: str):
+    """Return (summary records, last_built) from the index, or (None, 0.0) if the index belongs to another base or is empty."""
+    with _reading(conn) as db:
+        if _get_info(db, 'fpv_base') != os.path.abspath(FPV_BASE):
+            return None, 0.0
+        rows = db.execute('SELECT record FROM sessions').fetchall()
+        last_built = float(_get_info(db, 'last_built', 0.0) or 0.0)
+    if not rows and not last_built:
+        return None, 0.0
+    sessions = [_decode_record(r[0]) for r in rows]
+    with SCAN_PHASE_SECONDS.time(phase='sort'):
+        sort_sessions(sessions)
+    return sessions, last_built
+
+
+def _stat_mtime(path: str):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _load_stamps(conn) -> dict:
+    """{(name, sub): (meta_mtime, [(rel_dir, mtime), ...])} for every indexed sub-session."""
+    stamps = {(name, sub): (meta_mtime, []) for name, sub, meta_mtime in conn.execute('SELECT name, sub, meta_mtime FROM sessions')}
+    for rel, name, sub, mtime in conn.execute('SELECT rel, name, sub, mtime FROM dirs'):
+        entry = stamps.get((name, sub))
+        if entry is not None:
+            entry[1].append((rel, mtime))
+    return stamps
+
+
+def _is_unchanged(FPV_BASE: str, stamp, meta_mtime) -> bool:
+    """True if the meta file and every indexed directory of the sub-session still have their recorded mtime."""
+    if stamp is None or stamp[0] != meta_mtime or not stamp[1]:
+        return False
+    for rel, mtime in stamp[1]:
+        if _stat_mtime(os.path.join(FPV_BASE, rel.replace('/', os.sep))) != mtime:
+            return False
+    return True
+
+
+def _check_or_scan(FPV_BASE: str, session_folder: str, sub: str, stamp, scan_sub):
+    """Filesystem-only part of a sync for one sub: returns (meta_mtime, scan result or None if unchanged)."""
+    meta_mtime = _stat_mtime(os.path.join(FPV_BASE, session_folder, sub, '.fpvweb_meta.json'))
+    if _is_unchanged(FPV_BASE, stamp, meta_mtime):
+        return meta_mtime, None
+    return meta_mtime, scan_sub(FPV_BASE, session_folder, sub)[:3]
+
+
+def _device_of(path: str):
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return None
+
+
+def _scan_parallel(FPV_BASE: str, found: list, stamps: dict, scan_sub, workers: int, per_device: int):
+    """
+    Yield (key, meta_mtime, result) for every found sub in sorted order.
+
+    Work fans out per top-level session folder on a thread pool; each st_dev gets its
+    own semaphore so at most per_device folders of one disk are read concurrently.
+    """
+    groups = {}
+    for key in found:
+        groups.setdefault(key[0], []).append(key)
+    if workers <= 1 or len(groups) <= 1:
+        for key in found:
+            yield (key,) + _check_or_scan(FPV_BASE, key[0], key[1], stamps.get(key), scan_sub)
+        return
+
+    dev_limits = {}
+    dev_lock = threading.Lock()
+
+    def _job(session_folder, keys):
+        dev = _device_of(os.path.join(FPV_BASE, session_folder))
+        with dev_lock:
+            sem = dev_limits.setdefault(dev, threading.BoundedSemaphore(max(1, per_device)))
+        with sem:
+            return [(key,) + _check_or_scan(FPV_BASE, key[0], key[1], stamps.get(key), scan_sub) for key in keys]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fpv-scan') as pool:
+        futures = [pool.submit(_job, session_folder, keys) for session_folder, keys in groups.items()]
+        # Collect in submission order, i.e. the same sorted order as a sequential scan
+        for fut in futures:
+            for item in fut.result():
+                yield item
+
+
+def _write_sub(conn, session_folder: str, sub: str, meta_mtime, session: SessionRecord, files: list, dirs: list):
+    conn.execute('DELETE FROM files WHERE name=? AND sub=?', (session_folder, sub))
+    conn.execute('DELETE FROM dirs WHERE name=? AND sub=?', (session_folder, sub))
+    conn.executemany(
+        'INSERT OR REPLACE INTO files (rel, name, sub, size, mtime, base) VALUES (?, ?, ?, ?, ?, ?)',
+        [(rel, session_folder, sub, size, mtime, rel.rsplit('/', 1)[-1]) for rel, size, mtime in files]
+    )
+    conn.executemany(
+        'INSERT OR REPLACE INTO dirs (rel, name, sub, mtime) VALUES (?, ?, ?, ?)',
+        [(rel, session_folder, sub, mtime) for rel, mtime in dirs]
+    )
+    conn.execute(
+        'INSERT OR REPLACE INTO sessions (name, sub, meta_mtime, record) VALUES (?, ?, ?, ?)',
+        (session_folder, sub, meta_mtime, json.dumps(session.summary_dict(), ensure_ascii=False))
+    )
+
+
+def _delete_sub(conn, session_folder: str, sub: str):
+    conn.execute('DELETE FROM files WHERE name=? AND sub=?', (session_folder, sub))
+    conn.execute('DELETE FROM dirs WHERE name=? AND sub=?', (session_folder, sub))
+    conn.execute('DELETE FROM sessions WHERE name=? AND sub=?', (session_folder, sub))
+
+
+def sync_index(conn, FPV_BASE: str, scan_sub, progress=None, workers: int = 1, per_device: int = 1, on_scanned=None):
+    """
+    Bring the index up to date with FPV_BASE and return (sessions, stats).
+
+    scan_sub(FPV_BASE, session_folder, sub) must return (session, files, dirs)
+    like scanner.scan_sub_session: files as (rel, size, mtime), dirs as (rel_dir, mtime).
+    Only sub-sessions whose directories or meta file changed are rescanned; with
+    workers > 1 the session folders are checked/scanned in parallel (see _scan_parallel).
+    on_scanned(session) is called with the full record (incl. files) of every rescanned sub.
+    Rescanned subs are committed in batches of SYNC_BATCH, never one transaction for the whole walk.
+    """
+    stats = {'scanned': 0, 'reused': 0, 'removed': 0}
+    base_abs = os.path.abspath(FPV_BASE)
+    with _lock:
+        if _get_info(conn, 'fpv_base') != base_abs:
+            with conn:
+                conn.execute('DELETE FROM sessions')
+                conn.execute('DELETE FROM dirs')
+                conn.execute('DELETE FROM files')
+                _set_info(conn, 'fpv_base', base_abs)
+        stamps = _load_stamps(conn)
+
+    # Filesystem walk without lock or open transaction; results are staged and written in batches
+    found = list_sub_sessions(FPV_BASE)
+    known = set(stamps)
+    staged = []
+
+    def _flush():
+        with _lock, conn:
+            for args in staged:
+                _write_sub(conn, *args)
+        staged.clear()
+
+    results = _scan_parallel(FPV_BASE, found, stamps, scan_sub, workers, per_device)
+    for idx, ((session_folder, sub), meta_mtime, res) in enumerate(results, 1):
+        if res is None:
+            stats['reused'] += 1
+        else:
+            session, files, dirs = res
+            staged.append((session_folder, sub, meta_mtime, session, files, dirs))
+            stats['scanned'] += 1
+            if on_scanned:
+                on_scanned(session)
+            if len(staged) >= SYNC_BATCH:
+                _flush()
+        if progress:
+            progress(idx, len(found))
+    _flush()
+    with _lock, conn:
+        for key in known - set(found):
+            _delete_sub(conn, *key)
+            stats['removed'] += 1
+        _set_info(conn, 'last_built', time.time())
+
+    sessions, _ = load_sessions(conn, FPV_BASE)
+    return sessions or [], stats
+
+
+def changed_subs(conn, FPV_BASE: str) -> set:
+    """Keys (name, sub) that are new, changed or gone, determined from directory mtimes only (no rescan)."""
+    with _reading(conn) as db:
+        if _get_info(db, 'fpv_base') != os.path.abspath(FPV_BASE):
+            return set(list_sub_sessions(FPV_BASE))
+        stamps = _load_stamps(db)
+    known = set(stamps)
+    found = set(list_sub_sessions(FPV_BASE))
+    changed = (known ^ found)
+    for session_folder, sub in known & found:
+        meta_mtime = _stat_mtime(os.path.join(FPV_BASE, session_folder, sub, '.fpvweb_meta.json'))
+        if not _is_unchanged(FPV_BASE, stamps[(session_folder, sub)], meta_mtime):
+            changed.add((session_folder, sub))
+    return changed
+
+
+def sync_subs(conn, FPV_BASE: str, keys, scan_sub) -> dict:
+    """
+    Rescan just the given sub-sessions and return {(name, sub): session or None if deleted}.
+    The returned records still carry their freshly scanned FileTable.
+
+    A key with sub=None stands for a whole session folder: its subs on disk and in the
+    index are reconciled (new subs scanned, vanished ones removed).
+    """
+    result = {}
+    expanded = set()
+    for session_folder, sub in keys:
+        if sub is not None:
+            expanded.add((session_folder, sub))
+            continue
+        with _reading(conn) as db:
+            rows = db.execute('SELECT sub FROM sessions WHERE name=?', (session_folder,)).fetchall()
+        expanded.update((session_folder, r[0]) for r in rows)
+        session_path = os.path.join(FPV_BASE, session_folder)
+        try:
+            with os.scandir(session_path) as it:
+                expanded.update((session_folder, e.name) for e in it if e.is_dir())
+        except OSError:
+            pass
+    # Scan outside the lock, then one short transaction per sub
+    for session_folder, sub in sorted(expanded):
+        sub_path = os.path.join(FPV_BASE, session_folder, sub)
+        if os.path.isdir(sub_path):
+            meta_mtime = _stat_mtime(os.path.join(sub_path, '.fpvweb_meta.json'))
+            session, files, dirs = scan_sub(FPV_BASE, session_folder, sub)[:3]
+            with _lock, conn:
+                _write_sub(conn, session_folder, sub, meta_mtime, session, files, dirs)
+            result[(session_folder, sub)] = session
+        else:
+            with _lock, conn:
+                _delete_sub(conn, session_folder, sub)
+            result[(session_folder, sub)] = None
+    return result
+
+
+def update_session_tags(conn, session_folder: str, sub: str, tags: list, meta_mtime=None):
+    """Patch the stored tags of one session (after save_session_tags) without a rescan."""
+    with _lock:
+        row = conn.execute('SELECT record FROM sessions WHERE name=? AND sub=?', (session_folder, sub)).fetchone()
+        if not row:
+            return
+        s = json.loads(row[0])
+        s['tags'] = list(tags)
+        with conn:
+            conn.execute(
+                'UPDATE sessions SET record=?, meta_mtime=? WHERE name=? AND sub=?',
+                (json.dumps(s, ensure_ascii=False), meta_mtime, session_folder, sub)
+            )
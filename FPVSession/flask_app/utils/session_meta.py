@@ -0,0 +1,70 @@
+"""Parse session metadata (date, time range, tags) from sub-session folder names and meta files."""
+
+from datetime import datetime
+
+def extract_session_date(session_folder: str, sub_folder: str) -> str:
+    """Extract ISO date (YYYY-MM-DD) from folder names like '2025.04.27_FPVSession'."""
+    for name in (session_folder, sub_folder):
+        try:
+            prefix = name.split('_', 1)[0]
+            parts = prefix.split('.')
+            if len(parts) >= 3:
+                y, m, d = parts[0:3]
+                dt = datetime(int(y), int(m), int(d))
+                return dt.strftime('%Y-%m-%d')
+        except Exception:
+            continue
+    return ''
+
+def parse_session_times(session_folder: str, sub_folder: str):
+    """Parse start/end times from sub-folder like 'YYYY.MM.DD_HH.MM.SS-HH.MM.SS_FPVSession'."""
+    try:
+        date_part = session_folder.split('_', 1)[0]
+        if len(date_part.split('.')) < 3:
+            date_part = sub_folder.split('_', 1)[0]
+        y, m, d = map(int, date_part.split('.')[:3])
+        rest = sub_folder.split('_', 1)[1] if '_' in sub_folder else ''
+        times = rest.split('_', 1)[0] if rest else ''
+        start_t, end_t = (times.split('-') + ['',''])[:2]
+        def parse_time(t):
+            try:
+                hh, mm, ss = map(int, t.split('.')[:3])
+                return hh, mm, ss
+            except Exception:
+                return 0, 0, 0
+        sh, sm, ss = parse_time(start_t)
+        eh, em, es = parse_time(end_t)
+        start_dt = datetime(y, m, d, sh, sm, ss)
+        end_dt = datetime(y, m, d, eh, em, es)
+        if end_dt < start_dt:
+            end_dt = start_dt
+        duration_min = int((end_dt - start_dt).total_seconds() // 60)
+        weekday_map = ['Mo','Di','Mi','Do','Fr','Sa','So']
+        weekday = weekday_map[start_dt.weekday()]
+        human_date = f"{d:02d}.{m:02d}.{y}"
+        time_range = f"{sh:02d}:{sm:02d}–{eh:02d}:{em:02d}"
+        return {
+            'start_dt_iso': start_dt.strftime('%Y-%m-%d %H:%M:%S'),
+            'end_dt_iso': end_dt.strftime('%Y-%m-%d %H:%M:%S'),
+            'duration_min': duration_min,
+            'weekday': weekday,
+            'human_date': human_date,
+            'time_range': time_range,
+            'sort_key': (start_dt.strftime('%Y-%m-%d'), start_dt.strftime('%H:%M:%S'))
+        }
+    except Exception:
+        return {
+            'start_dt_iso': '', 'end_dt_iso': '', 'duration_min': None,
+            'weekday': '', 'human_date': '', 'time_range': '', 'sort_key': ('','')
+        }
+
+def normalize_tags(tags) -> list:
+    """Lower-case, strip and de-duplicate tags while keeping their order."""
+    norm = []
+    seen = set()
+    for t in (tags or []):
+        v = str(t).strip().lower()
+        if v and v not in seen:
+            seen.add(v)
+            norm.append(v)
+    return norm
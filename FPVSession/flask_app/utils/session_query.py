@@ -0,0 +1,92 @@
+"""
+Sorting and keyset (cursor) pagination for the /api/sessions JSON endpoint.
+
+A cursor is the opaque, URL-safe encoding of the sort key of the last item of a
+page. The next page starts strictly after that key, so pages stay stable while
+sessions are added or removed between requests (no offset drift).
+"""
+
+import json
+import base64
+from bisect import bisect_left, bisect_right
+
+try:
+    from .session_records import SessionRecord
+except Exception:
+    # script fallback
+    from flask_app.utils.session_records import SessionRecord
+
+SORTS = ('date', 'duration', 'size')
+ORDERS = ('desc', 'asc')
+# Fields a client may select with fields=; 'key' is "<name>/<sub>"
+FIELDS = ('key',) + SessionRecord.SUMMARY_KEYS
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+
+def _date_key(s) -> tuple:
+    sk = tuple((s.get('times') or {}).get('sort_key') or ('', ''))
+    return (s.get('date') or '',) + sk + (s['name'], s['sub'])
+
+
+def sort_key(sort: str, s) -> tuple:
+    """Flat, JSON-safe and total sort key (ties broken by date, then name/sub)."""
+    if sort == 'duration':
+        return (int((s.get('times') or {}).get('duration_min') or 0),) + _date_key(s)
+    if sort == 'size':
+        return (int(s.get('total_size_bytes') or 0),) + _date_key(s)
+    return _date_key(s)
+
+
+def sorted_with_keys(sessions: list, sort: str):
+    """(keys, sessions) in ascending key order."""
+    pairs = sorted(((sort_key(sort, s), s) for s in sessions), key=lambda p: p[0])
+    return [k for k, _ in pairs], [s for _, s in pairs]
+
+
+def encode_cursor(key: tuple) -> str:
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Sort key from a cursor; raises ValueError for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('invalid cursor')
+    if not isinstance(key, list) or not key:
+        raise ValueError('invalid cursor')
+    return tuple(key)
+
+
+def paginate(keys: list, items: list, order: str, cursor_key=None, limit: int = DEFAULT_LIMIT):
+    """One page of `items` (ascending by `keys`) in `order`, starting after cursor_key. Returns (page, next_cursor)."""
+    try:
+        if order == 'asc':
+            start = bisect_right(keys, cursor_key) if cursor_key is not None else 0
+            idx = range(start, min(start + limit, len(items)))
+            more = start + limit < len(items)
+        else:
+            end = bisect_left(keys, cursor_key) if cursor_key is not None else len(items)
+            idx = range(end - 1, max(end - limit, 0) - 1, -1)
+            more = end - limit > 0
+    except TypeError:
+        # cursor from another sort key (type mismatch while comparing)
+        raise ValueError('cursor does not match sort')
+    page = [items[i] for i in idx]
+    next_cursor = encode_cursor(keys[idx[-1]]) if page and more else None
+    return page, next_cursor
+
+
+def select_fields(s, fields) -> dict:
+    out = {}
+    for f in fields:
+        if f == 'key':
+            out['key'] = f"{s['name']}/{s['sub']}"
+        elif f == 'times':
+            out['times'] = dict(s.get('times') or {})
+        else:
+            out[f] = s.get(f)
+    return out
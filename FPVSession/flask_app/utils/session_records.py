@@ -0,0 +1,368 @@
+"""
+Compact in-memory representation of the sessions index.
+
+Instead of one dict per session holding full relative-path strings in six lists
+(plus one dict per thumbnail), every session is a slotted SessionRecord with an
+array-backed FileTable: directory prefixes are interned once process-wide, file
+names live in a single joined string, and kind/size/mtime are typed columns.
+Path lists such as `videos` or `thumbnails` are built on demand, and the record
+keeps dict-style access (`s['name']`, `s.get('tags')`) for existing callers.
+
+Two tiers: the cached index only holds summary records (files=None: counts,
+previews, size/mtime aggregates). The FileTable is attached on demand for the
+detail views (see session_utils.get_session_detail).
+"""
+
+import sys
+import threading
+from array import array
+try:
+    from .derived_cache import fingerprint, derived_rel, has as has_derived
+except Exception:
+    # script fallback
+    from flask_app.utils.derived_cache import fingerprint, derived_rel, has as has_derived
+
+# File kinds (same classification the scanner always used)
+OTHER, VIDEO, IMAGE, BLACKBOX, LOG, META, GOGGLE = range(7)
+
+VIDEO_EXT = ('.mp4', '.mov')
+IMAGE_EXT = ('.png', '.jpg', '.jpeg')
+# Derivatives older versions wrote into the IMG folders (thumbnail, sprite sheet, preview clip).
+# Not footage: kept out of the video/image counts and galleries (new ones live in derived_cache).
+LEGACY_DERIVED = ('_thumb.jpg', '_sprite.jpg', '_sprite.vtt', '_preview.mp4')
+
+_KIND_LISTS = {
+    'videos': VIDEO,
+    'images': IMAGE,
+    'blackbox': BLACKBOX,
+    'logs': LOG,
+    'meta': META,
+    'goggles': GOGGLE,
+}
+
+
+def classify(name: str) -> int:
+    low = name.lower()
+    if low.endswith(LEGACY_DERIVED):
+        return OTHER
+    if low.endswith(VIDEO_EXT):
+        return VIDEO
+    if low.endswith(IMAGE_EXT):
+        return IMAGE
+    if low.endswith('.bfl'):
+        return BLACKBOX
+    if low.endswith('.txt'):
+        return LOG
+    if low.endswith('.json'):
+        return META
+    if 'goggel' in low:
+        return GOGGLE
+    return OTHER
+
+
+# Process-wide interned directory prefixes ("<session>/<sub>/FPV_Camera", ...)
+_dir_lock = threading.Lock()
+_dir_ids = {}
+_dir_names = []
+
+
+def _intern_dir(rel_dir: str) -> int:
+    i = _dir_ids.get(rel_dir)
+    if i is not None:
+        return i
+    with _dir_lock:
+        i = _dir_ids.get(rel_dir)
+        if i is None:
+            i = len(_dir_names)
+            _dir_names.append(sys.intern(rel_dir))
+            _dir_ids[_dir_names[i]] = i
+        return i
+
+
+class FileTable:
+    """Column store for the files of one sub-session."""
+
+    __slots__ = ('dir_ids', 'kinds', 'sizes', 'mtimes', '_names', '_offsets')
+
+    def __init__(self, dir_ids, kinds, sizes, mtimes, names: str, offsets):
+        self.dir_ids = dir_ids
+        self.kinds = kinds
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self._names = names
+        self._offsets = offsets
+
+    @classmethod
+    def build(cls, files):
+        """Build from (rel, size, mtime) tuples, keeping their order."""
+        dir_ids = array('I')
+        kinds = array('B')
+        sizes = array('q')
+        mtimes = array('d')
+        offsets = array('I', [0])
+        names = []
+        pos = 0
+        for rel, size, mtime in files:
+            rel_dir, _, name = rel.rpartition('/')
+            dir_ids.append(_intern_dir(rel_dir))
+            kinds.append(classify(name))
+            sizes.append(int(size))
+            mtimes.append(float(mtime))
+            names.append(name)
+            pos += len(name)
+            offsets.append(pos)
+        return cls(dir_ids, kinds, sizes, mtimes, ''.join(names), offsets)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def name(self, i: int) -> str:
+        return self._names[self._offsets[i]:self._offsets[i + 1]]
+
+    def rel(self, i: int) -> str:
+        return f"{_dir_names[self.dir_ids[i]]}/{self.name(i)}"
+
+    def indices(self, kind: int) -> list:
+        return [i for i, k in enumerate(self.kinds) if k == kind]
+
+    def paths(self, kind: int) -> list:
+        return [self.rel(i) for i in self.indices(kind)]
+
+    def count(self, kind: int) -> int:
+        return self.kinds.count(kind)
+
+    def fingerprint(self, i: int) -> str:
+        """Derived-cache key of file i (path, size, mtime)."""
+        return fingerprint(self.rel(i), self.sizes[i], self.mtimes[i])
+
+    def iter_files(self):
+        """Yield (rel, size, mtime) for every file."""
+        for i in range(len(self.kinds)):
+            yield self.rel(i), self.sizes[i], self.mtimes[i]
+
+
+class SessionRecord:
+    """One (session, sub) entry of the index; `files` is None for summary-only records."""
+
+    __slots__ = ('name', 'sub', 'date', 'times', 'tags', 'preview_video', 'preview_thumb', 'preview_image',
+                 'video_count', 'image_count', 'log_count', 'blackbox_count',
+                 'total_size_bytes', 'oldest_video_mtime', 'newest_video_mtime', 'preview_sprite', 'preview_clip', 'files')
+
+    # Keys available through s['key'] / s.get('key'), in legacy dict order
+    KEYS = ('name', 'sub', 'videos', 'images', 'logs', 'goggles', 'blackbox', 'meta', 'thumbnails',
+            'preview_video', 'preview_thumb', 'preview_image', 'date', 'times', 'video_count', 'image_count',
+            'log_count', 'blackbox_count', 'total_size_bytes', 'oldest_video_mtime', 'newest_video_mtime', 'tags',
+            'preview_sprite', 'preview_clip')
+    SUMMARY_KEYS = ('name', 'sub', 'date', 'times', 'tags', 'preview_video', 'preview_thumb', 'preview_image',
+                    'video_count', 'image_count', 'log_count', 'blackbox_count',
+                    'total_size_bytes', 'oldest_video_mtime', 'newest_video_mtime', 'preview_sprite', 'preview_clip')
+
+    def __init__(self, name, sub, date='', times=None, tags=None, files=None):
+        self.name = sys.intern(name)
+        self.sub = sub
+        self.date = date
+        self.times = times or {}
+        self.tags = list(tags or [])
+        self.files = files
+        self.preview_video = None
+        self.preview_thumb = None
+        self.preview_image = None
+        self.preview_sprite = None
+        self.preview_clip = None
+        self.video_count = self.image_count = self.log_count = self.blackbox_count = 0
+        self.total_size_bytes = 0
+        self.oldest_video_mtime = None
+        self.newest_video_mtime = None
+
+    @classmethod
+    def from_scan(cls, name, sub, date, times, tags, files: FileTable):
+        """Create from a fresh scan: counts, previews and video size/mtime aggregates come from the file table."""
+        rec = cls(name, sub, date, times, tags, files)
+        videos = files.indices(VIDEO)
+        rec.video_count = len(videos)
+        rec.image_count = files.count(IMAGE)
+        rec.log_count = files.count(LOG)
+        rec.blackbox_count = files.count(BLACKBOX)
+        best = None
+        for i in videos:
+            rec.total_size_bytes += files.sizes[i]
+            m = files.mtimes[i]
+            if rec.oldest_video_mtime is None or m < rec.oldest_video_mtime:
+                rec.oldest_video_mtime = m
+            if rec.newest_video_mtime is None or m > rec.newest_video_mtime:
+                rec.newest_video_mtime = m
+            # preview is the smallest video and its derivatives (as far as generated)
+            if best is None or files.sizes[i] < files.sizes[best]:
+                best = i
+        if best is not None:
+            rec.preview_video = files.rel(best)
+            fp = files.fingerprint(best)
+            if has_derived(fp, 'thumb'):
+                rec.preview_thumb = derived_rel(fp, 'thumb')
+            if has_derived(fp, 'sprite'):
+                rec.preview_sprite = derived_rel(fp, 'sprite')
+            if has_derived(fp, 'clip'):
+                rec.preview_clip = derived_rel(fp, 'clip')
+        # also for video sessions: the card shows it until the video thumbnail is generated
+        images = files.indices(IMAGE)
+        if images:
+            rec.preview_image = files.rel(images[0])
+        return rec
+
+    def summary(self):
+        """Copy without the file table (what the cached index holds)."""
+        if self.files is None:
+            return self
+        return self.with_files(None)
+
+    def with_files(self, files):
+        """Copy of this record with the given FileTable attached."""
+        rec = SessionRecord.__new__(SessionRecord)
+        for attr in self.__slots__:
+            setattr(rec, attr, getattr(self, attr))
+        rec.files = files
+        return rec
+
+    # --- on-demand path lists (legacy dict fields, need the file table) ---
+    def _table(self) -> FileTable:
+        if self.files is None:
+            raise LookupError(f"file listing of {self.name}/{self.sub} not loaded (summary record)")
+        return self.files
+
+    @property
+    def videos(self):
+        return self._table().paths(VIDEO)
+
+    @property
+    def images(self):
+        return self._table().paths(IMAGE)
+
+    @property
+    def logs(self):
+        return self._table().paths(LOG)
+
+    @property
+    def blackbox(self):
+        return self._table().paths(BLACKBOX)
+
+    @property
+    def meta(self):
+        return self._table().paths(META)
+
+    @property
+    def goggles(self):
+        return self._table().paths(GOGGLE)
+
+    @property
+    def thumbnails(self):
+        """[{'video', 'thumb'}] with the thumbnail path below the derived cache (generated or not)."""
+        f = self._table()
+        return [{'video': f.rel(i), 'thumb': derived_rel(f.fingerprint(i), 'thumb')} for i in f.indices(VIDEO)]
+
+    def derived(self, kind: str) -> dict:
+        """{video: path below the derived cache} for the videos whose derivative of kind exists already."""
+        f = self._table()
+        out = {}
+        for i in f.indices(VIDEO):
+            fp = f.fingerprint(i)
+            if has_derived(fp, kind):
+                out[f.rel(i)] = derived_rel(fp, kind)
+        return out
+
+    @property
+    def sprites(self):
+        """{video: sprite vtt} for the videos whose sprite sheet exists already."""
+        return self.derived('sprite')
+
+    # --- dict-style access for existing callers ---
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.SUMMARY_KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        if key not in self.KEYS:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return self.KEYS
+
+    def summary_dict(self) -> dict:
+        d = {k: getattr(self, k) for k in self.SUMMARY_KEYS}
+        d['times'] = dict(self.times)
+        return d
+
+    def to_legacy_dict(self) -> dict:
+        """The full dict shape _scan_sessions used to produce (for comparisons and reports)."""
+        return {k: getattr(self, k) for k in self.KEYS}
+
+    @classmethod
+    def from_summary(cls, d: dict, files: FileTable = None):
+        times = dict(d.get('times') or {})
+        # JSON turns the sort key tuple into a list; it must stay comparable
+        if isinstance(times.get('sort_key'), list):
+            times['sort_key'] = tuple(times['sort_key'])
+        rec = cls(d['name'], d['sub'], d.get('date', ''), times, d.get('tags'), files)
+        for k in cls.SUMMARY_KEYS[5:]:
+            if d.get(k) is not None:
+                setattr(rec, k, d[k])
+        return rec
+
+    def __repr__(self):
+        files = 'summary' if self.files is None else f"files={len(self.files)}"
+        return f"SessionRecord({self.name!r}, {self.sub!r}, {files})"
+
+
+def sort_sessions(sessions: list):
+    """Newest first by date and start time (in place)."""
+    sessions.sort(key=lambda s: (s.date, s.times.get('sort_key', ('', ''))), reverse=True)
+
+
+def _deep_size(obj, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(x, seen) for x in obj)
+    elif hasattr(obj, '__slots__') and not isinstance(obj, (str, bytes, array)):
+        size += sum(_deep_size(getattr(obj, a), seen) for a in obj.__slots__ if hasattr(obj, a))
+    return size
+
+
+def memory_report(sessions: list, tables: dict = None) -> dict:
+    """
+    Compare the resident size of the summary index with the equivalent legacy dicts.
+
+    tables ({(name, sub): FileTable}) supplies the file listings of summary records so
+    the legacy shape and the size of the on-demand tier can be measured as well.
+    """
+    tables = tables or {}
+    resident = _deep_size(list(sessions), set())
+    full = [s if s.files is not None else s.with_files(tables.get((s.name, s.sub))) for s in sessions]
+    full = [s for s in full if s.files is not None]
+    listings = _deep_size([s.files for s in full], set())
+    # Interned prefixes are shared by all file tables; count them once
+    with _dir_lock:
+        prefixes = _deep_size(list(_dir_names), set())
+    legacy = _deep_size([s.to_legacy_dict() for s in full], set())
+    return {
+        'sessions': len(sessions),
+        'files': sum(len(s.files) for s in full),
+        'dir_prefixes': len(_dir_names),
+        'resident_bytes': resident,
+        'file_tables_bytes': listings + prefixes,
+        'legacy_dict_bytes': legacy,
+        'ratio': round(legacy / resident, 2) if resident else None,
+    }
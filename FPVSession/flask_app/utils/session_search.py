@@ -0,0 +1,198 @@
+"""
+Search index for the `q` filter of the index page.
+
+Built once per index version from the summary records:
+- exact tag inverted index (tag -> doc ids)
+- date prefix index (YYYY, YYYY-MM, YYYY-MM-DD -> doc ids)
+- trigram index over "name sub" and over the joined tags for substring terms
+
+Results are returned in the order of the sessions list. A substring term only
+verifies the docs of its rarest trigram, which keeps query cost independent of
+the library size for all but very common terms.
+
+Query syntax (terms are AND-ed):
+    freestyle            substring of name, sub or a tag
+    tag:freestyle        exact tag
+    date:2025-05         session date prefix (also 2025 or 2025-05-10)
+"""
+
+import shlex
+import threading
+from array import array
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def parse_query(q: str) -> dict:
+    """Split q into {'tags': [...], 'dates': [...], 'terms': [...]} (all lower-case)."""
+    q = (q or '').strip().lower()
+    try:
+        tokens = shlex.split(q)
+    except ValueError:
+        # unbalanced quotes: plain whitespace split
+        tokens = q.split()
+    parsed = {'tags': [], 'dates': [], 'terms': []}
+    for tok in tokens:
+        key, sep, value = tok.partition(':')
+        if sep and key == 'tag' and value:
+            parsed['tags'].append(value.strip())
+        elif sep and key == 'date' and value:
+            parsed['dates'].append(value.strip().replace('.', '-'))
+        elif tok:
+            parsed['terms'].append(tok)
+    return parsed
+
+
+class SearchIndex:
+    """
+    Search structures for one sessions list.
+
+    Docs have stable ids, so live updates (apply_changes) and tag edits (retag) patch
+    the index instead of rebuilding it; removed docs are tombstoned in the append-only
+    trigram postings and dropped by a full rebuild once they make up a quarter of them.
+    """
+
+    def __init__(self, sessions: list):
+        self.sessions = sessions
+        self._ids = {}
+        self._docs = []
+        self._names = []
+        self._tag_text = []
+        self._name_grams = {}
+        self._tag_grams = {}
+        self._tags = {}
+        self._dates = {}
+        self._dead = 0
+        self._lock = threading.Lock()
+        for s in sessions:
+            self._add_doc(s)
+        self._order = {i: n for n, i in enumerate(self._ids[(s['name'], s['sub'])] for s in sessions)}
+
+    # --- docs ---
+    def _add_doc(self, s):
+        i = len(self._docs)
+        self._ids[(s['name'], s['sub'])] = i
+        self._docs.append(s)
+        name = f"{s.get('name', '')} {s.get('sub', '')}".lower()
+        self._names.append(name)
+        grams = self._name_grams
+        for g in _trigrams(name):
+            p = grams.get(g)
+            if p is None:
+                p = grams[g] = array('I')
+            p.append(i)
+        d = s.get('date') or ''
+        if d:
+            for prefix in {d[:4], d[:7], d}:
+                self._dates.setdefault(prefix, set()).add(i)
+        self._tag_text.append('')
+        self._add_tags(i, s.get('tags') or [])
+
+    def _remove_doc(self, i: int):
+        s = self._docs[i]
+        self._remove_tags(i)
+        d = s.get('date') or ''
+        for prefix in {d[:4], d[:7], d} if d else ():
+            ids = self._dates.get(prefix)
+            if ids is not None:
+                ids.discard(i)
+        self._docs[i] = None
+        self._names[i] = ''
+        self._dead += 1
+        if self._ids.get((s['name'], s['sub'])) == i:
+            del self._ids[(s['name'], s['sub'])]
+
+    def apply_changes(self, keys, sessions: list) -> 'SearchIndex':
+        """
+        Patch for a live update: `keys` are the (name, sub) pairs that were rescanned or
+        removed, `sessions` the new list. Returns the index to use from now on.
+        """
+        if self._dead + len(keys) > len(self._docs) // 4:
+            return SearchIndex(sessions)
+        with self._lock:
+            for key in keys:
+                i = self._ids.get(key)
+                if i is not None:
+                    self._remove_doc(i)
+            for s in sessions:
+                if (s['name'], s['sub']) in keys:
+                    self._add_doc(s)
+            self.sessions = sessions
+            self._order = {self._ids[(s['name'], s['sub'])]: n for n, s in enumerate(sessions)}
+        return self
+
+    # --- tags (patchable) ---
+    def _add_tags(self, i: int, tags: list):
+        tags = [str(t).lower() for t in tags if t]
+        self._tag_text[i] = '\n'.join(tags)
+        for t in set(tags):
+            self._tags.setdefault(t, set()).add(i)
+        for g in {g for t in tags for g in _trigrams(t)}:
+            self._tag_grams.setdefault(g, set()).add(i)
+
+    def _remove_tags(self, i: int):
+        tags = self._tag_text[i].split('\n') if self._tag_text[i] else []
+        for t in set(tags):
+            ids = self._tags.get(t)
+            if ids is not None:
+                ids.discard(i)
+                if not ids:
+                    del self._tags[t]
+        for g in {g for t in tags for g in _trigrams(t)}:
+            ids = self._tag_grams.get(g)
+            if ids is not None:
+                ids.discard(i)
+                if not ids:
+                    del self._tag_grams[g]
+        self._tag_text[i] = ''
+
+    def retag(self, session_folder: str, sub: str, tags: list):
+        i = self._ids.get((session_folder, sub))
+        if i is None:
+            return
+        with self._lock:
+            self._remove_tags(i)
+            self._add_tags(i, tags)
+
+    # --- queries ---
+    def _term_ids(self, term: str) -> set:
+        """Live docs whose name/sub or one of whose tags contains term."""
+        if len(term) < 3:
+            # too short for trigrams: verify every doc (still no per-request lowercasing)
+            return {i for i, name in enumerate(self._names) if term in name or term in self._tag_text[i]}
+        grams = _trigrams(term)
+        found = set()
+        for postings, texts in ((self._name_grams, self._names), (self._tag_grams, self._tag_text)):
+            lists = [postings.get(g) for g in grams]
+            if any(p is None for p in lists):
+                continue
+            rarest = min(lists, key=len)
+            found.update(i for i in rarest if term in texts[i])
+        return found
+
+    def search(self, q: str) -> list:
+        """Sessions matching q, in index order."""
+        parsed = parse_query(q)
+        with self._lock:
+            return self._search(parsed)
+
+    def _search(self, parsed: dict) -> list:
+        if not any(parsed.values()):
+            return self.sessions
+        result = None
+        for tag in parsed['tags']:
+            ids = set(self._tags.get(tag, ()))
+            result = ids if result is None else result & ids
+        for d in parsed['dates']:
+            ids = set(self._dates.get(d, ()))
+            result = ids if result is None else result & ids
+        for term in parsed['terms']:
+            if result is not None and not result:
+                break
+            ids = self._term_ids(term)
+            result = ids if result is None else result & ids
+        order = self._order
+        hits = sorted((order[i] for i in (result or ()) if i in order))
+        return [self.sessions[n] for n in hits]
@@ -0,0 +1,118 @@
+"""
+Library statistics aggregated from the per-session summary records.
+
+Every SessionRecord already carries its video count, duration and video
+size/mtime aggregates (computed once at scan time from the directory entries),
+so library totals and search-filtered totals are plain sums over the records,
+without touching the filesystem. The cached library totals are patched with
+deltas when single sessions change (live updates, tag edits).
+
+The totals include the date -> session count index behind the calendar
+(see calendar_utils and /api/calendar).
+"""
+
+
+def empty_stats() -> dict:
+    return {
+        'sessions': 0,
+        'videos': 0,
+        'total_minutes': 0,
+        'total_size_bytes': 0,
+        'oldest_video_mtime': None,
+        'newest_video_mtime': None,
+        'tags_total': 0,
+        'tag_counts': {},
+        'date_counts': {},
+    }
+
+
+def _int(x) -> int:
+    try:
+        return int(x)
+    except Exception:
+        return 0
+
+
+def _tag_keys(tags) -> list:
+    if not isinstance(tags, list):
+        return []
+    return [str(t).strip().lower() for t in tags if t]
+
+
+def _add_tags(stats: dict, tags, sign: int):
+    counts = stats['tag_counts']
+    for key in _tag_keys(tags):
+        n = counts.get(key, 0) + sign
+        if n > 0:
+            counts[key] = n
+        else:
+            counts.pop(key, None)
+    stats['tags_total'] += sign * (len(tags) if isinstance(tags, list) else 0)
+
+
+def _add_date(stats: dict, day: str, sign: int):
+    if not day:
+        return
+    counts = stats['date_counts']
+    n = counts.get(day, 0) + sign
+    if n > 0:
+        counts[day] = n
+    else:
+        counts.pop(day, None)
+
+
+def _add(stats: dict, s, sign: int = 1):
+    stats['sessions'] += sign
+    _add_date(stats, s.get('date') or '', sign)
+    stats['videos'] += sign * _int(s.get('video_count', 0))
+    stats['total_minutes'] += sign * _int((s.get('times') or {}).get('duration_min', 0))
+    stats['total_size_bytes'] += sign * _int(s.get('total_size_bytes', 0))
+    _add_tags(stats, s.get('tags') or [], sign)
+    if sign > 0:
+        oldest, newest = s.get('oldest_video_mtime'), s.get('newest_video_mtime')
+        if oldest is not None and (stats['oldest_video_mtime'] is None or oldest < stats['oldest_video_mtime']):
+            stats['oldest_video_mtime'] = oldest
+        if newest is not None and (stats['newest_video_mtime'] is None or newest > stats['newest_video_mtime']):
+            stats['newest_video_mtime'] = newest
+
+
+def summarize(sessions) -> dict:
+    """Totals over the given summary records (whole library or a filtered view)."""
+    stats = empty_stats()
+    for s in sessions:
+        _add(stats, s)
+    return stats
+
+
+def apply_changes(stats: dict, removed, added, sessions) -> dict:
+    """
+    Return new library totals after replacing `removed` records by `added` ones.
+
+    Sums are patched with deltas; oldest/newest are only recomputed from the
+    per-session values of `sessions` (the new list) if a removed record held them.
+    """
+    new = dict(stats)
+    new['tag_counts'] = dict(stats['tag_counts'])
+    new['date_counts'] = dict(stats['date_counts'])
+    extremes_gone = False
+    for s in removed:
+        _add(new, s, -1)
+        if s.get('oldest_video_mtime') == stats['oldest_video_mtime'] or s.get('newest_video_mtime') == stats['newest_video_mtime']:
+            extremes_gone = True
+    for s in added:
+        _add(new, s)
+    if extremes_gone:
+        oldest = [s['oldest_video_mtime'] for s in sessions if s.get('oldest_video_mtime') is not None]
+        newest = [s['newest_video_mtime'] for s in sessions if s.get('newest_video_mtime') is not None]
+        new['oldest_video_mtime'] = min(oldest) if oldest else None
+        new['newest_video_mtime'] = max(newest) if newest else None
+    return new
+
+
+def retag(stats: dict, old_tags, new_tags) -> dict:
+    """Return new library totals after one session's tags changed."""
+    new = dict(stats)
+    new['tag_counts'] = dict(stats['tag_counts'])
+    _add_tags(new, old_tags or [], -1)
+    _add_tags(new, new_tags or [], 1)
+    return new
@@ -1,69 +1,41 @@
 import os
 import time
-from datetime import datetime
 import threading
 import json
+from collections import OrderedDict
 try:
-    from .thumbnail_utils import generate_thumbnail
+    from .thumbnail_utils import generate_thumbnail, select_backend, configure as configure_thumbnails
+    from .sprite_utils import generate_sprite
+    from .clip_utils import generate_preview_clip
+    from .session_index import open_index, load_sessions, sync_index, sync_subs, changed_subs, update_session_tags, load_file_table, load_file_tables, lookup_file, find_basename, SCHEMA_VERSION
+    from .session_records import SessionRecord, sort_sessions, memory_report, VIDEO
+    from .session_meta import normalize_tags
+    from .scanner import scan_sub_session, missing_previews
+    from .session_watcher import SessionWatcher
+    from . import index_snapshot, session_stats
+    from .page_cache import PAGE_CACHE
+    from . import metrics
+    from . import thumb_engine, thumb_queue, image_derivatives
+    from .derived_cache import DERIVED, KINDS as DERIVED_KINDS, fingerprint, derived_path
+    from .session_search import SearchIndex
+    from .session_query import sorted_with_keys
 except Exception:
     # script fallback
-    from flask_app.utils.thumbnail_utils import generate_thumbnail
-
-def _extract_session_date(session_folder: str, sub_folder: str) -> str:
-    """Extract ISO date (YYYY-MM-DD) from folder names like '2025.04.27_FPVSession'."""
-    for name in (session_folder, sub_folder):
-        try:
-            prefix = name.split('_', 1)[0]
-            parts = prefix.split('.')
-            if len(parts) >= 3:
-                y, m, d = parts[0:3]
-                dt = datetime(int(y), int(m), int(d))
-                return dt.strftime('%Y-%m-%d')
-        except Exception:
-            continue
-    return ''
-
-def _parse_session_times(session_folder: str, sub_folder: str):
-    """Parse start/end times from sub-folder like 'YYYY.MM.DD_HH.MM.SS-HH.MM.SS_FPVSession'."""
-    try:
-        date_part = session_folder.split('_', 1)[0]
-        if len(date_part.split('.')) < 3:
-            date_part = sub_folder.split('_', 1)[0]
-        y, m, d = map(int, date_part.split('.')[:3])
-        rest = sub_folder.split('_', 1)[1] if '_' in sub_folder else ''
-        times = rest.split('_', 1)[0] if rest else ''
-        start_t, end_t = (times.split('-') + ['',''])[:2]
-        def parse_time(t):
-            try:
-                hh, mm, ss = map(int, t.split('.')[:3])
-                return hh, mm, ss
-            except Exception:
-                return 0, 0, 0
-        sh, sm, ss = parse_time(start_t)
-        eh, em, es = parse_time(end_t)
-        start_dt = datetime(y, m, d, sh, sm, ss)
-        end_dt = datetime(y, m, d, eh, em, es)
-        if end_dt < start_dt:
-            end_dt = start_dt
-        duration_min = int((end_dt - start_dt).total_seconds() // 60)
-        weekday_map = ['Mo','Di','Mi','Do','Fr','Sa','So']
-        weekday = weekday_map[start_dt.weekday()]
-        human_date = f"{d:02d}.{m:02d}.{y}"
-        time_range = f"{sh:02d}:{sm:02d}–{eh:02d}:{em:02d}"
-        return {
-            'start_dt_iso': start_dt.strftime('%Y-%m-%d %H:%M:%S'),
-            'end_dt_iso': end_dt.strftime('%Y-%m-%d %H:%M:%S'),
-            'duration_min': duration_min,
-            'weekday': weekday,
-            'human_date': human_date,
-            'time_range': time_range,
-            'sort_key': (start_dt.strftime('%Y-%m-%d'), start_dt.strftime('%H:%M:%S'))
-        }
-    except Exception:
-        return {
-            'start_dt_iso': '', 'end_dt_iso': '', 'duration_min': None,
-            'weekday': '', 'human_date': '', 'time_range': '', 'sort_key': ('','')
-        }
+    from flask_app.utils.thumbnail_utils import generate_thumbnail, select_backend, configure as configure_thumbnails
+    from flask_app.utils.sprite_utils import generate_sprite
+    from flask_app.utils.clip_utils import generate_preview_clip
+    from flask_app.utils.session_index import open_index, load_sessions, sync_index, sync_subs, changed_subs, update_session_tags, load_file_table, load_file_tables, lookup_file, find_basename, SCHEMA_VERSION
+    from flask_app.utils.session_records import SessionRecord, sort_sessions, memory_report, VIDEO
+    from flask_app.utils.session_meta import normalize_tags
+    from flask_app.utils.scanner import scan_sub_session, missing_previews
+    from flask_app.utils.session_watcher import SessionWatcher
+    from flask_app.utils import index_snapshot, session_stats
+    from flask_app.utils.page_cache import PAGE_CACHE
+    from flask_app.utils import metrics
+    from flask_app.utils import thumb_engine, thumb_queue, image_derivatives
+    from flask_app.utils.derived_cache import DERIVED, KINDS as DERIVED_KINDS, fingerprint, derived_path
+    from flask_app.utils.session_search import SearchIndex
+    from flask_app.utils.session_query import sorted_with_keys
 
 def build_date_index(sessions):
     """Build a mapping date->list(sessions) and a sorted set of months present (YYYY-MM)."""
@@ -82,11 +54,301 @@ _CACHE = {
     'last_built': 0.0,
     'building': False,
     'progress': 0,
+    'version': 0,
+    'base': None,
+    # (sessions list the totals belong to, library totals), see get_library_stats
+    'stats': None,
+    # SearchIndex of the current sessions list, see search_sessions
+    'search': None,
+    # (sessions list, {(name, sub): record}), see get_session
+    'lookup': None,
+    # (sessions list, {sort: (keys, sessions)}), see sorted_sessions
+    'sorted': None,
 }
-_BG_JOB_RUNNING = False
+# Thumbnail backfill scheduler (builder only), see start_background_thumb_job
+# dirty: (session, sub) keys with new derivatives, applied in one go (see _flush_thumb_changes)
+_THUMBS = {'thread': None, 'base': None, 'seeded': None, 'wake': threading.Event(), 'lock': threading.Lock(),
+           'dirty': set(), 'dirty_since': 0.0}
+_PATCH_LOCK = threading.Lock()
+_WATCHER = {'watcher': None, 'base': None}
+_WATCHER_LOCK = threading.Lock()
+_ROLE = {'builder': False, 'checked': 0.0, 'reader': None}
+# Single-flight rebuild coordinator (see request_refresh)
+_BUILD_COND = threading.Condition()
+_BUILD = {'thread': None, 'current': None, 'pending': None, 'generation': 0, 'monitor': None, 'last_attempt': 0.0}
+# Second tier: full file listings, loaded on demand; (name, sub) -> (summary record, FileTable)
+_FILES_CACHE = OrderedDict()
+_FILES_LOCK = threading.Lock()
+# /media basename fallback: basename -> index version of a failed lookup (see resolve_media_fallback)
+_MEDIA_MISSES = OrderedDict()
+_MEDIA_MISSES_MAX = 4096
+_MEDIA_LOCK = threading.Lock()
+
+metrics.Gauge('fpv_index_sessions', 'Sub-sessions in the served index.', fn=lambda: len(_CACHE['sessions'] or []))
+metrics.Gauge('fpv_index_version', 'Published index snapshot version served by this worker.', fn=lambda: _CACHE['version'])
+metrics.Gauge('fpv_index_age_seconds', 'Seconds since the served index was built.',
+              fn=lambda: time.time() - _CACHE['last_built'] if _CACHE['last_built'] else 0)
+
+# Index settings, overridable via sessions_config.json (see configure)
+_SETTINGS = {
+    'index_db': os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sessions_index.sqlite3'),
+    'watch_mode': 'off',
+    'watch_debounce_sec': 2.0,
+    'watch_poll_sec': 30.0,
+    'scan_workers': 4,
+    'scan_workers_per_device': 2,
+    'snapshot_path': None,
+    'snapshot_wait_sec': 30.0,
+    'max_age_sec': 600,
+    'file_cache_size': 64,
+    'thumb_backfill': True,
+    'thumb_publish_sec': 300.0,
+    'sprites': True,
+    'sprite_grid': 10,
+    'sprite_timeout_sec': 300.0,
+    'preview_clips': True,
+    'preview_clip_sec': 6.0,
+    'preview_clip_kbps': 400,
+}
+
+def configure(cfg: dict):
+    """Apply settings from sessions_config.json (INDEX_DB, INDEX_MAX_AGE_SEC, SNAPSHOT_*, WATCH_*, SCAN_WORKERS*, FILE_CACHE_SIZE, PAGE_CACHE_*, THUMB_*, SPRITE*, PREVIEW_CLIP*, IMG_*, DERIVED_CACHE_*)."""
+    if not isinstance(cfg, dict):
+        return
+    if cfg.get('INDEX_DB'):
+        _SETTINGS['index_db'] = cfg['INDEX_DB']
+    if cfg.get('SNAPSHOT_PATH'):
+        _SETTINGS['snapshot_path'] = cfg['SNAPSHOT_PATH']
+    try:
+        if cfg.get('SNAPSHOT_WAIT_SEC') is not None:
+            _SETTINGS['snapshot_wait_sec'] = max(0.0, float(cfg['SNAPSHOT_WAIT_SEC']))
+        if cfg.get('INDEX_MAX_AGE_SEC') is not None:
+            _SETTINGS['max_age_sec'] = max(10, int(cfg['INDEX_MAX_AGE_SEC']))
+    except (TypeError, ValueError):
+        pass
+    mode = str(cfg.get('WATCH_MODE', _SETTINGS['watch_mode']) or 'off').strip().lower()
+    _SETTINGS['watch_mode'] = mode if mode in ('off', 'auto', 'inotify', 'poll') else 'off'
+    for key, name in (('watch_debounce_sec', 'WATCH_DEBOUNCE_SEC'), ('watch_poll_sec', 'WATCH_POLL_SEC')):
+        try:
+            if cfg.get(name) is not None:
+                _SETTINGS[key] = max(0.1, float(cfg[name]))
+        except (TypeError, ValueError):
+            pass
+    for key, name in (('scan_workers', 'SCAN_WORKERS'), ('scan_workers_per_device', 'SCAN_WORKERS_PER_DEVICE'),
+                      ('file_cache_size', 'FILE_CACHE_SIZE')):
+        try:
+            if cfg.get(name) is not None:
+                _SETTINGS[key] = max(1, int(cfg[name]))
+        except (TypeError, ValueError):
+            pass
+    try:
+        thumb_engine.configure(workers=cfg.get('THUMB_WORKERS'), max_concurrent=cfg.get('THUMB_MAX_CONCURRENT'),
+                               timeout_sec=cfg.get('THUMB_TIMEOUT_SEC'))
+    except (TypeError, ValueError):
+        pass
+    configure_thumbnails(backend=cfg.get('THUMB_BACKEND'))
+    if cfg.get('THUMB_BACKFILL') is not None:
+        _SETTINGS['thumb_backfill'] = bool(cfg['THUMB_BACKFILL'])
+    try:
+        if cfg.get('THUMB_PUBLISH_SEC') is not None:
+            _SETTINGS['thumb_publish_sec'] = max(10.0, float(cfg['THUMB_PUBLISH_SEC']))
+    except (TypeError, ValueError):
+        pass
+    if cfg.get('SPRITES') is not None:
+        _SETTINGS['sprites'] = bool(cfg['SPRITES'])
+    try:
+        if cfg.get('SPRITE_GRID') is not None:
+            _SETTINGS['sprite_grid'] = min(20, max(2, int(cfg['SPRITE_GRID'])))
+        if cfg.get('SPRITE_TIMEOUT_SEC') is not None:
+            _SETTINGS['sprite_timeout_sec'] = max(10.0, float(cfg['SPRITE_TIMEOUT_SEC']))
+    except (TypeError, ValueError):
+        pass
+    if cfg.get('PREVIEW_CLIPS') is not None:
+        _SETTINGS['preview_clips'] = bool(cfg['PREVIEW_CLIPS'])
+    try:
+        if cfg.get('PREVIEW_CLIP_SEC') is not None:
+            _SETTINGS['preview_clip_sec'] = min(30.0, max(1.0, float(cfg['PREVIEW_CLIP_SEC'])))
+        if cfg.get('PREVIEW_CLIP_KBPS') is not None:
+            _SETTINGS['preview_clip_kbps'] = max(50, int(cfg['PREVIEW_CLIP_KBPS']))
+    except (TypeError, ValueError):
+        pass
+    # ffmpeg slot locks + progress file live next to the snapshot (same host-wide scope)
+    thumb_engine.configure(slot_dir=_snapshot_path() + '.thumbs')
+    metrics.configure(shared_dir=_snapshot_path() + '.metrics')
+    # Resized image derivatives (/img): disk cache outside FPV_BASE, next to the index db by default
+    try:
+        image_derivatives.configure(
+            cache_dir=cfg.get('IMG_CACHE_DIR') or os.path.splitext(_SETTINGS['index_db'])[0] + '.img',
+            max_mb=cfg.get('IMG_CACHE_MB'), quality=cfg.get('IMG_QUALITY'),
+        )
+    except (TypeError, ValueError):
+        pass
+    # Thumbnails/sprites/clips: content-addressed cache outside FPV_BASE (see derived_cache)
+    try:
+        DERIVED.configure(
+            root=cfg.get('DERIVED_CACHE_DIR') or os.path.splitext(_SETTINGS['index_db'])[0] + '.derived',
+            max_mb=cfg.get('DERIVED_CACHE_MB'),
+        )
+    except (TypeError, ValueError):
+        pass
+    try:
+        PAGE_CACHE.configure(
+            max_bytes=float(cfg['PAGE_CACHE_MB']) * 1024 * 1024 if cfg.get('PAGE_CACHE_MB') is not None else None,
+            max_entries=int(cfg['PAGE_CACHE_ENTRIES']) if cfg.get('PAGE_CACHE_ENTRIES') is not None else None,
+        )
+    except (TypeError, ValueError):
+        pass
+
+def _open_index():
+    """Open the persistent index; fall back to an in-memory index if the db path is not writable."""
+    try:
+        return open_index(_SETTINGS['index_db'])
+    except Exception as e:
+        print("⚠️ Session-Index nicht verfügbar, nutze In-Memory-Index:", e)
+        return open_index(':memory:')
+
+def _open_queue():
+    """Thumbnail work queue in its own database next to the index (in-memory if that is not writable, like _open_index)."""
+    try:
+        return thumb_queue.open_queue(os.path.splitext(_SETTINGS['index_db'])[0] + '.queue.sqlite3')
+    except Exception as e:
+        print("⚠️ Thumbnail-Queue nicht verfügbar, nutze In-Memory-Queue:", e)
+        return thumb_queue.open_queue(':memory:')
+
+def _enqueue_thumbs(items) -> int:
+    """Queue (rel_video, rel_thumb) pairs for the backfill scheduler and wake it."""
+    if not items or not _SETTINGS['thumb_backfill']:
+        return 0
+    added = thumb_queue.enqueue(_open_queue(), items)
+    if added:
+        _wake_thumbs()
+    return added
+
+def _missing_previews(session) -> list:
+    return missing_previews(session, _SETTINGS['sprites'], _SETTINGS['preview_clips'])
+
+def _snapshot_path() -> str:
+    return _SETTINGS['snapshot_path'] or os.path.splitext(_SETTINGS['index_db'])[0] + '.snapshot'
+
+def is_index_builder() -> bool:
+    """True if this process holds the per-host builder lock (scans, thumbnails, watcher, snapshot publishing)."""
+    if _ROLE['builder']:
+        return True
+    now = time.time()
+    if now - _ROLE['checked'] < 5.0:
+        return False
+    _ROLE['checked'] = now
+    try:
+        _ROLE['builder'] = index_snapshot.try_become_builder(_snapshot_path())
+    except Exception as e:
+        print("⚠️ Builder-Lock nicht verfügbar, baue selbst:", e)
+        _ROLE['builder'] = True
+    if _ROLE['builder']:
+        print(f"🏗️ Prozess {os.getpid()} ist Index-Builder")
+    return _ROLE['builder']
+
+def _usable_snapshot(payload, FPV_BASE: str) -> bool:
+    return (isinstance(payload, dict) and payload.get('fpv_base') == os.path.abspath(FPV_BASE)
+            and payload.get('schema') == SCHEMA_VERSION)
+
+def _retag_cached(s, session_folder: str, sub: str, tags: list):
+    """Set the tags of a cached record and patch the derived stats/search caches."""
+    with _PATCH_LOCK:
+        cached = _CACHE['stats']
+        if cached is not None and cached[0] is _CACHE['sessions']:
+            _CACHE['stats'] = (cached[0], session_stats.retag(cached[1], s['tags'], tags))
+        search = _CACHE['search']
+        if search is not None and search.sessions is _CACHE['sessions']:
+            search.retag(session_folder, sub, tags)
+        s['tags'] = tags
+
+def _publish_snapshot(FPV_BASE: str, fresh=()):
+    """Publish the current cache as a new immutable snapshot version for the other workers.
+
+    Tag edits other workers published since our version are taken over first (except for the
+    just rescanned keys in `fresh`), so writing our full list does not undo them.
+    """
+    if _CACHE['sessions'] is None:
+        return
+
+    def payload(current):
+        if current is not None and 0 < _CACHE['version'] < current[0] and _usable_snapshot(current[2], FPV_BASE):
+            table = _lookup_table(_CACHE['sessions'])
+            for d in current[2].get('sessions') or []:
+                key = (d.get('name'), d.get('sub'))
+                s = table.get(key)
+                if key not in fresh and s is not None and isinstance(d.get('tags'), list) and s['tags'] != d['tags']:
+                    _retag_cached(s, key[0], key[1], d['tags'])
+        return {
+            'schema': SCHEMA_VERSION,
+            'fpv_base': os.path.abspath(FPV_BASE),
+            'last_built': _CACHE['last_built'],
+            'sessions': [s.summary_dict() for s in _CACHE['sessions']],
+        }
+
+    try:
+        version = index_snapshot.publish(_snapshot_path(), payload)
+    except Exception as e:
+        print("⚠️ Snapshot konnte nicht veröffentlicht werden:", e)
+        return
+    _CACHE['version'] = version
+    if _ROLE['reader'] is not None:
+        _ROLE['reader'].version = max(_ROLE['reader'].version, version)
+
+def _publish_tags(FPV_BASE: str, session_folder: str, sub: str, tags: list):
+    """Patch one session's tags into the latest published snapshot (under the publish lock).
+
+    Our own list may be older than the published one (a rebuild finished after our sync);
+    publishing it would drop the builder's newer sessions.
+    """
+    base_version = []
+
+    def payload(current):
+        if current is None or not _usable_snapshot(current[2], FPV_BASE):
+            return None  # nothing to patch; the builder publishes the tags from the index with its next build
+        for d in current[2].get('sessions') or []:
+            if d.get('name') == session_folder and d.get('sub') == sub:
+                d['tags'] = tags
+                base_version.append(current[0])
+                return current[2]
+        return None
+
+    try:
+        version = index_snapshot.publish(_snapshot_path(), payload)
+    except Exception as e:
+        print("⚠️ Snapshot konnte nicht veröffentlicht werden:", e)
+        return
+    if not version:
+        return
+    if base_version and base_version[0] == _CACHE['version']:
+        # we patched exactly the version we serve: just move on to the new version number
+        _CACHE['version'] = version
+        if _ROLE['reader'] is not None:
+            _ROLE['reader'].version = max(_ROLE['reader'].version, version)
+    else:
+        _sync_from_snapshot(FPV_BASE, force=True)
+
+def _sync_from_snapshot(FPV_BASE: str, force: bool = False) -> bool:
+    """Hot-swap the cache to a newer published snapshot. Returns True if the cache changed."""
+    reader = _ROLE['reader']
+    if reader is None or reader.path != _snapshot_path():
+        reader = _ROLE['reader'] = index_snapshot.SnapshotReader(_snapshot_path())
+        reader.version = _CACHE['version']
+    res = reader.poll(force=force)
+    if res is None:
+        return False
+    version, _built_at, payload = res
+    if not _usable_snapshot(payload, FPV_BASE):
+        # other library, or published by an older version (records and index tables no longer match): wait for a rebuild
+        return False
+    with _PATCH_LOCK:
+        _CACHE['sessions'] = [SessionRecord.from_summary(s) for s in payload.get('sessions') or []]
+        _CACHE['base'] = payload['fpv_base']
+        _CACHE['last_built'] = float(payload.get('last_built') or 0.0)
+        _CACHE['version'] = version
+    return True
 
 def _scan_sessions(FPV_BASE: str, generate_thumbs: bool) -> list:
-    sessions = []
     # Guard: if base directory doesn't exist, return empty list gracefully
     try:
         if not FPV_BASE or not os.path.isdir(FPV_BASE):
@@ -96,158 +358,32 @@ def _scan_sessions(FPV_BASE: str, generate_thumbs: bool) -> list:
             return []
     except Exception:
         return []
-    total_videos = 0
-    thumb_tasks = []
-
-    # Sammle Thumbnail-Aufgaben
-    for session_folder in sorted(os.listdir(FPV_BASE)):
-        session_path = os.path.join(FPV_BASE, session_folder)
-        if os.path.isdir(session_path):
-            for sub in sorted(os.listdir(session_path)):
-                sub_path = os.path.join(session_path, sub)
-                if os.path.isdir(sub_path):
-                    img_dir = os.path.join(sub_path, 'IMG')
-                    if not os.path.exists(img_dir):
-                        os.makedirs(img_dir)
-                    for root, dirs, files in os.walk(sub_path):
-                        for f in files:
-                            if f.lower().endswith(('.mp4', '.mov')):
-                                base_name = os.path.splitext(os.path.basename(f))[0]
-                                thumb_name = f"{base_name}_thumb.jpg"
-                                thumb_path = os.path.join(img_dir, thumb_name)
-                                abs_video = os.path.join(root, f)
-                                if not os.path.exists(thumb_path):
-                                    thumb_tasks.append((abs_video, thumb_path))
-                                total_videos += 1
-
-    # Optional: Thumbs generieren
-    if generate_thumbs and thumb_tasks:
-        print(f"\n🖼️ Es werden {len(thumb_tasks)} neue Thumbnails generiert (von {total_videos} Videos)...")
-        start = time.time()
-        for idx, (abs_video, thumb_path) in enumerate(thumb_tasks, 1):
-            # Update progress during thumbnail generation (10% to 80%)
-            progress = 10 + int((idx / len(thumb_tasks)) * 70)
-            _CACHE['progress'] = progress
-
-            ok = generate_thumbnail(abs_video, thumb_path)
-            now = time.time()
-            elapsed = now - start
-            avg = elapsed / idx if idx else 0.0
-            remaining = len(thumb_tasks) - idx
-            eta_secs = avg * remaining
-            end_ts = start + avg * len(thumb_tasks) if avg > 0 else now
-            line = (
-                f"\r⚙️ {idx:>3} / {len(thumb_tasks)} Thumbs ({progress}%) | "
-                f"🕒 Start: {time.strftime('%H:%M:%S', time.localtime(start))} | "
-                f"⏱️ Elapsed: {elapsed:.1f}s | "
-                f"⏲️ Avg/Thumb: {avg:.2f}s | "
-                f"⏳ ETA: {eta_secs:.1f}s | "
-                f"🏁 End: {time.strftime('%H:%M:%S', time.localtime(end_ts))} | "
-                f"{'✅' if ok else '❌'} {os.path.basename(abs_video)}"
-            )
-            print(line, end='', flush=True)
-        print()
-        _CACHE['progress'] = 80
-
-    # Sessions aufbauen
-    for session_folder in sorted(os.listdir(FPV_BASE)):
-        session_path = os.path.join(FPV_BASE, session_folder)
-        if os.path.isdir(session_path):
-            for sub in sorted(os.listdir(session_path)):
-                sub_path = os.path.join(session_path, sub)
-                if os.path.isdir(sub_path):
-                    img_dir = os.path.join(sub_path, 'IMG')
-                    meta_path = os.path.join(sub_path, '.fpvweb_meta.json')
-                    _times = _parse_session_times(session_folder, sub)
-                    session = {
-                        'name': session_folder,
-                        'sub': sub,
-                        'videos': [],
-                        'images': [],
-                        'logs': [],
-                        'goggles': [],
-                        'blackbox': [],
-                        'meta': [],
-                        'thumbnails': [],
-                        'preview_video': None,
-                        'preview_thumb': None,
-                        'date': _extract_session_date(session_folder, sub),
-                        'times': _times,
-                        'video_count': 0,
-                        'image_count': 0,
-                        'log_count': 0,
-                        'blackbox_count': 0,
-                        'tags': []
-                    }
-
-                    # Tags laden
-                    try:
-                        if os.path.exists(meta_path):
-                            with open(meta_path, 'r', encoding='utf-8') as f:
-                                meta = json.load(f)
-                                tags = meta.get('tags', [])
-                                if isinstance(tags, list):
-                                    norm = []
-                                    seen = set()
-                                    for t in tags:
-                                        v = str(t).strip().lower()
-                                        if v and v not in seen:
-                                            seen.add(v)
-                                            norm.append(v)
-                                    session['tags'] = norm
-                    except Exception:
-                        pass
-
-                    min_size = None
-                    min_video_rel = None
-                    thumb_by_video = {}
-
-                    for root, dirs, files in os.walk(sub_path):
-                        for f in files:
-                            rel_path = os.path.relpath(os.path.join(root, f), FPV_BASE).replace('\\','/')
-                            if f.lower().endswith(('.mp4', '.mov')):
-                                session['videos'].append(rel_path)
-                                session['video_count'] += 1
-                                base_name = os.path.splitext(os.path.basename(f))[0]
-                                thumb_name = f"{base_name}_thumb.jpg"
-                                thumb_path = os.path.join(img_dir, thumb_name)
-                                thumb_rel = os.path.relpath(thumb_path, FPV_BASE).replace('\\','/')
-                                session['thumbnails'].append({'video': rel_path, 'thumb': thumb_rel})
-                                thumb_by_video[rel_path] = thumb_rel
-                                try:
-                                    abs_video = os.path.join(root, f)
-                                    size = os.path.getsize(abs_video)
-                                    if min_size is None or size < min_size:
-                                        min_size = size
-                                        min_video_rel = rel_path
-                                except Exception:
-                                    pass
-                            elif f.lower().endswith(('.png', '.jpg', '.jpeg')):
-                                session['images'].append(rel_path)
-                                session['image_count'] += 1
-                            elif f.lower().endswith('.bfl'):
-                                session['blackbox'].append(rel_path)
-                                session['blackbox_count'] += 1
-                            elif f.lower().endswith('.txt'):
-                                session['logs'].append(rel_path)
-                                session['log_count'] += 1
-                            elif f.lower().endswith('.json'):
-                                session['meta'].append(rel_path)
-                            else:
-                                if 'goggel' in f.lower():
-                                    session['goggles'].append(rel_path)
-
-                    # set preview video and preferred thumbnail
-                    if min_video_rel:
-                        session['preview_video'] = min_video_rel
-                        if min_video_rel in thumb_by_video:
-                            session['preview_thumb'] = thumb_by_video[min_video_rel]
-                        elif session['thumbnails']:
-                            session['preview_thumb'] = session['thumbnails'][0]['thumb']
-                    sessions.append(session)
-
-    # Nach Datum und Startzeit absteigend sortieren
-    sessions.sort(key=lambda s: (s.get('date',''), s.get('times',{}).get('sort_key', ('',''))), reverse=True)
+
+    conn = _open_index()
+    def _progress(idx, total):
+        _CACHE['progress'] = 10 + int((idx / total) * 80)
+
+    # Neu gescannte Videos ohne Thumbnail/Sprite/Clip landen in der Thumbnail-Queue
+    new_thumbs = []
+    def _scanned(session):
+        new_thumbs.extend(_missing_previews(session))
+
+    # Inkrementeller Abgleich: nur geänderte Sub-Sessions werden neu gescannt
+    start = time.time()
+    sessions, st = sync_index(conn, FPV_BASE, scan_sub_session, _progress,
+                              workers=_SETTINGS['scan_workers'], per_device=_SETTINGS['scan_workers_per_device'],
+                              on_scanned=_scanned)
+    print(f"📇 Index: {st['scanned']} gescannt, {st['reused']} unverändert, {st['removed']} entfernt ({time.time() - start:.2f}s)")
+    for result in ('scanned', 'reused', 'removed'):
+        metrics.INDEX_SUBS.inc(st[result], result=result)
+
+    # generate_thumbs: alle fehlenden Thumbs aus dem Index einreihen (kein Zugriff aufs Dateisystem)
+    if generate_thumbs:
+        tables = load_file_tables(conn)
+        new_thumbs = [t for s in sessions for t in _missing_previews(s.with_files(tables.get((s.name, s.sub))))]
+    added = _enqueue_thumbs(new_thumbs)
+    if added:
+        print(f"🖼️ {added} Videos ohne Thumbnail/Sprite/Clip eingereiht")
     return sessions
 
 def get_meta_path(FPV_BASE: str, session_folder: str, sub: str) -> str:
@@ -261,74 +397,672 @@ def get_session_tags(FPV_BASE: str, session_folder: str, sub: str) -> list:
                 data = json.load(f)
                 tags = data.get('tags', [])
                 if isinstance(tags, list):
-                    norm = []
-                    seen = set()
-                    for t in tags:
-                        v = str(t).strip().lower()
-                        if v and v not in seen:
-                            seen.add(v)
-                            norm.append(v)
-                    return norm
+                    return normalize_tags(tags)
     except Exception:
         return []
     return []
 
 def save_session_tags(FPV_BASE: str, session_folder: str, sub: str, tags: list) -> list:
     path = get_meta_path(FPV_BASE, session_folder, sub)
-    norm = []
-    seen = set()
-    for t in (tags or []):
-        v = str(t).strip().lower()
-        if v and v not in seen:
-            seen.add(v)
-            norm.append(v)
-    data = {'tags': norm}
+    data = {'tags': normalize_tags(tags)}
     try:
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
     except Exception as e:
         print('❌ Fehler beim Speichern der Tags:', e)
 
-    # Cache aktualisieren
+    # Index aktualisieren
+    try:
+        update_session_tags(_open_index(), session_folder, sub, data['tags'], os.stat(path).st_mtime)
+    except Exception as e:
+        print('⚠️ Index-Update für Tags fehlgeschlagen:', e)
+
+    # Cache aktualisieren (vorher auf den neuesten Snapshot der anderen Worker ziehen)
+    _sync_from_snapshot(FPV_BASE, force=True)
     if _CACHE.get('sessions'):
-        for s in _CACHE['sessions']:
-            if s['name'] == session_folder and s['sub'] == sub:
-                s['tags'] = data['tags']
-                break
+        s = _lookup_table(_CACHE['sessions']).get((session_folder, sub))
+        if s is not None:
+            _retag_cached(s, session_folder, sub, data['tags'])
+        _publish_tags(FPV_BASE, session_folder, sub, data['tags'])
+    # Rendered pages show tags; other workers drop theirs through the version bump
+    PAGE_CACHE.clear()
     return data['tags']
 
-def refresh_sessions(FPV_BASE: str, generate_thumbs: bool = False):
-    if _CACHE['building']:
-        return
+def _run_build(FPV_BASE: str, generate_thumbs: bool):
+    """The actual (incremental) rebuild; only ever runs on the single build thread."""
     _CACHE['building'] = True
     _CACHE['progress'] = 0
     try:
         print("\n🗂️ (Re)Build Sessions Index ...")
         _CACHE['progress'] = 10
-        sessions = _scan_sessions(FPV_BASE, generate_thumbs)
+        with metrics.INDEX_BUILD_SECONDS.time(kind='thumbs' if generate_thumbs else 'scan'):
+            sessions = _scan_sessions(FPV_BASE, generate_thumbs)
         _CACHE['progress'] = 90
-        _CACHE['sessions'] = sessions
-        _CACHE['last_built'] = time.time()
+        with _PATCH_LOCK:
+            _CACHE['sessions'] = sessions
+            _CACHE['base'] = os.path.abspath(FPV_BASE)
+            _CACHE['last_built'] = time.time()
+        _publish_snapshot(FPV_BASE)
         _CACHE['progress'] = 100
         print("✅ Index bereit! Sessions:", len(sessions))
     finally:
         _CACHE['building'] = False
 
-def get_cached_sessions(FPV_BASE: str, max_age_sec: int = 600):
-    now = time.time()
-    if not _CACHE['sessions'] or (now - _CACHE['last_built'] > max_age_sec and not _CACHE['building']):
-        refresh_sessions(FPV_BASE, generate_thumbs=False)
-    return _CACHE['sessions'] or []
+def _build_worker(FPV_BASE: str, generate_thumbs: bool):
+    while True:
+        _BUILD['last_attempt'] = time.time()
+        try:
+            _run_build(FPV_BASE, generate_thumbs)
+        except Exception as e:
+            print("❌ Index-Build fehlgeschlagen:", e)
+        with _BUILD_COND:
+            _BUILD['generation'] += 1
+            _BUILD_COND.notify_all()
+            if _BUILD['pending'] is None:
+                _BUILD['thread'] = None
+                _BUILD['current'] = None
+                return
+            FPV_BASE, generate_thumbs = _BUILD['pending']
+            _BUILD['pending'] = None
+            _BUILD['current'] = (FPV_BASE, generate_thumbs)
+
+def _request_remote_refresh(FPV_BASE: str, generate_thumbs: bool):
+    """Ask the builder process to rebuild (it watches the request file, see _builder_monitor)."""
+    try:
+        with open(_snapshot_path() + '.rebuild', 'w', encoding='utf-8') as f:
+            json.dump({'fpv_base': FPV_BASE, 'generate_thumbs': bool(generate_thumbs), 'ts': time.time()}, f)
+    except Exception as e:
+        print("⚠️ Rebuild-Anfrage fehlgeschlagen:", e)
+
+def request_refresh(FPV_BASE: str, generate_thumbs: bool = False, wait: bool = False, timeout: float = None) -> bool:
+    """
+    Single-flight rebuild trigger. Starts a background build unless one is running;
+    concurrent triggers merge into the running build (a follow-up run is queued only
+    if it has to cover a different base or thumbnail generation).
+    With wait=True blocks until a build covering this request finished or timeout
+    passed; returns True if fresh data is available.
+    """
+    if not is_index_builder():
+        # Another worker on this host builds: forward the request and wait for its next snapshot
+        start_version = _CACHE['version']
+        _request_remote_refresh(FPV_BASE, generate_thumbs)
+        if not wait:
+            return False
+        deadline = None if timeout is None else time.time() + timeout
+        while deadline is None or time.time() < deadline:
+            if _sync_from_snapshot(FPV_BASE, force=True) and _CACHE['version'] > start_version:
+                return True
+            time.sleep(0.5)
+        return False
+    with _BUILD_COND:
+        target = _BUILD['generation'] + 1
+        if _BUILD['thread'] is None:
+            _BUILD['current'] = (FPV_BASE, generate_thumbs)
+            t = threading.Thread(target=_build_worker, args=(FPV_BASE, generate_thumbs), name='fpv-index-build', daemon=True)
+            _BUILD['thread'] = t
+            t.start()
+        else:
+            cur_base, cur_thumbs = _BUILD['current']
+            if cur_base != FPV_BASE or (generate_thumbs and not cur_thumbs):
+                pending = _BUILD['pending']
+                thumbs = generate_thumbs or bool(pending and pending[0] == FPV_BASE and pending[1])
+                _BUILD['pending'] = (FPV_BASE, thumbs)
+                target += 1
+        if not wait:
+            return False
+        return _BUILD_COND.wait_for(lambda: _BUILD['generation'] >= target, timeout)
+
+def refresh_sessions(FPV_BASE: str, generate_thumbs: bool = False):
+    """Blocking rebuild (merged with any build already running)."""
+    request_refresh(FPV_BASE, generate_thumbs, wait=True)
+
+def _builder_monitor():
+    """Builder-only thread: serve rebuild requests from other workers and refresh when the index gets stale."""
+    seen = None
+    while True:
+        time.sleep(1.0)
+        try:
+            path = _snapshot_path() + '.rebuild'
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != seen:
+                first = seen is None
+                seen = mtime
+                with open(path, 'r', encoding='utf-8') as f:
+                    req = json.load(f)
+                # Ignore requests older than this process' first look (left over from a previous run)
+                if not first or time.time() - float(req.get('ts', 0)) < 60:
+                    request_refresh(req['fpv_base'], bool(req.get('generate_thumbs')))
+            base = _CACHE.get('base')
+            if base and _CACHE['sessions'] is not None and _is_stale(_SETTINGS['max_age_sec']):
+                request_refresh(base)
+        except Exception as e:
+            print("⚠️ Builder-Monitor:", e)
+
+def _is_stale(max_age_sec) -> bool:
+    # A failed build counts as an attempt so a broken library is not rescanned in a loop
+    return time.time() - max(_CACHE['last_built'], _BUILD['last_attempt']) > max_age_sec
+
+def _ensure_builder_monitor():
+    with _BUILD_COND:
+        if _BUILD['monitor'] is None:
+            _BUILD['monitor'] = threading.Thread(target=_builder_monitor, name='fpv-index-monitor', daemon=True)
+            _BUILD['monitor'].start()
+
+def _load_from_index(FPV_BASE: str):
+    """Warm start: fill the in-process cache from the persistent index without touching FPV_BASE."""
+    try:
+        sessions, last_built = load_sessions(_open_index(), FPV_BASE)
+    except Exception as e:
+        print("⚠️ Index konnte nicht geladen werden:", e)
+        return
+    if sessions is not None:
+        with _PATCH_LOCK:
+            _CACHE['sessions'] = sessions
+            _CACHE['base'] = os.path.abspath(FPV_BASE)
+            _CACHE['last_built'] = last_built
+        print("📇 Index geladen! Sessions:", len(sessions))
+
+def _wait_for_snapshot(FPV_BASE: str):
+    """Non-builder cold start: wait (bounded) for the builder to publish its first snapshot."""
+    deadline = time.time() + _SETTINGS['snapshot_wait_sec']
+    while _CACHE['sessions'] is None and time.time() < deadline:
+        if _sync_from_snapshot(FPV_BASE, force=True) or is_index_builder():
+            return
+        time.sleep(0.5)
+
+def get_cached_sessions(FPV_BASE: str, max_age_sec: int = None):
+    """
+    Stale-while-revalidate: always return the last good index immediately and refresh
+    it in the background once it is older than max_age_sec. Only a cold start with
+    nothing to serve waits for the first build.
+    """
+    builder = is_index_builder()
+    if builder:
+        _ensure_builder_monitor()
+    # Pick up versions published by other workers (rebuilds, tag edits); rate-limited stat
+    _sync_from_snapshot(FPV_BASE)
+    if _CACHE['base'] is not None and _CACHE['base'] != os.path.abspath(FPV_BASE):
+        # FPV_BASE was switched: the cached index belongs to the old library
+        with _PATCH_LOCK:
+            _CACHE['sessions'] = None
+            _CACHE['base'] = None
+    if _CACHE['sessions'] is None:
+        if not _sync_from_snapshot(FPV_BASE, force=True):
+            _load_from_index(FPV_BASE)
+        if _CACHE['sessions'] is None:
+            if builder:
+                request_refresh(FPV_BASE, wait=True)
+            else:
+                _wait_for_snapshot(FPV_BASE)
+        return _CACHE['sessions'] or []
+    if _is_stale(_SETTINGS['max_age_sec'] if max_age_sec is None else max_age_sec):
+        request_refresh(FPV_BASE)
+    return _CACHE['sessions']
+
+def _lookup_table(sessions: list) -> dict:
+    cached = _CACHE['lookup']
+    if cached is not None and cached[0] is sessions:
+        return cached[1]
+    table = {(s['name'], s['sub']): s for s in sessions}
+    with _PATCH_LOCK:
+        if _CACHE['sessions'] is sessions:
+            _CACHE['lookup'] = (sessions, table)
+    return table
+
+def get_session(FPV_BASE: str, session_folder: str, sub: str):
+    """Summary record for (session, sub) in O(1), or None."""
+    return _lookup_table(get_cached_sessions(FPV_BASE)).get((session_folder, sub))
+
+def get_session_for_path(FPV_BASE: str, rel_path: str):
+    """
+    (summary record, (size, mtime)) of the indexed file at rel_path ('<session>/<sub>/...'), or None.
+
+    The session is found by key from the first two path segments, the file via the
+    primary key of the index files table, so neither depends on the library size.
+    """
+    parts = (rel_path or '').replace('\\', '/').strip('/').split('/')
+    if len(parts) < 3:
+        return None
+    s = get_session(FPV_BASE, parts[0], parts[1])
+    if s is None:
+        return None
+    entry = lookup_file(_open_index(), '/'.join(parts))
+    if entry is None:
+        return None
+    return s, entry
+
+def _suffix_match(a: list, b: list) -> int:
+    """Number of equal trailing path segments."""
+    n = 0
+    while n < min(len(a), len(b)) and a[-1 - n] == b[-1 - n]:
+        n += 1
+    return n
+
+def resolve_media_fallback(FPV_BASE: str, req: str, referrer: str = None):
+    """
+    Relative path of the indexed file a broken /media link most likely means (same basename), or None.
+
+    One index lookup instead of walking FPV_BASE. Several candidates are ranked by the
+    number of trailing path segments they share with the request, then by path, so the
+    same link always resolves to the same file. Misses are remembered until the index
+    changes. Every resolution is logged together with the referring page.
+    """
+    parts = [p for p in (req or '').replace('\\', '/').split('/') if p]
+    if not parts:
+        return None
+    base = parts[-1]
+    version = _CACHE['version']
+    with _MEDIA_LOCK:
+        if _MEDIA_MISSES.get(base) == version:
+            _MEDIA_MISSES.move_to_end(base)
+            metrics.MEDIA_FALLBACK.inc(result='cached_miss')
+            return None
+    candidates = [rel for rel in find_basename(_open_index(), base)
+                  if os.path.isfile(os.path.join(FPV_BASE, rel.replace('/', os.sep)))]
+    via = f" (von {referrer})" if referrer else ''
+    if not candidates:
+        with _MEDIA_LOCK:
+            _MEDIA_MISSES[base] = version
+            _MEDIA_MISSES.move_to_end(base)
+            while len(_MEDIA_MISSES) > _MEDIA_MISSES_MAX:
+                _MEDIA_MISSES.popitem(last=False)
+        metrics.MEDIA_FALLBACK.inc(result='miss')
+        print(f"🚫 Media-Fallback: {req} nicht gefunden{via}")
+        return None
+    rel = min(candidates, key=lambda c: (-_suffix_match(c.split('/'), parts), c))
+    metrics.MEDIA_FALLBACK.inc(result='ambiguous' if len(candidates) > 1 else 'resolved')
+    note = f", {len(candidates)} Kandidaten" if len(candidates) > 1 else ''
+    print(f"🔗 Media-Fallback: {req} -> {rel}{note}{via}")
+    return rel
+
+def get_session_detail(FPV_BASE: str, session_folder: str, sub: str):
+    """
+    Summary record of one session with its full file listing attached, or None if unknown.
+
+    Listings are loaded from the persistent index on first use and kept in a small LRU;
+    an entry is reused only while the summary it was loaded for is still the cached one.
+    """
+    summary = get_session(FPV_BASE, session_folder, sub)
+    if summary is None:
+        return None
+    key = (session_folder, sub)
+    with _FILES_LOCK:
+        entry = _FILES_CACHE.get(key)
+        if entry is not None and entry[0] is summary:
+            _FILES_CACHE.move_to_end(key)
+            return summary.with_files(entry[1])
+    files = load_file_table(_open_index(), session_folder, sub)
+    if files is None:
+        return None
+    _remember_files(key, summary, files)
+    return summary.with_files(files)
+
+def _remember_files(key, summary, files):
+    with _FILES_LOCK:
+        _FILES_CACHE[key] = (summary, files)
+        _FILES_CACHE.move_to_end(key)
+        while len(_FILES_CACHE) > _SETTINGS['file_cache_size']:
+            _FILES_CACHE.popitem(last=False)
+
+def get_library_stats(FPV_BASE: str, sessions: list = None) -> dict:
+    """
+    Totals (videos, minutes, video bytes, oldest/newest video, tags) from the summary records.
+
+    Without `sessions` the cached, incrementally patched library totals are returned;
+    a filtered view passes its sessions and gets their per-session values summed.
+    """
+    if sessions is not None:
+        return session_stats.summarize(sessions)
+    sessions = get_cached_sessions(FPV_BASE)
+    with _PATCH_LOCK:
+        cached = _CACHE['stats']
+        if cached is not None and cached[0] is sessions:
+            return cached[1]
+    stats = session_stats.summarize(sessions)
+    with _PATCH_LOCK:
+        if _CACHE['sessions'] is sessions:
+            _CACHE['stats'] = (sessions, stats)
+    return stats
+
+def search_sessions(FPV_BASE: str, q: str) -> list:
+    """Sessions matching q (substring, tag:..., date:...) via the search index of the current sessions list."""
+    sessions = get_cached_sessions(FPV_BASE)
+    if not (q or '').strip():
+        return sessions
+    search = _CACHE['search']
+    if search is None or search.sessions is not sessions:
+        # Built once per index version (rebuild, live update, snapshot swap)
+        search = SearchIndex(sessions)
+        with _PATCH_LOCK:
+            if _CACHE['sessions'] is sessions:
+                _CACHE['search'] = search
+    return search.search(q)
+
+def get_index_version() -> int:
+    """Version of the published index snapshot the cache currently serves (bumps on rebuilds, live updates, tag edits)."""
+    return _CACHE['version']
+
+def sorted_sessions(FPV_BASE: str, sort: str = 'date', q: str = ''):
+    """(keys, sessions) ascending by session_query.sort_key; unfiltered orders are cached per index version."""
+    if (q or '').strip():
+        return sorted_with_keys(search_sessions(FPV_BASE, q), sort)
+    sessions = get_cached_sessions(FPV_BASE)
+    cached = _CACHE['sorted']
+    if cached is None or cached[0] is not sessions:
+        cached = (sessions, {})
+        with _PATCH_LOCK:
+            if _CACHE['sessions'] is sessions:
+                _CACHE['sorted'] = cached
+    result = cached[1].get(sort)
+    if result is None:
+        result = cached[1][sort] = sorted_with_keys(sessions, sort)
+    return result
+
+def index_memory_report() -> dict:
+    """Resident size of the summary index vs. the same data as legacy dicts (listings read from the index db)."""
+    sessions = _CACHE['sessions'] or []
+    report = memory_report(sessions, load_file_tables(_open_index()))
+    with _FILES_LOCK:
+        report['file_cache_entries'] = len(_FILES_CACHE)
+    report['version'] = _CACHE['version']
+    return report
 
 def start_background_thumb_job(FPV_BASE: str):
-    global _BG_JOB_RUNNING
-    if _BG_JOB_RUNNING:
+    """Make sure the thumbnail backfill scheduler runs for FPV_BASE (builder only; cheap, called per request)."""
+    if not _SETTINGS['thumb_backfill'] or not is_index_builder():
+        return
+    with _THUMBS['lock']:
+        if _THUMBS['base'] != FPV_BASE:
+            _THUMBS['base'] = FPV_BASE
+            _THUMBS['seeded'] = None
+        t = _THUMBS['thread']
+        if t is None or not t.is_alive():
+            t = threading.Thread(target=_thumb_scheduler, name='fpv-thumb-scheduler', daemon=True)
+            _THUMBS['thread'] = t
+            t.start()
+    _THUMBS['wake'].set()
+
+def _seed_thumb_queue(FPV_BASE: str):
+    """Once per process and base: queue every indexed video with missing previews (index only, no filesystem walk)."""
+    if _THUMBS['seeded'] == FPV_BASE or _CACHE['sessions'] is None:
+        return
+    tables = load_file_tables(_open_index())
+    items = [t for s in _CACHE['sessions'] for t in _missing_previews(s.with_files(tables.get((s.name, s.sub))))]
+    del tables
+    added = _enqueue_thumbs(items)
+    _THUMBS['seeded'] = FPV_BASE
+    if added:
+        print(f"🖼️ {added} Videos ohne Thumbnail/Sprite/Clip eingereiht")
+
+def _derived_sibling(thumb: str, kind: str) -> str:
+    """Sprite VTT / preview clip of the same source as a thumbnail path in the derived cache."""
+    return thumb[:-len(DERIVED_KINDS['thumb'])] + DERIVED_KINDS[kind]
+
+def _made(path: str, ok: bool) -> bool:
+    """Account a freshly generated derivative in the derived cache (size cap / LRU)."""
+    if ok:
+        try:
+            DERIVED.added(os.path.getsize(path))
+        except OSError:
+            pass
+    return ok
+
+def _generate_previews(video: str, thumb: str, timeout: float, clip: bool = False) -> bool:
+    """Queue item job: create whatever is missing of thumbnail, sprite sheet and preview clip (in the same ffmpeg slot)."""
+    ok = os.path.exists(thumb) or _made(thumb, generate_thumbnail(video, thumb, timeout))
+    if ok and _SETTINGS['sprites']:
+        sprite = _derived_sibling(thumb, 'sprite')
+        if not os.path.exists(sprite):
+            ok = _made(sprite, generate_sprite(video, sprite, _SETTINGS['sprite_timeout_sec'], _SETTINGS['sprite_grid']))
+            _made(_derived_sibling(thumb, 'sheet'), ok)
+    if ok and clip:
+        clip_path = _derived_sibling(thumb, 'clip')
+        # encoding a few seconds takes longer than grabbing one frame
+        ok = os.path.exists(clip_path) or _made(clip_path, generate_preview_clip(video, clip_path, timeout * 4,
+                                                                                 _SETTINGS['preview_clip_sec'],
+                                                                                 _SETTINGS['preview_clip_kbps']))
+    return ok
+
+def _previews_done(abs_thumb: str, clip: bool) -> bool:
+    if not os.path.exists(abs_thumb):
+        return False
+    if _SETTINGS['sprites'] and not os.path.exists(_derived_sibling(abs_thumb, 'sprite')):
+        return False
+    return not clip or os.path.exists(_derived_sibling(abs_thumb, 'clip'))
+
+def derived_fingerprints() -> set:
+    """Fingerprints of all indexed videos, i.e. what the derived cache should hold (cache verify/prune)."""
+    fps = set()
+    for table in load_file_tables(_open_index()).values():
+        fps.update(table.fingerprint(i) for i in table.indices(VIDEO))
+    return fps
+
+# Records reference the derivatives of every indexed video: those must survive LRU eviction
+DERIVED.pinned = derived_fingerprints
+
+def requeue_missing_previews(FPV_BASE: str) -> int:
+    """Queue every indexed video whose derivatives are missing (e.g. after pruning the cache by hand)."""
+    sessions = get_cached_sessions(FPV_BASE)
+    tables = load_file_tables(_open_index())
+    return _enqueue_thumbs([t for s in sessions for t in _missing_previews(s.with_files(tables.get((s.name, s.sub))))])
+
+def _wants_clip(FPV_BASE: str, video: str) -> bool:
+    """Only the preview video of a session gets a clip."""
+    if not _SETTINGS['preview_clips']:
+        return False
+    parts = video.split('/', 2)
+    rec = get_session(FPV_BASE, parts[0], parts[1]) if len(parts) == 3 else None
+    return rec is not None and rec.preview_video == video
+
+def _run_thumb_batch(FPV_BASE: str, batch: list):
+    """Generate one batch from the queue; successes leave the queue, failures go into the negative cache."""
+    conn = _open_queue()
+    index = _open_index()
+    tasks, gone, clips = [], [], set()
+    for video, _thumb in batch:
+        abs_video = os.path.join(FPV_BASE, video.replace('/', os.sep))
+        # target from the indexed fingerprint (also covers entries queued with an older thumbnail location)
+        entry = lookup_file(index, video)
+        if entry is None or not os.path.exists(abs_video):
+            gone.append(video)
+            continue
+        abs_thumb = derived_path(fingerprint(video, *entry), 'thumb')
+        clip = _wants_clip(FPV_BASE, video)
+        if _previews_done(abs_thumb, clip):
+            gone.append(video)
+        else:
+            tasks.append((abs_video, abs_thumb, video))
+            if clip:
+                clips.add(abs_video)
+    thumb_queue.done(conn, gone)
+    if not tasks:
         return
-    def _job():
+    by_abs = {t[0]: t[2] for t in tasks}
+    created = []
+
+    def _on_item(idx, total, task, ok):
+        video = by_abs[task[0]]
+        if ok:
+            created.append(video)
+        else:
+            thumb_queue.failed(conn, video, 'ffmpeg failed')
+        st = thumb_engine.status()
+        line = (
+            f"\r⚙️ {idx:>3} / {total} Thumbs | "
+            f"🧵 {st['workers']} Worker (max {st['max_concurrent']} ffmpeg) | "
+            f"⏱️ Elapsed: {st['elapsed_sec']:.1f}s | "
+            f"⏲️ Avg/Thumb: {st['avg_sec']:.2f}s | "
+            f"⏳ ETA: {st['eta_sec'] or 0:.1f}s | "
+            f"{'✅' if ok else '❌'} {os.path.basename(task[0])}"
+        )
+        print(line, end='', flush=True)
+
+    def _generate(video, thumb, timeout):
+        return _generate_previews(video, thumb, timeout, video in clips)
+
+    thumb_engine.run([(t[0], t[1]) for t in tasks], _generate, _on_item)
+    print()
+    thumb_queue.done(conn, created)
+    # Neue Derivate ändern die Vorschau-Felder -> Sub-Sessions vormerken, gesammelt neu einlesen
+    if created and not _THUMBS['dirty']:
+        _THUMBS['dirty_since'] = time.time()
+    _THUMBS['dirty'].update(tuple(video.split('/', 2)[:2]) for video in created)
+
+def _flush_thumb_changes(FPV_BASE: str, force: bool = False):
+    """
+    Rescan the sub-sessions with new derivatives in one go: when the queue ran dry, during a
+    long backfill at most every THUMB_PUBLISH_SEC. Each apply publishes a snapshot and bumps
+    the index version (page cache, ETags), so this must not happen per batch.
+    """
+    keys = _THUMBS['dirty']
+    if not keys or (not force and time.time() - _THUMBS['dirty_since'] < _SETTINGS['thumb_publish_sec']):
+        return
+    _THUMBS['dirty'] = set()
+    apply_session_changes(FPV_BASE, keys)
+
+def _thumb_wake_path() -> str:
+    return _snapshot_path() + '.thumbwake'
+
+def _thumb_wake_stamp():
+    try:
+        return os.stat(_thumb_wake_path()).st_mtime_ns
+    except OSError:
+        return None
+
+def _wake_thumbs():
+    """Wake the thumbnail scheduler: directly in the builder, through the wake file from other workers."""
+    thread = _THUMBS['thread']
+    if thread is not None and thread.is_alive():
+        _THUMBS['wake'].set()
+        return
+    try:
+        with open(_thumb_wake_path(), 'a'):
+            pass
+        os.utime(_thumb_wake_path())
+    except OSError as e:
+        print("⚠️ Thumbnail-Scheduler konnte nicht geweckt werden:", e)
+
+def _thumb_scheduler():
+    """
+    Builder-only thread: drain the thumbnail queue in priority order, sleep until new work or the next
+    retry is due. Other workers wake it by touching the wake file (checked every second while idle).
+    """
+    while True:
+        FPV_BASE = _THUMBS['base']
+        stamp = _thumb_wake_stamp()
         try:
-            refresh_sessions(FPV_BASE, generate_thumbs=True)
+            _seed_thumb_queue(FPV_BASE)
+            conn = _open_queue()
+            batch = thumb_queue.due(conn, thumb_engine.batch_size())
+            if batch:
+                _run_thumb_batch(FPV_BASE, batch)
+                _flush_thumb_changes(FPV_BASE)
+                continue
+            _flush_thumb_changes(FPV_BASE, force=True)
+            next_try = thumb_queue.next_due(conn)
+            wait = 60.0 if next_try is None else min(60.0, max(1.0, next_try - time.time()))
         except Exception as e:
-            print("❌ Hintergrund-Job Fehler:", e)
-    t = threading.Thread(target=_job, daemon=True)
-    t.start()
-    _BG_JOB_RUNNING = True
+            print("⚠️ Thumbnail-Scheduler:", e)
+            wait = 30.0
+        deadline = time.time() + wait
+        while not _THUMBS['wake'].wait(min(1.0, max(0.0, deadline - time.time()))):
+            if time.time() >= deadline or _thumb_wake_stamp() != stamp:
+                break
+        _THUMBS['wake'].clear()
+
+def prioritize_session_thumbs(FPV_BASE: str, session_folder: str, sub: str):
+    """A viewed session jumps the thumbnail queue (works from any worker: shared queue file, builder woken via the wake file)."""
+    if not _SETTINGS['thumb_backfill']:
+        return
+    try:
+        if thumb_queue.prioritize(_open_queue(), f"{session_folder}/{sub}/"):
+            _wake_thumbs()
+    except Exception as e:
+        print("⚠️ Thumbnail-Priorität fehlgeschlagen:", e)
+
+def thumb_backfill_status() -> dict:
+    """Queue sizes for /api/status (waiting videos, failed ones in backoff) and the thumbnail backend in use."""
+    try:
+        status = thumb_queue.counts(_open_queue())
+    except Exception:
+        status = {'queued': 0, 'backoff': 0}
+    status['backend'] = select_backend()
+    return status
+
+
+def apply_session_changes(FPV_BASE: str, keys):
+    """Rescan only the given (session, sub) keys and patch them into the index and the in-process cache."""
+    if not keys:
+        return
+    start = time.time()
+    updated = sync_subs(_open_index(), FPV_BASE, keys, scan_sub_session)
+    _enqueue_thumbs([t for rec in updated.values() if rec is not None for t in _missing_previews(rec)])
+    with _PATCH_LOCK:
+        if _CACHE['sessions'] is None:
+            return
+        # Copy-on-write: requests iterating the old list are not affected
+        old = _CACHE['sessions']
+        sessions = [s for s in old if (s['name'], s['sub']) not in updated]
+        added = []
+        for key, rec in updated.items():
+            if rec is None:
+                continue
+            summary = rec.summary()
+            added.append(summary)
+            # The fresh scan already has the listing; keep it for the detail views
+            _remember_files(key, summary, rec.files)
+        sessions.extend(added)
+        sort_sessions(sessions)
+        # Library totals: patch with the per-session deltas instead of summing everything again
+        cached = _CACHE['stats']
+        if cached is not None and cached[0] is old:
+            removed = [s for s in old if (s['name'], s['sub']) in updated]
+            _CACHE['stats'] = (sessions, session_stats.apply_changes(cached[1], removed, added, sessions))
+        search = _CACHE['search']
+        if search is not None and search.sessions is old:
+            _CACHE['search'] = search.apply_changes(set(updated), sessions)
+        cached = _CACHE['lookup']
+        if cached is not None and cached[0] is old:
+            table = dict(cached[1])
+            for key in updated:
+                table.pop(key, None)
+            table.update(((s['name'], s['sub']), s) for s in added)
+            _CACHE['lookup'] = (sessions, table)
+        _CACHE['sessions'] = sessions
+    _publish_snapshot(FPV_BASE, fresh=set(updated))
+    removed = sum(1 for s in updated.values() if s is None)
+    metrics.INDEX_BUILD_SECONDS.observe(time.time() - start, kind='live')
+    metrics.INDEX_SUBS.inc(len(updated) - removed, result='scanned')
+    metrics.INDEX_SUBS.inc(removed, result='removed')
+    print(f"🔄 Live-Update: {len(updated) - removed} aktualisiert, {removed} entfernt ({time.time() - start:.2f}s)")
+
+def start_session_watcher(FPV_BASE: str):
+    """Start (or re-target) the optional FPV_BASE watcher according to WATCH_MODE. No-op when mode is 'off'."""
+    mode = _SETTINGS['watch_mode']
+    if mode == 'off' or not FPV_BASE or not os.path.isdir(FPV_BASE) or not is_index_builder():
+        return None
+    with _WATCHER_LOCK:
+        current = _WATCHER['watcher']
+        if current is not None and _WATCHER['base'] == FPV_BASE:
+            return current
+        if current is not None:
+            current.stop()
+
+        def _on_changes(keys, full):
+            if full:
+                request_refresh(FPV_BASE)
+            else:
+                apply_session_changes(FPV_BASE, keys)
+
+        watcher = SessionWatcher(
+            FPV_BASE, _on_changes, mode=mode,
+            debounce_sec=_SETTINGS['watch_debounce_sec'],
+            poll_sec=_SETTINGS['watch_poll_sec'],
+            poll_changes=lambda: changed_subs(_open_index(), FPV_BASE),
+        )
+        _WATCHER['watcher'] = watcher.start()
+        _WATCHER['base'] = FPV_BASE
+        return watcher
@@ -0,0 +1,261 @@
+"""
+Optional filesystem watcher for FPV_BASE.
+
+Uses inotify (Linux, via ctypes, no extra dependency) and falls back to polling
+directory mtimes for network mounts or platforms without inotify. Bursts of events
+(e.g. a sorter import) are debounced and handed to a callback as a set of
+(session_folder, sub) keys, so only those sessions are patched in the index.
+A sub of None means "re-list this session folder".
+"""
+
+import os
+import time
+import errno
+import struct
+import select
+import threading
+
+try:
+    import ctypes
+    import ctypes.util
+except Exception:  # pragma: no cover - ctypes missing on exotic builds
+    ctypes = None
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_ATTRIB | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Filesystems where inotify does not see changes made by other hosts
+NETWORK_FS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', '9p', 'afs', 'ceph', 'glusterfs', 'fuse.rclone'}
+
+
+def _fs_type(path: str) -> str:
+    """Filesystem type of the mount containing path (Linux /proc/mounts), '' if unknown."""
+    try:
+        path = os.path.realpath(path)
+        best, fstype = '', ''
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mnt = parts[1].replace('\\040', ' ')
+                if (path == mnt or path.startswith(mnt.rstrip('/') + '/')) and len(mnt) > len(best):
+                    best, fstype = mnt, parts[2]
+        return fstype
+    except Exception:
+        return ''
+
+
+def _load_libc():
+    if ctypes is None or not hasattr(os, 'O_NONBLOCK'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        return libc
+    except Exception:
+        return None
+
+
+def inotify_available(path: str) -> bool:
+    return _load_libc() is not None and _fs_type(path) not in NETWORK_FS
+
+
+class _Debouncer:
+    """Collects keys and flushes them once no new event arrived for `quiet` seconds (or after `max_wait`)."""
+
+    def __init__(self, callback, quiet: float, max_wait: float):
+        self.callback = callback
+        self.quiet = quiet
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._keys = set()
+        self._full = False
+        self._first = 0.0
+        self._last = 0.0
+
+    def add(self, keys=(), full=False):
+        now = time.time()
+        with self._lock:
+            if not self._keys and not self._full:
+                self._first = now
+            self._keys.update(keys)
+            self._full = self._full or full
+            self._last = now
+
+    def flush_due(self):
+        now = time.time()
+        with self._lock:
+            if not self._keys and not self._full:
+                return
+            if now - self._last < self.quiet and now - self._first < self.max_wait:
+                return
+            keys, full = self._keys, self._full
+            self._keys, self._full = set(), False
+        try:
+            self.callback(keys, full)
+        except Exception as e:
+            print("❌ Watcher-Update fehlgeschlagen:", e)
+
+
+class SessionWatcher:
+    """Background thread watching FPV_BASE; mode is 'inotify' or 'poll'."""
+
+    def __init__(self, FPV_BASE: str, callback, mode: str = 'auto', debounce_sec: float = 2.0,
+                 poll_sec: float = 30.0, poll_changes=None):
+        self.base = os.path.abspath(FPV_BASE)
+        self.mode = mode
+        self.poll_sec = poll_sec
+        self.poll_changes = poll_changes
+        self._debouncer = _Debouncer(callback, debounce_sec, max(debounce_sec * 10, 30.0))
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._libc = None
+        self._wd_to_rel = {}
+
+    # --- lifecycle ---
+    def start(self):
+        if self.mode == 'auto':
+            self.mode = 'inotify' if inotify_available(self.base) else 'poll'
+        if self.mode == 'inotify' and not self._init_inotify():
+            self.mode = 'poll'
+        target = self._run_inotify if self.mode == 'inotify' else self._run_poll
+        self._thread = threading.Thread(target=target, name='fpv-session-watcher', daemon=True)
+        self._thread.start()
+        print(f"👀 Session-Watcher aktiv ({self.mode}):", self.base)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+    # --- key mapping ---
+    @staticmethod
+    def _key_for(rel_dir: str, name: str = None):
+        """Map a changed entry (directory rel to base + optional entry name) to a session key."""
+        parts = [p for p in rel_dir.split('/') if p] + ([name] if name else [])
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return (parts[0], None)
+        return (parts[0], parts[1])
+
+    # --- inotify ---
+    def _init_inotify(self) -> bool:
+        self._libc = _load_libc()
+        if self._libc is None:
+            return False
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return False
+        self._fd = fd
+        try:
+            self._add_tree(self.base, '')
+        except OSError as e:
+            print("⚠️ inotify nicht nutzbar, wechsle auf Polling:", e)
+            os.close(fd)
+            self._fd = None
+            self._wd_to_rel.clear()
+            return False
+        return True
+
+    def _add_watch(self, abs_dir: str, rel_dir: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(abs_dir), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, 'inotify watch limit reached (fs.inotify.max_user_watches)')
+            return
+        self._wd_to_rel[wd] = rel_dir
+
+    def _add_tree(self, abs_dir: str, rel_dir: str):
+        self._add_watch(abs_dir, rel_dir)
+        try:
+            with os.scandir(abs_dir) as it:
+                subdirs = [e for e in it if e.is_dir() and not e.is_symlink()]
+        except OSError:
+            return
+        for e in subdirs:
+            self._add_tree(e.path, f"{rel_dir}/{e.name}" if rel_dir else e.name)
+
+    def _run_inotify(self):
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+            except (OSError, ValueError):
+                break
+            if ready:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b''
+                except OSError:
+                    break
+                self._handle_events(data)
+            self._debouncer.flush_due()
+
+    def _handle_events(self, data: bytes):
+        keys = set()
+        full = False
+        off = 0
+        while off + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, off)
+            off += _EVENT_HEADER.size
+            name = data[off:off + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            off += length
+            if mask & IN_Q_OVERFLOW:
+                full = True
+                continue
+            rel_dir = self._wd_to_rel.get(wd)
+            if mask & IN_IGNORED:
+                self._wd_to_rel.pop(wd, None)
+                continue
+            if rel_dir is None:
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                child_rel = f"{rel_dir}/{name}" if rel_dir else name
+                try:
+                    self._add_tree(os.path.join(self.base, child_rel.replace('/', os.sep)), child_rel)
+                except OSError as e:
+                    print("⚠️ inotify Watch-Limit erreicht:", e)
+                    full = True
+            key = self._key_for(rel_dir, name or None)
+            if key:
+                keys.add(key)
+        if keys or full:
+            self._debouncer.add(keys, full)
+
+    # --- polling ---
+    def _run_poll(self):
+        # Changes are detected per poll interval already, no extra debounce needed
+        while not self._stop.wait(self.poll_sec):
+            try:
+                keys = self.poll_changes() if self.poll_changes else set()
+                if keys:
+                    self._debouncer.callback(keys, False)
+            except Exception as e:
+                print("⚠️ Polling fehlgeschlagen:", e)
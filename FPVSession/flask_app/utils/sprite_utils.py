@@ -0,0 +1,111 @@
+"""
+Hover-scrub sprite sheets: one small JPEG with grid x grid frames of a video plus a WebVTT index.
+
+The cards and the detail player show the tile under the mouse instead of streaming
+the (multi-GB) video on hover. The sheet is made in a single ffmpeg pass that only
+decodes keyframes (-skip_frame nokey), so it costs a read of the file, not a full decode.
+
+The VTT follows the common thumbnail-track format, one cue per tile:
+
+    00:00:12.000 --> 00:00:18.000
+    DJI_0001_sprite.jpg#xywh=160,0,160,90
+"""
+
+import os
+import time
+import threading
+import subprocess
+try:
+    from .metrics import SUBPROCESS_SECONDS
+except Exception:
+    # script fallback
+    from flask_app.utils.metrics import SUBPROCESS_SECONDS
+
+TILE_W = 160
+TILE_H = 90
+
+
+def probe_duration(video_path: str, timeout: float = 30) -> float:
+    """Video duration in seconds via ffprobe (0.0 if unknown)."""
+    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=nw=1:nk=1', video_path]
+    start = time.perf_counter()
+    ok = False
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        duration = float((result.stdout or '').strip() or 0)
+        ok = result.returncode == 0 and duration > 0
+        return duration if ok else 0.0
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return 0.0
+    finally:
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - start, tool='ffprobe', ok=str(ok).lower())
+
+
+def _ts(sec: float) -> str:
+    h, rest = divmod(sec, 3600)
+    m, s = divmod(rest, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+def sprite_vtt(sheet_name: str, duration: float, grid: int = 10) -> str:
+    """WebVTT index for a grid x grid sheet spread evenly over duration seconds."""
+    n = grid * grid
+    step = duration / n
+    lines = ['WEBVTT', '']
+    for i in range(n):
+        x, y = (i % grid) * TILE_W, (i // grid) * TILE_H
+        lines.append(f"{_ts(i * step)} --> {_ts((i + 1) * step)}")
+        lines.append(f"{sheet_name}#xywh={x},{y},{TILE_W},{TILE_H}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def generate_sprite(video_path: str, vtt_path: str, timeout: float = 300, grid: int = 10) -> bool:
+    """Generate the <name>.jpg sprite sheet + <name>.vtt index for a video. Returns True if successful."""
+    sheet_path = os.path.splitext(vtt_path)[0] + '.jpg'
+    tag = f"{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp_sheet, tmp_vtt = f"{sheet_path}.{tag}", f"{vtt_path}.{tag}"
+    try:
+        os.makedirs(os.path.dirname(vtt_path), exist_ok=True)
+        duration = probe_duration(video_path)
+        if duration <= 0:
+            print(f"❌ Sprite: Dauer unbekannt für {video_path}")
+            return False
+
+        # grid*grid frames evenly over the video, letterboxed into fixed tiles so the VTT coordinates are exact
+        vf = (
+            f"fps={grid * grid}/{duration:.3f},"
+            f"scale={TILE_W}:{TILE_H}:force_original_aspect_ratio=decrease,"
+            f"pad={TILE_W}:{TILE_H}:(ow-iw)/2:(oh-ih)/2,"
+            f"tile={grid}x{grid}"
+        )
+        cmd = [
+            'ffmpeg', '-y',
+            '-skip_frame', 'nokey',  # decode keyframes only
+            '-i', video_path,
+            '-an', '-vf', vf,
+            '-frames:v', '1',
+            '-q:v', '5',
+            '-f', 'mjpeg',
+            tmp_sheet
+        ]
+        start = time.perf_counter()
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        ok = result.returncode == 0 and os.path.getsize(tmp_sheet) > 0
+        if ok:
+            with open(tmp_vtt, 'w', encoding='utf-8') as f:
+                f.write(sprite_vtt(os.path.basename(sheet_path), duration, grid))
+            # sheet first: a VTT is only ever visible together with its sheet
+            os.replace(tmp_sheet, sheet_path)
+            os.replace(tmp_vtt, vtt_path)
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - start, tool='ffmpeg_sprite', ok=str(ok).lower())
+        return ok
+    except Exception as e:
+        print(f"❌ Sprite generation failed for {video_path}: {e}")
+        return False
+    finally:
+        for p in (tmp_sheet, tmp_vtt):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
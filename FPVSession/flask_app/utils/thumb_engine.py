@@ -0,0 +1,223 @@
+"""
+Thumbnail engine: runs ffmpeg jobs on a worker pool under a host-wide concurrency cap.
+
+Every ffmpeg run already is its own process, so the pool only needs threads that
+wait for them. The cap is shared by all gunicorn workers on the host through N
+slot lock files (flock): a job runs only while it holds one of the slots, so
+thumbnails, sprites, previews and on-demand work never start more than
+THUMB_MAX_CONCURRENT ffmpeg processes together.
+
+Progress (per item, ETA) is kept in-process and mirrored to a small status file
+next to the slots, so /api/status on any worker can show what the builder does.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process cap, the local semaphore still bounds this process
+    fcntl = None
+
+_SETTINGS = {
+    'workers': max(1, min(4, os.cpu_count() or 1)),
+    'max_concurrent': None,  # None: same as workers
+    'timeout_sec': 30.0,
+    'slot_dir': None,
+}
+_STATE_LOCK = threading.Lock()
+_STATE = {
+    'active': False,
+    'total': 0,
+    'done': 0,
+    'failed': 0,
+    'started': 0.0,
+    'finished': 0.0,
+    'running': {},  # video path -> start time
+    'last': None,
+}
+_LOCAL = {'sem': None, 'size': 0, 'published': 0.0}
+
+
+def configure(workers=None, max_concurrent=None, timeout_sec=None, slot_dir=None):
+    if workers is not None:
+        _SETTINGS['workers'] = max(1, int(workers))
+    if max_concurrent is not None:
+        _SETTINGS['max_concurrent'] = max(1, int(max_concurrent))
+    if timeout_sec is not None:
+        _SETTINGS['timeout_sec'] = max(1.0, float(timeout_sec))
+    if slot_dir:
+        _SETTINGS['slot_dir'] = slot_dir
+
+
+def timeout_sec() -> float:
+    return _SETTINGS['timeout_sec']
+
+
+def batch_size() -> int:
+    """Items a scheduler hands to run() at once (keeps every worker busy, priorities apply between batches)."""
+    return _SETTINGS['workers'] * 4
+
+
+def _cap() -> int:
+    return _SETTINGS['max_concurrent'] or _SETTINGS['workers']
+
+
+def _local_sem():
+    with _STATE_LOCK:
+        if _LOCAL['sem'] is None or _LOCAL['size'] != _cap():
+            _LOCAL['sem'] = threading.BoundedSemaphore(_cap())
+            _LOCAL['size'] = _cap()
+        return _LOCAL['sem']
+
+
+@contextmanager
+def slot():
+    """Hold one of the host-wide ffmpeg slots for the duration of the block (blocks until one is free)."""
+    sem = _local_sem()
+    with sem:
+        d = _SETTINGS['slot_dir']
+        if fcntl is None or not d:
+            yield
+            return
+        os.makedirs(d, exist_ok=True)
+        while True:
+            for i in range(_cap()):
+                fh = open(os.path.join(d, f'slot-{i}.lock'), 'a+')
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    fh.close()
+                    continue
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+                    fh.close()
+                return
+            # all slots busy (other workers): wait for one to free up
+            time.sleep(0.2)
+
+
+def _status_path():
+    d = _SETTINGS['slot_dir']
+    return os.path.join(d, 'status.json') if d else None
+
+
+def _snapshot_state() -> dict:
+    """Current progress as a JSON-safe dict (caller holds _STATE_LOCK)."""
+    now = time.time()
+    total, done = _STATE['total'], _STATE['done']
+    end = now if _STATE['active'] else (_STATE['finished'] or now)
+    elapsed = end - _STATE['started'] if _STATE['started'] else 0.0
+    # Wall-clock per finished item already includes the parallelism
+    avg = elapsed / done if done else 0.0
+    eta = avg * (total - done) if (done and _STATE['active']) else None
+    return {
+        'active': _STATE['active'],
+        'total': total,
+        'done': done,
+        'failed': _STATE['failed'],
+        'percent': int(done * 100 / total) if total else 100,
+        'elapsed_sec': round(elapsed, 1),
+        'avg_sec': round(avg, 2),
+        'eta_sec': round(eta, 1) if eta is not None else None,
+        'workers': _SETTINGS['workers'],
+        'max_concurrent': _cap(),
+        'running': [{'video': os.path.basename(v), 'sec': round(now - t, 1)} for v, t in _STATE['running'].items()],
+        'last': _STATE['last'],
+        'pid': os.getpid(),
+        'updated': now,
+    }
+
+
+def _publish(force: bool = False):
+    """Mirror the progress to the status file (at most twice per second unless forced)."""
+    path = _status_path()
+    if not path:
+        return
+    now = time.time()
+    with _STATE_LOCK:
+        if not force and now - _LOCAL['published'] < 0.5:
+            return
+        _LOCAL['published'] = now
+        data = _snapshot_state()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def status() -> dict:
+    """Thumbnail progress for /api/status: this process' run, else the last one published on this host."""
+    with _STATE_LOCK:
+        if _STATE['active'] or _STATE['started']:
+            return _snapshot_state()
+    path = _status_path()
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except (OSError, ValueError):
+            pass
+    with _STATE_LOCK:
+        return _snapshot_state()
+
+
+def run(tasks: list, generate, on_item=None) -> tuple:
+    """
+    Generate (abs_video, abs_thumb) tasks with generate(video, thumb, timeout) on the pool.
+    on_item(idx, total, task, ok) is called after each item. Returns (ok, failed) counts.
+    """
+    if not tasks:
+        return 0, 0
+    with _STATE_LOCK:
+        _STATE.update(active=True, total=len(tasks), done=0, failed=0, started=time.time(), finished=0.0,
+                      running={}, last=None)
+    _publish(force=True)
+
+    def one(task):
+        video, thumb = task
+        with slot():
+            with _STATE_LOCK:
+                _STATE['running'][video] = time.time()
+            t0 = time.time()
+            try:
+                ok = bool(generate(video, thumb, _SETTINGS['timeout_sec']))
+            except Exception as e:
+                print(f"❌ Thumbnail fehlgeschlagen für {video}: {e}")
+                ok = False
+        with _STATE_LOCK:
+            _STATE['running'].pop(video, None)
+            _STATE['done'] += 1
+            _STATE['failed'] += 0 if ok else 1
+            _STATE['last'] = {'video': os.path.basename(video), 'ok': ok, 'sec': round(time.time() - t0, 2)}
+        _publish()
+        return task, ok
+
+    ok_count = 0
+    try:
+        with ThreadPoolExecutor(max_workers=_SETTINGS['workers'], thread_name_prefix='fpv-thumb') as ex:
+            futures = [ex.submit(one, t) for t in tasks]
+            for idx, fut in enumerate(as_completed(futures), 1):
+                task, ok = fut.result()
+                ok_count += ok
+                if on_item:
+                    on_item(idx, len(tasks), task, ok)
+    finally:
+        with _STATE_LOCK:
+            _STATE['active'] = False
+            _STATE['finished'] = time.time()
+            _STATE['running'] = {}
+        _publish(force=True)
+    return ok_count, len(tasks) - ok_count
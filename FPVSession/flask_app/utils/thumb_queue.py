@@ -0,0 +1,123 @@
+"""
+Persistent thumbnail work queue (SQLite, own database file next to the sessions index).
+
+The index feeds it with the videos of every (re)scanned sub-session that have no
+thumbnail yet; the backfill scheduler in session_utils drains it. Entries are
+keyed by the video path relative to FPV_BASE, so re-adding a queued or failed
+video is a no-op and its backoff survives rescans and restarts. The separate file
+keeps queue writes (scheduler, prioritize on every detail view) from ever waiting
+on an index sync and vice versa.
+
+Order: highest priority first (a session being viewed gets the current time as
+priority), then oldest first. Failed videos stay in the table as a negative cache
+and are only retried after an exponential backoff.
+"""
+
+import time
+import sqlite3
+import threading
+
+BACKOFF_BASE_SEC = 300
+BACKOFF_MAX_SEC = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumb_queue (
+    video TEXT PRIMARY KEY,
+    thumb TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_try REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumb_queue_due ON thumb_queue (next_try);
+"""
+
+_lock = threading.Lock()
+_connections = {}
+
+
+def open_queue(db_path: str) -> sqlite3.Connection:
+    """Shared connection to the queue database (written from the scheduler thread and request handlers)."""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is not None:
+            return conn
+        conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        _connections[db_path] = conn
+        return conn
+
+
+def backoff(attempts: int) -> float:
+    """Seconds until the next try after `attempts` failures (5 min, 20 min, 80 min, ... capped at 7 days)."""
+    return min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 4 ** max(0, attempts - 1))
+
+
+def enqueue(conn, items) -> int:
+    """Add (rel_video, rel_thumb) pairs; already queued or failed videos are kept as they are. Returns the number added."""
+    now = time.time()
+    with _lock, conn:
+        before = conn.total_changes
+        conn.executemany(
+            'INSERT OR IGNORE INTO thumb_queue (video, thumb, added) VALUES (?, ?, ?)',
+            [(video, thumb, now) for video, thumb in items]
+        )
+        return conn.total_changes - before
+
+
+def due(conn, limit: int) -> list:
+    """Up to limit (video, thumb) pairs whose next try is due, highest priority first."""
+    with _lock:
+        return conn.execute(
+            'SELECT video, thumb FROM thumb_queue WHERE next_try <= ? ORDER BY priority DESC, added LIMIT ?',
+            (time.time(), limit)
+        ).fetchall()
+
+
+def next_due(conn):
+    """Time of the earliest pending try or None if the queue is empty."""
+    with _lock:
+        row = conn.execute('SELECT MIN(next_try) FROM thumb_queue').fetchone()
+    return row[0] if row else None
+
+
+def done(conn, videos):
+    with _lock, conn:
+        conn.executemany('DELETE FROM thumb_queue WHERE video=?', [(v,) for v in videos])
+
+
+def failed(conn, video: str, error: str = ''):
+    """Record a failure: the video goes into the negative cache until its backoff expired."""
+    with _lock, conn:
+        row = conn.execute('SELECT attempts FROM thumb_queue WHERE video=?', (video,)).fetchone()
+        attempts = (row[0] if row else 0) + 1
+        conn.execute(
+            'UPDATE thumb_queue SET attempts=?, next_try=?, last_error=?, priority=0 WHERE video=?',
+            (attempts, time.time() + backoff(attempts), error, video)
+        )
+
+
+def prioritize(conn, prefix: str) -> int:
+    """Move the queued (not backed-off) videos below prefix (e.g. '<session>/<sub>/') to the front."""
+    bounds = (prefix, prefix + '\uffff')
+    with _lock:
+        # most viewed sessions have nothing queued: no write transaction for those
+        if not conn.execute('SELECT 1 FROM thumb_queue WHERE video >= ? AND video < ? AND attempts=0 LIMIT 1', bounds).fetchone():
+            return 0
+    with _lock, conn:
+        cur = conn.execute(
+            'UPDATE thumb_queue SET priority=? WHERE video >= ? AND video < ? AND attempts=0',
+            (int(time.time()),) + bounds
+        )
+        return cur.rowcount
+
+
+def counts(conn) -> dict:
+    """{'queued': waiting, 'backoff': failed and waiting for a retry}."""
+    with _lock:
+        row = conn.execute(
+            'SELECT SUM(attempts=0), SUM(attempts>0) FROM thumb_queue'
+        ).fetchone()
+    return {'queued': int(row[0] or 0), 'backoff': int(row[1] or 0)}
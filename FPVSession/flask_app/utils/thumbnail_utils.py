@@ -1,24 +1,203 @@
+"""
+Thumbnail generation with pluggable backends.
+
+- ffmpeg: input seek (-ss before -i) jumps to the keyframe before the timestamp and
+  decodes a single frame; no Python dependency, one subprocess per thumbnail
+- pyav:   in-process seek to the keyframe + decode of one frame (needs `av` and Pillow)
+- cv2:    OpenCV seek by position (needs `opencv-python`)
+
+The timeout covers the whole thumbnail: ffprobe and ffmpeg share it, and the
+Python decoders (pyav, cv2) run in a child interpreter (`python -m` this module)
+that is killed when it runs over, so a decode hanging on a corrupt file cannot
+hold a thumbnail engine slot forever.
+
+THUMB_BACKEND picks one; 'auto' takes the first available in BACKEND_ORDER. The
+frame is taken at pick_timestamp(duration): a quarter into the clip, past the
+arming/take-off at the start, and never beyond the end of short clips (the old
+fixed -ss 5 failed for everything shorter than 5 s).
+"""
+
 import os
+import time
+import shutil
+import threading
+import sys
 import subprocess
+from functools import partial
+try:
+    from .metrics import SUBPROCESS_SECONDS
+    from .sprite_utils import probe_duration
+except Exception:
+    # script fallback
+    from flask_app.utils.metrics import SUBPROCESS_SECONDS
+    from flask_app.utils.sprite_utils import probe_duration
+
+try:
+    import av
+except ImportError:  # optional backend
+    av = None
+try:
+    import cv2
+except ImportError:  # optional backend
+    cv2 = None
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+THUMB_SIZE = (320, 240)
+BACKEND_ORDER = ('ffmpeg', 'pyav', 'cv2')
+_SETTINGS = {'backend': 'auto'}
+_SELECTED = {}
+# Share of the ffmpeg backend's timeout given to ffprobe; ffmpeg gets the rest
+PROBE_SHARE = 0.3
+
+
+def pick_timestamp(duration: float) -> float:
+    """Seconds into the video for the thumbnail frame (0 = first frame if the duration is unknown)."""
+    if not duration or duration <= 0:
+        return 0.0
+    return min(duration * 0.25, max(0.0, duration - 0.5))
+
+
+def _fit(w: int, h: int) -> tuple:
+    scale = min(THUMB_SIZE[0] / w, THUMB_SIZE[1] / h, 1.0)
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def _thumb_ffmpeg(video_path: str, tmp_path: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    ts = pick_timestamp(probe_duration(video_path, timeout * PROBE_SHARE))
+    cmd = [
+        'ffmpeg', '-y',  # overwrite output file
+        '-ss', f'{ts:.3f}',  # input seek: keyframe jump, no decoding up to there
+        '-i', video_path,
+        '-frames:v', '1',  # extract 1 frame
+        '-an', '-sn',
+        '-vf', f'scale={THUMB_SIZE[0]}:{THUMB_SIZE[1]}:force_original_aspect_ratio=decrease',  # resize
+        '-f', 'mjpeg',   # temp name has no .jpg extension
+        tmp_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=max(0.1, deadline - time.monotonic()))
+    return result.returncode == 0
+
+
+def _thumb_pyav(video_path: str, tmp_path: str) -> bool:
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = 'NONKEY'
+        duration = float(stream.duration * stream.time_base) if stream.duration else (
+            container.duration / av.time_base if container.duration else 0.0)
+        ts = pick_timestamp(duration)
+        if ts > 0:
+            container.seek(int(ts / stream.time_base), stream=stream, backward=True, any_frame=False)
+        for frame in container.decode(stream):
+            im = frame.to_image()
+            im.thumbnail(THUMB_SIZE)
+            im.save(tmp_path, 'JPEG', quality=85)
+            return True
+    return False
+
+
+def _thumb_cv2(video_path: str, tmp_path: str) -> bool:
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+        ts = pick_timestamp(frames / fps if fps else 0.0)
+        if ts > 0:
+            cap.set(cv2.CAP_PROP_POS_MSEC, ts * 1000.0)
+        ok, image = cap.read()
+        if not ok:
+            return False
+        h, w = image.shape[:2]
+        image = cv2.resize(image, _fit(w, h), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), 85])
+        if ok:
+            with open(tmp_path, 'wb') as f:
+                f.write(buf.tobytes())
+        return bool(ok)
+    finally:
+        cap.release()
+
 
-def generate_thumbnail(video_path: str, thumb_path: str) -> bool:
-    """Generate thumbnail from video using ffmpeg. Returns True if successful."""
+_IN_PROCESS = {'pyav': _thumb_pyav, 'cv2': _thumb_cv2}
+
+
+def _thumb_child(name: str, video_path: str, tmp_path: str, timeout: float) -> bool:
+    """Decode with pyav/cv2 in a child interpreter that is killed after timeout (the decoders cannot be interrupted)."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in (root, os.environ.get('PYTHONPATH')) if p))
+    cmd = [sys.executable, '-m', 'flask_app.utils.thumbnail_utils', name, video_path, tmp_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        print(f"⏱️ Thumbnail-Timeout ({timeout:.0f}s) für {video_path}")
+        return False
+    if result.returncode != 0 and result.stderr:
+        print(f"❌ {name}: {result.stderr.strip().splitlines()[-1]}")
+    return result.returncode == 0
+
+
+# name -> (available, generate(video_path, tmp_path, timeout) -> bool)
+BACKENDS = {
+    'ffmpeg': (lambda: shutil.which('ffmpeg') is not None, _thumb_ffmpeg),
+    'pyav': (lambda: av is not None and Image is not None, partial(_thumb_child, 'pyav')),
+    'cv2': (lambda: cv2 is not None, partial(_thumb_child, 'cv2')),
+}
+
+
+def configure(backend=None):
+    if backend:
+        _SETTINGS['backend'] = str(backend).strip().lower()
+        _SELECTED.clear()
+
+
+def available_backends() -> list:
+    return [name for name in BACKEND_ORDER if BACKENDS[name][0]()]
+
+
+def select_backend():
+    """Configured backend if available, else the first available one (None if there is none). Cached."""
+    if 'name' not in _SELECTED:
+        wanted = _SETTINGS['backend']
+        available = available_backends()
+        name = wanted if wanted in available else (available[0] if available else None)
+        if wanted != 'auto' and name != wanted:
+            print(f"⚠️ Thumbnail-Backend '{wanted}' nicht verfügbar, nutze {name}")
+        _SELECTED['name'] = name
+    return _SELECTED['name']
+
+
+def generate_thumbnail(video_path: str, thumb_path: str, timeout: float = 30, backend: str = None) -> bool:
+    """Generate thumbnail from video with the selected (or given) backend. Returns True if successful."""
+    name = backend or select_backend()
+    if name is None:
+        print("❌ Kein Thumbnail-Backend verfügbar (ffmpeg, av oder cv2)")
+        return False
+    # the backend writes into a temp file that is renamed into place, so a half-written JPEG is never served
+    tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    start = time.perf_counter()
+    ok = False
     try:
         # Ensure the directory exists
         os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
-
-        # Use ffmpeg to generate thumbnail at 5 seconds into the video
-        cmd = [
-            'ffmpeg', '-y',  # overwrite output file
-            '-i', video_path,
-            '-ss', '5',      # seek to 5 seconds
-            '-vframes', '1', # extract 1 frame
-            '-vf', 'scale=320:240:force_original_aspect_ratio=decrease',  # resize
-            thumb_path
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        return result.returncode == 0 and os.path.exists(thumb_path)
+        ok = BACKENDS[name][1](video_path, tmp_path, timeout) and os.path.getsize(tmp_path) > 0
+        if ok:
+            os.replace(tmp_path, thumb_path)
+        return ok
     except Exception as e:
         print(f"❌ Thumbnail generation failed for {video_path}: {e}")
         return False
+    finally:
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - start, tool=f'{name}_thumb', ok=str(ok).lower())
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    # child of _thumb_child: <backend> <video> <tmp>
+    backend, video, tmp = sys.argv[1:4]
+    sys.exit(0 if _IN_PROCESS[backend](video, tmp) else 1)